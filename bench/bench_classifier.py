@@ -0,0 +1,91 @@
+"""
+Бенчмарк однопроходного классификатора сообщений для .stat.
+
+Запуск из корня репозитория:
+    python -m bench.bench_classifier [кол-во сообщений]
+
+Цели на одно ядро: >= 200k сообщений/сек для classify_message и
+>= 120k сообщений/сек для всего пути StatsBucket.add_message (классификатор + агрегаты).
+"""
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from src.services.analytics import StatsBucket
+from src.services.classifier import classify_message
+
+TARGET_RATE = 200_000
+TARGET_FULL_RATE = 120_000
+
+TEXTS = [
+    "Привет, как дела? 😂😂",
+    "хахахах))",
+    "ахахахахпхпх",
+    "https://youtu.be/dQw4w9WgXcQ смотри",
+    "ну это вообще жесть какая-то, я не понял",
+    "ок",
+    "🔥🔥🔥",
+    "Завтра в 10 встречаемся у метро, не опаздывайте пожалуйста 🙏🏻",
+    "lol xD",
+    "",
+]
+MEDIA = [None] * 8 + [SimpleNamespace(value="photo"), SimpleNamespace(value="sticker")]
+
+
+def make_messages(n):
+    rnd = random.Random(42)
+    msgs = []
+    for i in range(n):
+        media = rnd.choice(MEDIA)
+        text = rnd.choice(TEXTS) or None
+        msgs.append(SimpleNamespace(
+            id=n - i,
+            media=media,
+            service=None,
+            sticker=SimpleNamespace(emoji="😎") if media and media.value == "sticker" else None,
+            reactions=None,
+            text=text if media is None else None,
+            caption=text if media is not None else None,
+            entities=None,
+            caption_entities=None,
+            from_user=SimpleNamespace(id=rnd.randint(1, 50)),
+            voice=None,
+            video_note=None,
+        ))
+    return msgs
+
+
+def bench(name, func, msgs):
+    start = time.perf_counter()
+    for m in msgs:
+        func(m)
+    elapsed = time.perf_counter() - start
+    rate = len(msgs) / elapsed
+    print(f"{name:<28} {rate:>12,.0f} msg/s  ({elapsed:.2f}s)")
+    return rate
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    msgs = make_messages(n)
+
+    rate = bench("classify_message", classify_message, msgs)
+    full_rate = bench("StatsBucket.add_message", StatsBucket().add_message, msgs)
+
+    failed = False
+    for name, value, target in (
+        ("classify_message", rate, TARGET_RATE),
+        ("StatsBucket.add_message", full_rate, TARGET_FULL_RATE),
+    ):
+        if value < target:
+            print(f"❌ {name} ниже цели {target:,} msg/s")
+            failed = True
+        else:
+            print(f"✅ {name} >= {target:,} msg/s")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
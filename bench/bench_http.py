@@ -0,0 +1,91 @@
+"""
+Бенчмарк общего HTTP-пула (src.services.http) против новой сессии на каждый вызов.
+
+Запуск из корня репозитория:
+    python -m bench.bench_http [кол-во запросов]
+
+Поднимает локальный stub-сервер на 127.0.0.1 и делает одинаковые GET
+двумя способами: как раньше (aiohttp.ClientSession на вызов) и через get_session().
+На loopback без TLS и DNS выигрыш минимальный; на реальных хостах сверху
+экономятся еще DNS-запрос и TLS-рукопожатие на каждый вызов.
+
+Цель: общий пул хотя бы в TARGET_SPEEDUP раз быстрее на вызов.
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+from src.services import http
+
+TARGET_SPEEDUP = 1.5
+PAYLOAD = b'{"ok": true}' * 64
+
+
+async def start_stub():
+    async def handle(request):
+        return web.Response(body=PAYLOAD, content_type="application/json")
+
+    app = web.Application()
+    app.router.add_get("/", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/"
+
+
+async def fresh_call(url):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as resp:
+            return await resp.read()
+
+
+async def shared_call(url):
+    async with http.get_session().get(url) as resp:
+        return await resp.read()
+
+
+async def bench(name, call, url, n):
+    await call(url)  # прогрев
+    times = []
+    for _ in range(n):
+        start = time.perf_counter()
+        await call(url)
+        times.append((time.perf_counter() - start) * 1000)
+    mean = statistics.mean(times)
+    p95 = sorted(times)[int(len(times) * 0.95) - 1]
+    print(f"{name:<28} {mean:>8.3f} ms/вызов  (p95 {p95:.3f} ms, n={n})")
+    return mean
+
+
+async def run(n):
+    runner, url = await start_stub()
+    try:
+        fresh = await bench("ClientSession на вызов", fresh_call, url, n)
+        await http.start()
+        shared = await bench("http.get_session()", shared_call, url, n)
+    finally:
+        await http.close_all()
+        await runner.cleanup()
+    return fresh, shared
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    fresh, shared = asyncio.run(run(n))
+    speedup = fresh / shared
+    print(f"Выигрыш: {fresh - shared:.3f} ms/вызов (x{speedup:.2f})")
+
+    if speedup < TARGET_SPEEDUP:
+        print(f"❌ общий пул быстрее меньше чем в {TARGET_SPEEDUP}x")
+        sys.exit(1)
+    print(f"✅ общий пул >= {TARGET_SPEEDUP}x быстрее")
+
+
+if __name__ == "__main__":
+    main()
@@ -31,6 +31,69 @@ RECONNECT_DELAY = int(os.getenv("RECONNECT_DELAY", "5"))
 
 IMAGEN_MODEL = "imagen-3.0-generate-001"
 
+# Analytics (.stat)
+STATS_MAX_PARALLEL_CHATS = int(os.getenv("STATS_MAX_PARALLEL_CHATS", "3"))
+STATS_CHECKPOINT_INTERVAL = int(os.getenv("STATS_CHECKPOINT_INTERVAL", "15"))  # сек между чекпоинтами
+STATS_MAX_FLOOD_WAIT = int(os.getenv("STATS_MAX_FLOOD_WAIT", "120"))  # дольше — пауза и резюм по job id
+
+# TTS (длинные тексты режутся на куски и озвучиваются параллельно)
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", "1500"))
+TTS_MAX_PARALLEL = int(os.getenv("TTS_MAX_PARALLEL", "4"))
+TTS_CHUNK_GAP_MS = int(os.getenv("TTS_CHUNK_GAP_MS", "250"))  # пауза между кусками
+# Лимит текста .say: чужие (AccessFilter) расходуют квоту Gemini-ключа владельца
+TTS_MAX_CHARS = int(os.getenv("TTS_MAX_CHARS", "30000"))
+TTS_GUEST_MAX_CHARS = int(os.getenv("TTS_GUEST_MAX_CHARS", "4000"))
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(ROOT_DIR, "cache", "tts"))
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "200"))  # LRU-вытеснение сверх лимита
+
+# STT: длинные записи режутся на части и распознаются параллельно
+STT_LONG_SECONDS = int(os.getenv("STT_LONG_SECONDS", "900"))  # длиннее — режим частей
+STT_SEGMENT_SECONDS = int(os.getenv("STT_SEGMENT_SECONDS", "600"))
+STT_SEGMENT_OVERLAP = int(os.getenv("STT_SEGMENT_OVERLAP", "5"))
+STT_CUT_WINDOW = int(os.getenv("STT_CUT_WINDOW", "60"))  # где искать паузу для разреза (±сек)
+STT_MAX_PARALLEL = int(os.getenv("STT_MAX_PARALLEL", "3"))
+# Меньше — медиа уходит inline-байтами в запросе, без File API (лимит запроса Gemini 20 MB)
+STT_INLINE_MAX_BYTES = int(os.getenv("STT_INLINE_MAX_BYTES", str(8 * 1024 * 1024)))
+# Быстрый путь без диска и ffmpeg: только голосовые не больше стольких байт (~5-10 мин Opus)
+STT_FAST_MAX_BYTES = int(os.getenv("STT_FAST_MAX_BYTES", str(2 * 1024 * 1024)))
+# Авторасшифровка входящих ГС/кружков (.autostt): фоновые воркеры и размер очереди
+AUTO_STT_WORKERS = int(os.getenv("AUTO_STT_WORKERS", "2"))
+AUTO_STT_QUEUE_MAX = int(os.getenv("AUTO_STT_QUEUE_MAX", "200"))
+AUTO_STT_GEMINI_PARALLEL = int(os.getenv("AUTO_STT_GEMINI_PARALLEL", "1"))  # фоновых запросов к Gemini одновременно
+
+# Загрузки (.dl): сколько yt-dlp/Яндекс заданий качается одновременно
+DL_MAX_PARALLEL = int(os.getenv("DL_MAX_PARALLEL", "2"))
+INFO_CACHE_TTL = int(os.getenv("INFO_CACHE_TTL", "1800"))  # сек; ссылки на форматы живут недолго
+AUDIO_SPOOL_MAX_MB = int(os.getenv("AUDIO_SPOOL_MAX_MB", "32"))  # .dl 2: MP3 в памяти до этого размера
+DL_SEGMENTS = int(os.getenv("DL_SEGMENTS", "4"))  # параллельных Range-кусков на прямой файл
+DL_SEGMENT_MIN_MB = int(os.getenv("DL_SEGMENT_MIN_MB", "2"))
+DL_SEGMENT_RETRIES = int(os.getenv("DL_SEGMENT_RETRIES", "3"))
+# Загрузка больших файлов в Telegram: медиа-сессий, параллельных частей, повторов на часть
+UPLOAD_SESSIONS = int(os.getenv("UPLOAD_SESSIONS", "2"))
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "8"))
+UPLOAD_PART_RETRIES = int(os.getenv("UPLOAD_PART_RETRIES", "5"))
+YM_MAX_PARALLEL = int(os.getenv("YM_MAX_PARALLEL", "4"))  # треков альбома одновременно
+YM_ACCOUNT_TTL = int(os.getenv("YM_ACCOUNT_TTL", "3600"))  # сек, как часто обновлять данные аккаунта
+
+# Рабочие папки заданий (загрузки, картинки, OLX). Для tmpfs укажите, например, /dev/shm/userbot
+WORKSPACE_ROOT = os.getenv("WORKSPACE_ROOT", os.path.join(ROOT_DIR, "workspace"))
+WORKSPACE_QUOTA_MB = int(os.getenv("WORKSPACE_QUOTA_MB", "2048"))  # 0 = без лимита; сверх — новые задания ждут
+WORKSPACE_RESERVE_MB = int(os.getenv("WORKSPACE_RESERVE_MB", "128"))  # сколько квоты занимает задание, пока папка меньше
+WORKSPACE_STALE_HOURS = int(os.getenv("WORKSPACE_STALE_HOURS", "6"))
+WORKSPACE_SWEEP_INTERVAL = int(os.getenv("WORKSPACE_SWEEP_INTERVAL", "600"))  # сек между уборками
+
+# Общий HTTP-клиент (aiohttp): пул на процесс, keep-alive и DNS-кэш
+HTTP_LIMIT = int(os.getenv("HTTP_LIMIT", "100"))  # соединений всего
+HTTP_LIMIT_PER_HOST = int(os.getenv("HTTP_LIMIT_PER_HOST", "8"))
+HTTP_DNS_TTL = int(os.getenv("HTTP_DNS_TTL", "300"))  # сек
+HTTP_KEEPALIVE = int(os.getenv("HTTP_KEEPALIVE", "30"))  # сек простоя до закрытия соединения
+HTTP_TIMEOUT = int(os.getenv("HTTP_TIMEOUT", "60"))  # сек на запрос по умолчанию
+
+# ffmpeg: сколько кодирований одновременно (0 = по квоте CPU контейнера)
+TRANSCODE_MAX_JOBS = int(os.getenv("TRANSCODE_MAX_JOBS", "0"))
+# Потоковые ffmpeg (энкодер TTS, аудио .dl) в основном ждут сеть — свой лимит, не CPU-слоты
+TRANSCODE_STREAM_JOBS = int(os.getenv("TRANSCODE_STREAM_JOBS", "4"))
+
 STOP_WORDS = {
     'и', 'в', 'во', 'не', 'на', 'я', 'с', 'со', 'он', 'она', 'оно', 'они', 'а', 'но',
     'да', 'нет', 'к', 'у', 'по', 'за', 'от', 'о', 'из', 'ну', 'ты', 'мы', 'вы',
@@ -102,6 +165,12 @@ AVAILABLE_TTS_MODELS = {
     "2": "gemini-2.5-flash-preview-tts",
 }
 
+DIALOG_ENGINES = {
+    "auto": "Авто (по репликам, если спикеров больше двух)",
+    "multi": "Мультиспикерная модель (один запрос, до 2 спикеров)",
+    "lines": "По репликам (параллельно, любое число спикеров)",
+}
+
 VOICE_NAMES_LIST = [
     "Puck", "Zephyr", "Fenrir", "Leda", "Charon", "Aoede",
     "Orus", "Autonoe", "Algenib", "Erinome", "Enceladus", "Kore"
@@ -112,6 +181,7 @@ HELP_DICT = {
         "`.ai` / `.аи` _[запрос]_": "Разовый вопрос к Gemini.",
         "`.chat` / `.чат` _[текст]_": "Диалог с памятью контекста.",
         "`.text` / `.stt` _(Reply)_": "Распознать ГС/Видео в текст.",
+        "`.autostt` _[on/reply/off]_": "Фоновая расшифровка входящих ГС и кружков в этом чате (reply — с ответом).",
         "`.ait` _[тема]_": "Статья на вашем Web-сервере.",
         "`.chatt` _[текст]_": "Ответ чата в виде Web-статьи.",
         "`.model` / `.модель`": "Выбор модели.",
@@ -119,11 +189,12 @@ HELP_DICT = {
         "`.reset`": "Сброс памяти диалога."
     },
     "🔊 **Звук (Voice):**": {
-        "`.say` / `.скажи` _[текст]_": "Озвучить текст (ГС).",
+        "`.say` / `.скажи` _[текст]_": "Озвучить текст (ГС). Длинный текст озвучивается кусками параллельно.",
         "`.saywav` _[текст]_": "Озвучить текст (WAV файл).",
         "`.voice` / `.голос`": "Выбор голоса.",
         "`.ttsmodel`": "Выбор движка TTS.",
         "`.dialog` / `.t`": "Озвучить диалог по ролям.",
+        "`.dialogengine` _[auto/multi/lines]_": "Движок диалогов: один запрос (до 2 спикеров) или по репликам параллельно.",
         "`.podcast`": "Создать и озвучить подкаст."
     },
     "🎨 **Генерация:**": {
@@ -131,10 +202,10 @@ HELP_DICT = {
         "`.flux` [промпт]": "Flux.1 (Pollinations)."
     },
     "🛠 **Инструменты:**": {
-        "`.stat`": "Аналитика чата.",
+        "`.stat` _[периоды] [@чаты]_": "Аналитика чата (`.stat 1 7 30 @chat1 -100123`, `.stat resume [id]`).",
         "`.cal`": "Калькулятор.",
         "`.cur`": "Конвертер валют.",
-        "`.dl`": "Скачать медиа.",
+        "`.dl` _[0/1/2] ссылка_": "Скачать медиа (0 — лучшее, 1 — 480p, 2 — MP3). `.dl info ссылка` — превью и размеры.",
         "`.olx`": "Парсинг OLX.",
         "`.sys`": "Статус сервера.",
         "`.s`": "Удалить пробелы."
@@ -3,7 +3,7 @@ import json
 from pyrogram import Client, filters
 from src.services import edit_or_reply, get_sys_info, update_help_page
 from src.state import SETTINGS, save_settings, ASYNC_CHAT_SESSIONS
-from src.config import AVAILABLE_MODELS, AVAILABLE_VOICES, AVAILABLE_TTS_MODELS, HELP_DICT
+from src.config import AVAILABLE_MODELS, AVAILABLE_VOICES, AVAILABLE_TTS_MODELS, DIALOG_ENGINES, HELP_DICT
 from src.access_filters import AccessFilter
 
 
@@ -109,6 +109,25 @@ async def tts_model_handler(client, message):
         await message.edit("❌ Неверно.")
 
 
+@Client.on_message(filters.me & filters.command(["dialogengine", "движокдиалога"], prefixes="."))
+async def dialog_engine_handler(client, message):
+    args = message.text.split()
+    curr = SETTINGS.get("dialog_engine", "auto")
+    if len(args) < 2:
+        text = "🎭 **Движок диалогов:**\n\n"
+        for k, v in DIALOG_ENGINES.items():
+            mark = "✅" if k == curr else ""
+            text += f"`{k}` — {v} {mark}\n"
+        return await message.edit(text)
+
+    if args[1] in DIALOG_ENGINES:
+        SETTINGS["dialog_engine"] = args[1];
+        save_settings()
+        await message.edit(f"✅ Движок диалогов: `{DIALOG_ENGINES[args[1]]}`")
+    else:
+        await message.edit("❌ Неверно.")
+
+
 @Client.on_message(filters.me & filters.command(["bl", "block", "чс"], prefixes="."))
 async def block_handler(client, message):
     try:
@@ -1,16 +1,22 @@
-import os
+import asyncio
+import time
 from pyrogram import Client, filters
 from src.services import (
     edit_or_reply, smart_reply, get_message_context,
     ask_gemini_oneshot, ask_gemini_chat, generate_gemini_tts,
-    convert_wav_to_ogg, transcribe_via_gemini, generate_multispeaker_tts,
+    transcribe_via_gemini, generate_multispeaker_tts,
     generate_imagen, generate_flux, get_gemini_stream
 )
 from src.services.utils import handle_stream_output
-from src.state import SETTINGS, ASYNC_CHAT_SESSIONS
-from src.config import AVAILABLE_MODELS, AVAILABLE_VOICES, VOICE_NAMES_LIST
+from src.state import SETTINGS, ASYNC_CHAT_SESSIONS, save_settings
+from src.config import AVAILABLE_MODELS, AVAILABLE_VOICES, VOICE_NAMES_LIST, TTS_MAX_CHARS, TTS_GUEST_MAX_CHARS
 from src.access_filters import AccessFilter
 from src.services.local_web import save_to_local_web
+from src.services.tts_cache import send_cached_audio
+from src.services.speech import format_transcript, preprocess_audio, transcribe_bytes, is_short_voice
+from src.services.transcript_cache import media_of, get_transcript, save_transcript
+from src.services import auto_stt
+from src.services.workspace import workspace
 import re
 
 
@@ -236,40 +242,35 @@ async def say_handler(client, message):
             final_text = user_text
 
         if not final_text: return await edit_or_reply(message, "🗣 Введите текст.")
+        final_text = final_text[:TTS_MAX_CHARS if message.outgoing else TTS_GUEST_MAX_CHARS]
 
         v_name = AVAILABLE_VOICES.get(SETTINGS.get("voice_key", "1"))["name"]
         status = await edit_or_reply(message, f"🗣 {v_name} генерирует...")
 
-        # Генерируем WAV
-        wav_path = await generate_gemini_tts(final_text[:4000])
+        # Генерируем аудио сразу в памяти (OGG для голосового, WAV для файла)
+        audio = await generate_gemini_tts(final_text, output="wav" if send_as_file else "ogg")
 
-        if wav_path and os.path.exists(wav_path):
+        if audio:
             await status.edit("🗣 Отправка...")
 
             if send_as_file:
                 # Отправляем WAV как файл
-                await client.send_audio(
-                    message.chat.id,
-                    wav_path,
+                await send_cached_audio(
+                    client, "audio", message.chat.id,
+                    audio,
+                    duration=audio.duration,
                     title="Gemini TTS",
                     performer=v_name,
                     caption=f"🗣 **WAV Audio** ({v_name})"
                 )
             else:
-                # Конвертируем в OGG для голосового
-                ogg_path = await convert_wav_to_ogg(wav_path)
-                if ogg_path:
-                    await client.send_voice(
-                        message.chat.id,
-                        ogg_path,
-                        caption=f"🗣 **Voice** ({v_name})"
-                    )
-                    os.remove(ogg_path)
-                else:
-                    await status.edit("⚠️ Ошибка конвертации ffmpeg. Отправляю WAV.")
-                    await client.send_audio(message.chat.id, wav_path)
-
-            os.remove(wav_path)
+                await send_cached_audio(
+                    client, "voice", message.chat.id,
+                    audio,
+                    duration=audio.duration,
+                    caption=f"🗣 **Voice** ({v_name})"
+                )
+
             if message.outgoing: await message.delete()
             if status != message: await status.delete()
         else:
@@ -283,31 +284,128 @@ async def stt_handler(client, message):
     try:
         reply = message.reply_to_message
         # Проверяем наличие медиа
-        if not reply or not (reply.voice or reply.audio or reply.video or reply.video_note):
+        media = media_of(reply)
+        if not media:
             return await edit_or_reply(message, "⚠️ Ответьте на голосовое, аудио или видео.")
 
-        status = await edit_or_reply(message, "👂 Скачиваю файл...")
-        path = await client.download_media(reply)
+        # Тот же файл (пересланный, у другого юзера) уже распознавали — без скачивания
+        cached = await get_transcript(media.file_unique_id)
+        if cached:
+            return await smart_reply(message, format_transcript(cached), title="Transcription")
+
+        # Файл уже расшифровывается (фоновым .autostt или другим .stt) — дожидаемся его
+        pending = auto_stt.running_job(media.file_unique_id)
+        if pending:
+            status = await edit_or_reply(message, "🧠 Уже распознаю в фоне...")
+            try:
+                res = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Отменили фоновое задание (остановка воркера) — распознаем сами;
+                # отмену самого .stt пробрасываем дальше
+                if not pending.cancelled(): raise
+                res = {"error": "cancelled"}
+            if "error" not in res:
+                return await smart_reply(status, format_transcript(res), title="Transcription")
+
+        # Файл еще ждет в очереди .autostt — забираем задание себе, воркер его пропустит
+        claimed = auto_stt.claim_job(media.file_unique_id)
+        res = None
+        try:
+            async with auto_stt.interactive():
+                res = await _stt_transcribe(client, message, reply, media)
+        finally:
+            if claimed:
+                auto_stt.release_job(media.file_unique_id, res)
+    except Exception as e:
+        await edit_or_reply(message, f"Err: {e}")
 
-        await status.edit("🧠 Распознаю речь...")
-        res = await transcribe_via_gemini(path)
 
-        # Удаляем сразу
-        if os.path.exists(path): os.remove(path)
+async def _stt_transcribe(client, message, reply, media):
+    """Распознает медиа из reply, отвечает в чат и возвращает результат."""
+    # Короткие голосовые: в память и inline в запрос, без диска, ffmpeg и File API
+    if is_short_voice(reply):
+        status = await edit_or_reply(message, "🧠 Распознаю речь...")
+        buf = await client.download_media(reply, in_memory=True)
+        res = await transcribe_bytes(bytes(buf.getbuffer()), media.mime_type or "audio/ogg")
+        if "error" in res:
+            await status.edit(f"❌ Ошибка: {res['error']}")
+            return res
+        await save_transcript(media.file_unique_id, res)
+        await smart_reply(status, format_transcript(res), title="Transcription")
+        return res
+
+    status = await edit_or_reply(message, "👂 Скачиваю файл...")
+    # Файл живет в папке задания и удаляется вместе с ней (даже при ошибке)
+    async with workspace("stt") as ws:
+        path = await client.download_media(reply, file_name=f"{ws.dir}/")
+
+        await status.edit("🎛 Готовлю аудио...")
+        prepared = await preprocess_audio(path)
+        report = prepared.summary()
+        await status.edit(f"🧠 Распознаю речь...\n{report}".strip())
+
+        # Длинные записи распознаются частями — показываем готовый префикс
+        last_edit = 0
+
+        async def on_partial(partial, done, total):
+            nonlocal last_edit
+            if time.time() - last_edit < 3: return
+            last_edit = time.time()
+            text = format_transcript(partial)
+            await status.edit(f"🧠 Распознано частей: {done}/{total}\n\n{text[-3500:]}")
+
+        res = await transcribe_via_gemini(path, on_partial=on_partial, prepared=prepared)
+
+    if "error" in res:
+        await status.edit(f"❌ Ошибка: {res['error']}")
+        return res
+    await save_transcript(media.file_unique_id, res)
+
+    # Форматирование результата
+    out = format_transcript(res)
+
+    await smart_reply(status, out, title="Transcription")
+    return res
+
+
+@Client.on_message(filters.me & filters.command(["autostt", "автотекст"], prefixes="."))
+async def autostt_handler(client, message):
+    chats = SETTINGS.setdefault("autostt_chats", {})
+    key = str(message.chat.id)
+    args = message.text.split()
+
+    if len(args) < 2:
+        curr = chats.get(key)
+        mode = "выкл" if not curr else ("с ответом" if curr.get("reply") else "тихо (в кэш)")
+        return await message.edit(
+            f"🎙 **Авторасшифровка:** `{mode}`\n"
+            f"В очереди: `{auto_stt.queue_size()}`\n\n"
+            "`.autostt on` — тихо, `.autostt reply` — с ответом, `.autostt off`"
+        )
 
-        if "error" in res: return await status.edit(f"❌ Ошибка: {res['error']}")
+    mode = args[1].lower()
+    if mode in ("on", "reply"):
+        chats[key] = {"reply": mode == "reply"}
+    elif mode == "off":
+        chats.pop(key, None)
+    else:
+        return await message.edit("❌ Неверно.")
+    save_settings()
+    await message.edit(f"✅ Авторасшифровка: `{mode}`")
 
-        # Форматирование результата
-        out = f"📝 **Суть:** {res.get('summary', '-')}\n\n"
 
-        emojis = {"Happy": "😄", "Sad": "😔", "Angry": "😡", "Neutral": "😐", "Excited": "🤩", "Serious": "🤔"}
-        for s in res.get('segments', []):
-            emo = emojis.get(s.get('emotion'), "🗣")
-            out += f"`{s.get('time')}` {emo} **{s.get('speaker')}:** {s.get('text')}\n"
+async def _autostt_enabled(_, __, message):
+    return auto_stt.chat_settings(message.chat.id) is not None
 
-        await smart_reply(status, out, title="Transcription")
-    except Exception as e:
-        await edit_or_reply(message, f"Err: {e}")
+
+# group=1: не мешает командам; только входящие ГС и кружки в включенных чатах
+@Client.on_message(
+    (filters.voice | filters.video_note) & filters.incoming & filters.create(_autostt_enabled) & AccessFilter,
+    group=1
+)
+async def autostt_watcher(client, message):
+    if not auto_stt.enqueue(client, message):
+        print(f"⚠️ AutoSTT queue full, skipped {message.chat.id}/{message.id}")
 
 
 @Client.on_message(filters.command(["dialog", "диалог", "t"], prefixes=".") & AccessFilter)
@@ -348,21 +446,19 @@ async def dialog_handler(client, message):
             # Удаляем строку настроек
             script = "\n".join(lines[1:])
 
-        wav_path = await generate_multispeaker_tts(script, cast)
+        audio = await generate_multispeaker_tts(script, cast)
 
-        if wav_path:
+        if audio:
             await status.edit("🎭 Отправка...")
-            ogg_path = await convert_wav_to_ogg(wav_path)
 
             desc = ", ".join([f"{k}={v}" for k, v in cast.items()]) if cast else "Auto-Cast"
-            await client.send_voice(
-                message.chat.id,
-                ogg_path if ogg_path else wav_path,
+            await send_cached_audio(
+                client, "voice", message.chat.id,
+                audio,
+                duration=audio.duration,
                 caption=f"🎭 **Dialogue** ({desc})"
             )
 
-            if ogg_path: os.remove(ogg_path)
-            os.remove(wav_path)
             if message.outgoing: await message.delete()
             if status != message: await status.delete()
         else:
@@ -393,17 +489,15 @@ async def podcast_handler(client, message):
 
         # 2. Озвучиваем (Жесткий кастинг для подкаста)
         cast = {"1": "Puck", "2": "Aoede"}
-        wav_path = await generate_multispeaker_tts(script_clean, cast)
+        audio = await generate_multispeaker_tts(script_clean, cast)
 
-        if wav_path:
-            ogg_path = await convert_wav_to_ogg(wav_path)
-            await client.send_voice(
-                message.chat.id,
-                ogg_path if ogg_path else wav_path,
+        if audio:
+            await send_cached_audio(
+                client, "voice", message.chat.id,
+                audio,
+                duration=audio.duration,
                 caption=f"🎙 **AI Podcast**\nТема: {topic}"
             )
-            if ogg_path: os.remove(ogg_path)
-            os.remove(wav_path)
             if message.outgoing: await message.delete()
             if status != message: await status.delete()
         else:
@@ -423,17 +517,19 @@ async def imagen_handler(client, message):
 
         status = await edit_or_reply(message, "🎨 **Imagen 3** рисует...")
 
-        # Запускаем генерацию
-        file_path, error = await generate_imagen(prompt)
+        # Запускаем генерацию (файл — в папке задания, удаляется вместе с ней)
+        async with workspace("img") as ws:
+            file_path, error = await generate_imagen(prompt, workdir=ws.dir)
+
+            if file_path:
+                await status.edit("🎨 Отправляю...")
+                await client.send_photo(
+                    message.chat.id,
+                    photo=file_path,
+                    caption=f"🎨 **Imagen 3**\n`{prompt}`"
+                )
 
         if file_path:
-            await status.edit("🎨 Отправляю...")
-            await client.send_photo(
-                message.chat.id,
-                photo=file_path,
-                caption=f"🎨 **Imagen 3**\n`{prompt}`"
-            )
-            os.remove(file_path)
             if message.outgoing: await message.delete()
             if status != message: await status.delete()
         else:
@@ -454,17 +550,19 @@ async def flux_handler(client, message):
 
         status = await edit_or_reply(message, "🎨 **Flux** рисует...")
 
-        # Запускаем генерацию
-        file_path, error = await generate_flux(prompt)
+        # Запускаем генерацию (файл — в папке задания, удаляется вместе с ней)
+        async with workspace("flux") as ws:
+            file_path, error = await generate_flux(prompt, workdir=ws.dir)
+
+            if file_path:
+                await status.edit("🎨 Отправляю...")
+                await client.send_photo(
+                    message.chat.id,
+                    photo=file_path,
+                    caption=f"🎨 **Flux.1**\n`{prompt}`"
+                )
 
         if file_path:
-            await status.edit("🎨 Отправляю...")
-            await client.send_photo(
-                message.chat.id,
-                photo=file_path,
-                caption=f"🎨 **Flux.1**\n`{prompt}`"
-            )
-            os.remove(file_path)
             if message.outgoing: await message.delete()
             if status != message: await status.delete()
         else:
@@ -1,6 +1,6 @@
-import aiohttp
 from pyrogram import Client, filters
 from src.services import edit_or_reply, save_to_local_web
+from src.services.http import get_session
 from src.access_filters import AccessFilter
 
 
@@ -9,22 +9,20 @@ LRCLIB_API_BASE = "https://lrclib.net/api"
 
 async def search_lyrics(query: str):
     """Поиск песни через LRCLIB API"""
-    async with aiohttp.ClientSession() as session:
-        params = {"q": query}
-        async with session.get(f"{LRCLIB_API_BASE}/search", params=params) as resp:
-            if resp.status == 200:
-                data = await resp.json()
-                return data if data else None
-            return None
+    params = {"q": query}
+    async with get_session().get(f"{LRCLIB_API_BASE}/search", params=params) as resp:
+        if resp.status == 200:
+            data = await resp.json()
+            return data if data else None
+        return None
 
 
 async def get_lyrics_by_id(track_id: int):
     """Получение текста песни по ID"""
-    async with aiohttp.ClientSession() as session:
-        async with session.get(f"{LRCLIB_API_BASE}/get/{track_id}") as resp:
-            if resp.status == 200:
-                return await resp.json()
-            return None
+    async with get_session().get(f"{LRCLIB_API_BASE}/get/{track_id}") as resp:
+        if resp.status == 200:
+            return await resp.json()
+        return None
 
 
 def format_lyrics_text(track_data: dict) -> str:
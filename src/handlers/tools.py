@@ -1,8 +1,13 @@
-import os
-import time
 import asyncio
 from pyrogram import Client, filters
-from src.services import edit_or_reply, get_currency, olx_parser, download_video, download_yandex_track, analyze_chat_history
+from pyrogram.errors import RPCError
+from pyrogram.types import InputMediaAudio
+from src.services import edit_or_reply, get_currency, olx_parser, analyze_chats
+from src.services import downloads, media_cache, metrics, uploads
+from src.services.progress import ProgressReporter
+from src.services.media import probe_video
+from src.services.workspace import workspace
+from src.services.stats_store import latest_unfinished_job
 from src.access_filters import AccessFilter
 
 
@@ -74,24 +79,71 @@ async def cur_handler(client, message):
         await edit_or_reply(message, f"Err: {e}")
 
 
+def parse_stat_period(param):
+    """Период из аргумента .stat: слово (день/неделя/год) или число дней."""
+    param = param.lower()
+    if "год" in param or "year" in param:
+        return 365
+    elif "недел" in param or "week" in param:
+        return 7
+    elif "день" in param or "day" in param:
+        return 1
+    elif "мес" in param or "month" in param:
+        return 30
+    elif param.isdigit():
+        return int(param)
+    return None
+
+
+def parse_stat_chat(param):
+    """Чат из аргумента .stat: @username, t.me/ссылка или числовой ID (-100...)."""
+    if param.startswith("@"):
+        return param[1:]
+    if "t.me/" in param:
+        return param.rstrip("/").split("/")[-1]
+    if param.startswith("-") and param[1:].isdigit():
+        return int(param)
+    return None
+
+
 @Client.on_message(filters.command(["stat", "стат", "анализ"], prefixes=".") & AccessFilter)
 async def stats_handler(client, message):
-    args = message.text.split()
-    days = 30  # По умолчанию месяц
-
-    if len(args) > 1:
-        param = args[1].lower()
-        if "год" in param or "year" in param:
-            days = 365
-        elif "недел" in param or "week" in param:
-            days = 7
-        elif "день" in param or "day" in param:
-            days = 1
-        elif param.isdigit():
-            days = int(param)
+    # .stat 1 7 30 @chat1 -100123 — несколько периодов и чатов за один проход
+    args = message.text.split()[1:]
+    # Чужие (AccessFilter) — только текущий чат: сканировать другие чаты
+    # аккаунтом владельца и продолжать его задания может только он сам
+    is_owner = message.outgoing
+
+    # .stat resume [job_id] — продолжить прерванный скан из чекпоинта
+    if args and args[0].lower() in ("resume", "продолжить"):
+        if not is_owner:
+            return await edit_or_reply(message, "⛔️ Продолжать задания может только владелец.")
+        job_id = args[1] if len(args) > 1 else latest_unfinished_job()
+        if not job_id:
+            return await edit_or_reply(message, "🤷‍♂️ Нет незавершенных заданий.")
+        return await analyze_chats(client, message, job_id=job_id)
+
+    periods = []
+    chat_ids = []
+
+    for param in args:
+        chat = parse_stat_chat(param)
+        if chat is not None:
+            if not is_owner:
+                return await edit_or_reply(message, "⛔️ Статистику других чатов может смотреть только владелец.")
+            chat_ids.append(chat)
+            continue
+        days = parse_stat_period(param)
+        if days:
+            periods.append(days)
+
+    if not periods:
+        periods = [30]  # По умолчанию месяц
+    if not chat_ids:
+        chat_ids = [message.chat.id]
 
     # Запускаем анализ
-    await analyze_chat_history(client, message, period_days=days)
+    await analyze_chats(client, message, chat_ids, periods)
 
 # --- УДАЛЕНИЕ ПРОБЕЛОВ ---
 @Client.on_message(filters.command(["s", "c", "с"], prefixes=".") & AccessFilter)
@@ -106,47 +158,114 @@ async def strip_handler(client, message):
 
 
 # --- ЗАГРУЗЧИК (Только админ) ---
+DL_MODE_NAMES = {0: "лучшее", 1: "480p", 2: "MP3"}
+
+
+async def dl_info(message, url):
+    """`.dl info ссылка` — что получится в каждом режиме, без скачивания."""
+    await message.edit("🔎 Смотрю, что по ссылке...")
+    preview = await probe_video(url)
+
+    text = f"🎬 **{preview['title']}**"
+    meta = []
+    if preview["uploader"]:
+        meta.append(f"👤 {preview['uploader']}")
+    if preview["duration"]:
+        m, s = divmod(int(preview["duration"]), 60)
+        meta.append(f"⏱ {m}:{s:02d}")
+    if meta:
+        text += "\n" + " · ".join(meta)
+
+    if preview["playlist"]:
+        text += "\n\n📃 Это плейлист — размеры по режимам не считаю."
+    else:
+        text += "\n"
+        for mode, name in DL_MODE_NAMES.items():
+            fmt = preview["modes"].get(mode)
+            if not fmt:
+                text += f"\n`{mode}` {name}: недоступно"
+                continue
+            quality = f"{fmt['height']}p {fmt['ext']}" if fmt["height"] else fmt["ext"]
+            size = f"~{fmt['size'] / 1024 / 1024:.1f} MB" if fmt["size"] else "размер неизвестен"
+            text += f"\n`{mode}` {name}: {quality}, {size}"
+        text += f"\n\n`.dl [режим] {url}`"
+    await message.edit(text, disable_web_page_preview=True)
+
+
 @Client.on_message(filters.me & filters.command(["dl", "скачать", "дл"], prefixes="."))
 async def dl_handler(client, message):
     args = message.text.split()
     if len(args) < 2:
         return await message.edit("❌ Ссылка?")
 
+    if len(args) > 2 and args[1].lower() in ("info", "инфо"):
+        try:
+            return await dl_info(message, args[-1])
+        except Exception as e:
+            return await message.edit(f"DL Info Error: {e}")
+
     url = args[-1]
     # Определение режима (0-best, 1-low, 2-audio)
     mode = 0
     if len(args) > 2 and args[1].isdigit():
         mode = int(args[1])
 
-    await message.edit("📥 Скачиваю на сервер...")
     try:
-        path = None
-        if "music.yandex" in url:
-            paths = await download_yandex_track(url)
+        # Ссылку уже загружали в Telegram — пересылаем по file_id без скачивания и загрузки
+        norm_url = downloads.normalize_url(url)
+        cached = await media_cache.get_file_id(client, norm_url, mode)
+        if cached:
+            file_id, size = cached
+            try:
+                await client.send_document(message.chat.id, file_id, caption="✅ Готово")
+                metrics.inc("dl_cache_bytes_saved", size)
+                return await message.delete()
+            except (RPCError, ValueError) as e:
+                # ValueError — file_id не документа (записи до force_document): забываем и качаем заново
+                print(f"DL Cache file_id Error: {e}")
+                await media_cache.forget(client, norm_url, mode)
+
+        await message.edit("📥 Скачиваю на сервер...")
+
+        # Общая очередь загрузок: лимит параллельных, одна загрузка на одинаковые ссылки
+        # Один статус на все стадии: очередь, скачивание, загрузка в Telegram
+        reporter = ProgressReporter(message.edit)
+        async with downloads.download(url, mode) as job:
+            watcher = asyncio.create_task(downloads.watch_progress(job, reporter))
+            try:
+                if "music.yandex" in url and "/album/" in url and "/track/" not in url:
+                    # Альбом: треки уходят пачками по 10 в порядке альбома, пока докачиваются остальные
+                    sent_tracks = 0
+                    async for batch in job.batches(10):
+                        if len(batch) == 1:
+                            await client.send_audio(message.chat.id, batch[0])
+                        else:
+                            await client.send_media_group(
+                                message.chat.id, [InputMediaAudio(path) for path in batch]
+                            )
+                        sent_tracks += len(batch)
+                    if not sent_tracks:
+                        return await message.edit("❌ Ошибка скачивания или файл не найден.")
+                    return await message.delete()
+
+                paths = await job.wait()
+            finally:
+                watcher.cancel()
+            # Путь к файлу или MP3 в памяти (режим 2)
             path = paths[0] if paths else None
-        else:
-            path = await download_video(url, mode)
-
-        if path and os.path.exists(path):
-            await message.edit("📤 Загружаю в Telegram...")
 
-            # Прогресс бар
-            last_update_time = 0
+            if path:
+                await reporter.update("📤 Загружаю в Telegram...", force=True)
 
-            async def progress(current, total):
-                nonlocal last_update_time
-                if time.time() - last_update_time > 2:
-                    percent = current * 100 / total
-                    try:
-                        await message.edit(f"📤 Загрузка: {percent:.1f}%"); last_update_time = time.time()
-                    except:
-                        pass
-
-            await client.send_document(message.chat.id, path, caption="✅ Готово", progress=progress)
-            os.remove(path)
-            await message.delete()
-        else:
-            await message.edit("❌ Ошибка скачивания или файл не найден.")
+                # Большие файлы — параллельными частями через несколько медиа-сессий
+                sent = await uploads.send_document(
+                    client, message.chat.id, path, caption="✅ Готово",
+                    progress=reporter.transfer("📤 Загрузка")
+                )
+                await media_cache.remember(client, norm_url, mode, sent)
+                await message.delete()
+            else:
+                await message.edit("❌ Ошибка скачивания или файл не найден.")
     except Exception as e:
         await message.edit(f"DL Fatal Error: {e}")
 
@@ -183,18 +302,18 @@ async def olx_handler(client, message):
         mode_text = "с картинками" if with_images else "без картинок (быстро)"
         await message.edit(f"🔍 Паршу OLX: **{query}**\n📄 Страниц: {max_pages}\n🚀 Режим: {mode_text}...")
 
-        f = await olx_parser(query, max_pages, with_images)
+        # xlsx и превью картинок — в папке задания, удаляются вместе с ней
+        async with workspace("olx") as ws:
+            f = await olx_parser(query, max_pages, with_images, workdir=ws.dir)
+
+            if f:
+                await client.send_document(
+                    message.chat.id,
+                    f,
+                    caption=f"📦 **Результаты OLX**\n🔎 Запрос: `{query}`\n📄 Страниц: {max_pages}"
+                )
 
         if f:
-            await client.send_document(
-                message.chat.id,
-                f,
-                caption=f"📦 **Результаты OLX**\n🔎 Запрос: `{query}`\n📄 Страниц: {max_pages}"
-            )
-            os.remove(f)
-            # Чистим временные картинки
-            for i in os.listdir():
-                if i.startswith("temp_img_") and i.endswith(".png"): os.remove(i)
             await message.delete()
         else:
             await message.edit("❌ Ничего не найдено или ошибка парсера.")
@@ -6,20 +6,23 @@ from pyrogram.errors import SessionPasswordNeeded, PasswordHashInvalid
 from src.config import API_ID, API_HASH, PHONES, MY_DOMAIN
 from src.services.auth_qr import login_via_qr
 from src.services.connection import check_internet as conn_check_internet, reconnect_client, check_client_health
+from src.services import http
+from src.services.workspace import sweeper as workspace_sweeper
 import uvicorn
 
 
 # ============== МОНИТОРИНГ СОЕДИНЕНИЯ ==============
 
+CHECK_TIMEOUT = aiohttp.ClientTimeout(total=5)
+
 async def check_internet() -> bool:
     """Быстрая проверка интернета через несколько DNS."""
     urls = ["https://www.google.com", "https://telegram.org", "https://1.1.1.1"]
     for url in urls:
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
-                async with session.get(url) as resp:
-                    if resp.status == 200:
-                        return True
+            async with http.get_session().get(url, timeout=CHECK_TIMEOUT) as resp:
+                if resp.status == 200:
+                    return True
         except:
             continue
     return False
@@ -177,8 +180,12 @@ async def start_web_server():
 # ============== MAIN ==============
 
 async def main():
+    # Общий HTTP-пул (keep-alive, DNS-кэш) для всех сервисов
+    await http.start()
     # ЭТАП 0: ЗАПУСК ВЕБ-СЕРВЕРА
     web_task = asyncio.create_task(start_web_server())
+    # Уборка рабочих папок: сразу (остатки прошлого запуска) и по таймеру
+    sweep_task = asyncio.create_task(workspace_sweeper())
 
     try:
         if not os.path.exists("sessions"):
@@ -250,12 +257,14 @@ async def main():
                     await app.stop()
 
     finally:
-        # Останавливаем веб-сервер при выходе из main
+        # Останавливаем веб-сервер, уборщик и HTTP-пул при выходе из main
+        sweep_task.cancel()
         web_task.cancel()
         try:
             await web_task
         except asyncio.CancelledError:
             pass
+        await http.close_all()
 
 
 if __name__ == "__main__":
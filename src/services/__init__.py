@@ -5,6 +5,6 @@ from .speech import transcribe_via_gemini
 from .local_web import save_to_local_web
 from .web import update_help_page, olx_parser, get_currency, get_sys_info
 from .media import download_video, download_yandex_track
-from .analytics import analyze_chat_history
+from .analytics import analyze_chat_history, analyze_chats
 from .image_gen import generate_imagen, generate_flux
 from .connection import check_internet, wait_for_internet, reconnect_client, check_client_health
\ No newline at end of file
@@ -0,0 +1,259 @@
+import json
+from array import array
+from bisect import bisect_right
+from datetime import date
+
+from src.services import stats_store
+
+HOURS_IN_WEEK = 7 * 24
+
+
+def _zeros(n):
+    return array('I', bytes(4 * n))
+
+
+def _add_into(dst, src):
+    """dst += src поэлементно (dst не короче src)."""
+    for i, v in enumerate(src):
+        if v: dst[i] += v
+
+
+def union_ranges(ranges):
+    """Объединяет отрезки id [lo, hi] в отсортированный список непересекающихся."""
+    result = []
+    for lo, hi in sorted(ranges):
+        if result and lo <= result[-1][1] + 1:
+            result[-1][1] = max(result[-1][1], hi)
+        else:
+            result.append([lo, hi])
+    return result
+
+
+def covers(ranges, mid):
+    """Попадает ли id в один из отрезков (ranges отсортированы и не пересекаются)."""
+    i = bisect_right(ranges, [mid, float("inf")]) - 1
+    return i >= 0 and mid <= ranges[i][1]
+
+
+def _contains(outer, inner):
+    """Каждый отрезок inner целиком лежит в одном из отрезков outer."""
+    for lo, hi in inner:
+        i = bisect_right(outer, [lo, float("inf")]) - 1
+        if i < 0 or hi > outer[i][1]:
+            return False
+    return True
+
+
+class ActivitySeries:
+    """
+    Ряды активности чата в компактных массивах array('I'):
+    - hour_week: 168 ячеек (день недели × час) для тепловой карты;
+    - daily: сообщений за день, индекс 0 = day0 (самый свежий день), дальше в прошлое;
+    - users: {user_id: array} с той же индексацией, что и daily.
+    ranges — отрезки id сообщений [lo, hi], которые покрывают ряды: повторный скан
+    не считает их второй раз. Сканы в разное время могут оставить между отрезками дыры —
+    они не считаются покрытыми, и следующий скан, дошедший до них, их досчитает.
+    """
+
+    def __init__(self):
+        self.hour_week = _zeros(HOURS_IN_WEEK)
+        self.day0 = None
+        self.daily = array('I')
+        self.users = {}
+        self.names = {}
+        self.ranges = []
+
+    def _shift(self, days):
+        """Сдвигает day0 вперед на days дней (в начало рядов дописываются нули)."""
+        self.day0 += days
+        self.daily[0:0] = _zeros(days)
+        for arr in self.users.values():
+            arr[0:0] = _zeros(days)
+
+    def _slot(self, arr, idx):
+        if idx >= len(arr):
+            arr.extend(_zeros(idx + 1 - len(arr)))
+
+    def add(self, msg, known=None):
+        """
+        Учитывает сообщение скана, если оно не попадает в уже посчитанные отрезки known.
+        Скан идет по истории подряд, поэтому его покрытие — один отрезок.
+        """
+        mid = msg.id
+        if not self.ranges:
+            self.ranges.append([mid, mid])
+        else:
+            span = self.ranges[0]
+            if mid < span[0]: span[0] = mid
+            elif mid > span[1]: span[1] = mid
+        if known and covers(known, mid):
+            return
+
+        d = msg.date
+        ordinal = d.toordinal()
+        if self.day0 is None:
+            self.day0 = ordinal
+        elif ordinal > self.day0:
+            self._shift(ordinal - self.day0)
+        idx = self.day0 - ordinal
+
+        self.hour_week[d.weekday() * 24 + d.hour] += 1
+        self._slot(self.daily, idx)
+        self.daily[idx] += 1
+
+        user = msg.from_user
+        if user:
+            arr = self.users.get(user.id)
+            if arr is None:
+                arr = self.users[user.id] = array('I')
+                self.names[user.id] = user.first_name or user.username or "NoName"
+            self._slot(arr, idx)
+            arr[idx] += 1
+
+    def merge(self, other):
+        """Добавляет ряды другого объекта (выравнивая по day0)."""
+        if other.day0 is not None:
+            if self.day0 is None:
+                self.day0 = other.day0
+            elif other.day0 > self.day0:
+                self._shift(other.day0 - self.day0)
+            offset = self.day0 - other.day0
+
+            _add_into(self.hour_week, other.hour_week)
+            self._slot(self.daily, offset + len(other.daily) - 1)
+            _add_into(memoryview(self.daily)[offset:], other.daily)
+            for uid, src in other.users.items():
+                arr = self.users.setdefault(uid, array('I'))
+                self._slot(arr, offset + len(src) - 1)
+                _add_into(memoryview(arr)[offset:], src)
+                self.names[uid] = other.names.get(uid) or self.names.get(uid, "NoName")
+
+        self.ranges = union_ranges(self.ranges + other.ranges)
+        return self
+
+    # --- Сериализация: чекпоинт (JSON) ---
+
+    def to_dict(self):
+        return {
+            "day0": self.day0,
+            "ranges": self.ranges,
+            "hour_week": self.hour_week.tolist(),
+            "daily": self.daily.tolist(),
+            "users": {str(uid): arr.tolist() for uid, arr in self.users.items()},
+            "names": {str(uid): n for uid, n in self.names.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        series = cls()
+        series.day0 = data["day0"]
+        if "ranges" in data:
+            series.ranges = data["ranges"]
+        elif data.get("min_id") is not None:
+            # Чекпоинт v2: покрытие одним диапазоном
+            series.ranges = [[data["min_id"], data["max_id"]]]
+        series.hour_week = array('I', data["hour_week"])
+        series.daily = array('I', data["daily"])
+        series.users = {int(uid): array('I', v) for uid, v in data["users"].items()}
+        series.names = {int(uid): n for uid, n in data["names"].items()}
+        return series
+
+    # --- Сериализация: хранилище (BLOB) ---
+
+    @classmethod
+    def from_store(cls, row):
+        series = cls()
+        series.day0 = row["day0"]
+        series.ranges = stored_ranges(row)
+        series.hour_week = array('I', row["hour_week"])
+        series.daily = array('I', row["daily"])
+        for uid, name, blob in row["users"]:
+            series.users[uid] = array('I', blob)
+            series.names[uid] = name
+        return series
+
+    def to_store(self, chat_id, title):
+        return {
+            "chat_id": chat_id,
+            "title": title,
+            "min_id": self.ranges[0][0] if self.ranges else None,
+            "max_id": self.ranges[-1][1] if self.ranges else None,
+            "ranges": json.dumps(self.ranges),
+            "day0": self.day0,
+            "hour_week": self.hour_week.tobytes(),
+            "daily": self.daily.tobytes(),
+            "users": [(uid, self.names.get(uid, "NoName"), arr.tobytes()) for uid, arr in self.users.items()],
+        }
+
+
+def stored_ranges(row):
+    """Отрезки покрытия из строки chat_series (до колонки ranges — один диапазон min_id..max_id)."""
+    if row.get("ranges"):
+        return json.loads(row["ranges"])
+    if row.get("min_id") is not None:
+        return [[row["min_id"], row["max_id"]]]
+    return []
+
+
+def known_ranges(chat_id):
+    """Отрезки id сообщений, уже учтенных в рядах чата (пустой список, если рядов нет)."""
+    row = stats_store.load_series_meta(chat_id)
+    return stored_ranges(row) if row else []
+
+
+def merge_into_store(chat_id, title, series):
+    """
+    Вливает ряды свежего скана в хранилище: дневные массивы складываются
+    (скан пропускал уже учтенные id, так что двойного счета нет), отрезки
+    покрытия объединяются. Если скан не дошел до уже посчитанного отрезка,
+    дыра между ними остается непокрытой и досчитается следующим сканом.
+    Скан, уже целиком покрытый хранилищем, повторно не вливается.
+    """
+    if not series.ranges:
+        return
+    row = stats_store.load_series(chat_id)
+    if row and row["day0"] is not None:
+        stored = ActivitySeries.from_store(row)
+        if _contains(stored.ranges, series.ranges):
+            # Ряды этого скана уже влиты (упали между слиянием и сохранением
+            # чекпоинта) или новых сообщений нет
+            return
+        series = stored.merge(series)
+    stats_store.save_series(series.to_store(chat_id, title))
+
+
+def series_title(chat_id):
+    """Название чата из хранилища рядов (или None, если рядов нет)."""
+    row = stats_store.load_series_meta(chat_id)
+    return row["title"] if row and row["day0"] is not None else None
+
+
+def series_payload(chat_id, top_users=10):
+    """JSON для клиентских графиков (только из хранилища, без сканирования истории)."""
+    row = stats_store.load_series(chat_id)
+    if not row or row["day0"] is None:
+        return None
+    series = ActivitySeries.from_store(row)
+
+    # На клиент отдаем дни в хронологическом порядке
+    days = len(series.daily)
+    first_day = date.fromordinal(series.day0 - days + 1)
+
+    users = sorted(series.users.items(), key=lambda kv: sum(kv[1]), reverse=True)[:top_users]
+    return {
+        "chat_id": chat_id,
+        "title": row["title"],
+        "start": first_day.isoformat(),
+        "hour_week": series.hour_week.tolist(),
+        "daily": series.daily[::-1].tolist(),
+        "users": [
+            {
+                "id": uid,
+                "name": series.names.get(uid, "NoName"),
+                "total": sum(arr),
+                # Дополняем до общей длины и переворачиваем в хронологию
+                "daily": (arr + _zeros(days - len(arr)))[::-1].tolist(),
+            }
+            for uid, arr in users
+        ],
+    }
@@ -6,6 +6,8 @@ from src.state import SETTINGS, ASYNC_CHAT_SESSIONS
 # Глобальный индекс текущего ключа и активный клиент
 current_key_index = 0
 _active_client = None
+# Клиенты по индексу ключа — для параллельных запросов на разных ключах
+_key_clients = {}
 
 
 def init_client():
@@ -88,6 +90,42 @@ async def rotate_key_and_retry(func, *args, **kwargs):
     raise Exception(f"All {max_retries} API keys exhausted. Last error: {last_error}")
 
 
+def get_key_client(index):
+    """Клиент для конкретного ключа (кэшируется). Глобальный current_key_index не трогает."""
+    index %= len(GEMINI_KEYS)
+    if index not in _key_clients:
+        _key_clients[index] = genai.Client(api_key=GEMINI_KEYS[index])
+    return _key_clients[index]
+
+
+async def run_on_key(func, start_index=0):
+    """
+    Как rotate_key_and_retry, но для параллельных задач: func(client) пробует ключи
+    по кругу, начиная с start_index, не переключая общий ключ остальным запросам.
+    """
+    max_retries = len(GEMINI_KEYS)
+    if max_retries == 0:
+        raise Exception("No API Keys configured")
+
+    last_error = None
+    for attempt in range(max_retries):
+        index = (start_index + attempt) % max_retries
+        try:
+            return await func(get_key_client(index))
+        except errors.APIError as e:
+            if e.code in [429, 503] or "429" in str(e) or "quota" in str(e).lower():
+                print(f"⚠️ Key #{index} Limit Hit ({e.message}...). Trying next key...")
+                last_error = e
+                continue
+            raise e
+        except Exception as e:
+            print(f"⚠️ Network/Unknown Error on Key #{index}: {e}")
+            last_error = e
+            continue
+
+    raise Exception(f"All {max_retries} API keys exhausted. Last error: {last_error}")
+
+
 # --- AI LOGIC (HELPERS) ---
 async def get_gemini_stream(chat_id, contents, is_chat=False):
     """
@@ -1,12 +1,30 @@
 import asyncio
+import heapq
+import json
 import re
 import time
 from datetime import datetime, timedelta
 from collections import Counter
 from pyrogram.errors import FloodWait
 
-from src.config import STOP_WORDS, BAD_EXACT, BAD_STARTS, BAD_CONTAINS
+from src.config import (
+    STOP_WORDS, BAD_EXACT, BAD_STARTS, BAD_CONTAINS,
+    STATS_MAX_PARALLEL_CHATS, STATS_CHECKPOINT_INTERVAL, STATS_MAX_FLOOD_WAIT, MY_DOMAIN
+)
 from src.services.utils import edit_or_reply, smart_reply
+from src.services import stats_store
+from src.services.classifier import classify_message
+from src.services.activity import ActivitySeries, known_ranges, merge_into_store
+
+# Сколько сообщений забираем за один запрос GetHistory (максимум Telegram)
+HISTORY_PAGE_SIZE = 100
+
+# Подписи типов медиа в отчете (ключи — MessageMediaType.value)
+MEDIA_LABELS = {
+    "photo": "🖼 Фото", "video": "🎬 Видео", "animation": "🎞 GIF", "sticker": "🎭 Стикеры",
+    "voice": "🎙 ГС", "video_note": "⭕️ Кружки", "audio": "🎵 Аудио", "document": "📎 Файлы",
+    "poll": "📊 Опросы", "location": "📍 Гео", "contact": "👤 Контакты",
+}
 
 
 def format_duration(seconds):
@@ -27,157 +45,584 @@ def format_duration(seconds):
     return " ".join(parts)
 
 
-async def analyze_chat_history(client, message, period_days=30):
+# Все корни мата одной регуляркой: BAD_STARTS — с начала слова, BAD_CONTAINS — где угодно
+BAD_ROOTS_PATTERN = re.compile(
+    "^(?:" + "|".join(map(re.escape, BAD_STARTS)) + ")|" + "|".join(map(re.escape, BAD_CONTAINS))
+)
+
+
+def is_bad_word(word):
+    """Проверка слова по спискам мата (точное совпадение, корни в начале и внутри)."""
+    return word in BAD_EXACT or BAD_ROOTS_PATTERN.search(word) is not None
+
+
+class FloodLimiter:
     """
-    Анализирует историю чата: слова, мат, активность, ГС и СМЕХ.
+    Общий лимитер запросов истории для нескольких чатов.
+    Ограничивает число одновременных запросов и при FloodWait
+    ставит на паузу ВСЕ сканы, а не только тот, который его поймал.
     """
-    chat_id = message.chat.id
-    start_date = datetime.now() - timedelta(days=period_days)
 
-    # Счетчики
-    total_messages = 0
-    total_voice_seconds = 0
+    def __init__(self, concurrency=STATS_MAX_PARALLEL_CHATS):
+        self._sem = asyncio.Semaphore(concurrency)
+        self._resume_at = 0.0
 
-    words_counter = Counter()
-    bad_words_counter = Counter()
-    users_msg_counter = Counter()
-    users_voice_counter = Counter()
-    users_laugh_counter = Counter()  # <--- НОВОЕ: Счетчик смеха
+    def flood(self, seconds):
+        """Регистрирует FloodWait: никто не ходит в API до истечения паузы."""
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds + 1)
 
-    # Паттерн смеха: допускаем только эти буквы и символы от начала до конца строки
-    # Рус: х, а, п, з, в, ъ, э, ж, о, л
-    # Англ: h, a, x, j, l, o
-    # Символы: ) ( - и пробел
-    laugh_pattern = re.compile(r"^[хахэпзвъжолhaxjlo\)\(\-\s]+$", re.IGNORECASE)
+    async def __aenter__(self):
+        await self._sem.acquire()
+        # Ждем уже внутри слота, чтобы после паузы не ломиться всем сразу
+        while (delay := self._resume_at - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+        return self
 
-    status_msg = await edit_or_reply(message, f"📊 Кеширую чат и начинаю анализ ({period_days} дн)...")
+    async def __aexit__(self, exc_type, exc, tb):
+        self._sem.release()
 
-    try:
-        await client.get_chat(chat_id)
-    except:
-        pass
 
-    last_update_time = time.time()
+class UserStats:
+    """
+    Счетчики одного участника. Ключ — user id (не имя: тезки не склеиваются),
+    __slots__ — без per-object __dict__ на каждого участника большого чата.
+    """
+    __slots__ = ("messages", "voice_seconds", "laughs")
+
+    def __init__(self, messages=0, voice_seconds=0, laughs=0):
+        self.messages = messages
+        self.voice_seconds = voice_seconds
+        self.laughs = laughs
+
+    def merge(self, other):
+        self.messages += other.messages
+        self.voice_seconds += other.voice_seconds
+        self.laughs += other.laughs
+
+
+class StatsBucket:
+    """Счетчики статистики для одного окна (или его части)."""
+
+    def __init__(self):
+        self.total_messages = 0
+        self.total_voice_seconds = 0
+        self.words = Counter()
+        self.bad_words = Counter()
+        self.emojis = Counter()
+        self.reactions = Counter()
+        self.stickers = Counter()  # эмодзи стикеров
+        self.media = Counter()  # тип медиа -> кол-во
+        self.links = 0
+        self.users = {}  # user_id -> UserStats
+
+    def merge(self, other):
+        """Добавляет счетчики другого бакета в этот."""
+        self.total_messages += other.total_messages
+        self.total_voice_seconds += other.total_voice_seconds
+        self.words.update(other.words)
+        self.bad_words.update(other.bad_words)
+        self.emojis.update(other.emojis)
+        self.reactions.update(other.reactions)
+        self.stickers.update(other.stickers)
+        self.media.update(other.media)
+        self.links += other.links
+        for uid, rec in other.users.items():
+            mine = self.users.get(uid)
+            if mine is None:
+                mine = self.users[uid] = UserStats()
+            mine.merge(rec)
+        return self
+
+    def to_dict(self):
+        return {
+            "messages": self.total_messages,
+            "voice": self.total_voice_seconds,
+            "words": self.words,
+            "bad_words": self.bad_words,
+            "emojis": self.emojis,
+            "reactions": self.reactions,
+            "stickers": self.stickers,
+            "media": self.media,
+            "links": self.links,
+            "users": {str(uid): [r.messages, r.voice_seconds, r.laughs] for uid, r in self.users.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        bucket = cls()
+        bucket.total_messages = data["messages"]
+        bucket.total_voice_seconds = data["voice"]
+        bucket.words = Counter(data["words"])
+        bucket.bad_words = Counter(data["bad_words"])
+        bucket.emojis = Counter(data.get("emojis", {}))
+        bucket.reactions = Counter(data.get("reactions", {}))
+        bucket.stickers = Counter(data.get("stickers", {}))
+        bucket.media = Counter(data.get("media", {}))
+        bucket.links = data.get("links", 0)
+        bucket.users = {int(uid): UserStats(*v) for uid, v in data["users"].items()}
+        return bucket
+
+    def top_users(self, n, field):
+        """Топ-n (user_id, UserStats) по полю записи, нули отбрасываются."""
+        top = heapq.nlargest(n, self.users.items(), key=lambda kv: getattr(kv[1], field))
+        return [(uid, rec) for uid, rec in top if getattr(rec, field) > 0]
+
+    def add_message(self, msg):
+        self.total_messages += 1
+
+        # --- 1. ЮЗЕР ---
+        rec = None
+        user = msg.from_user
+        if user:
+            rec = self.users.get(user.id)
+            if rec is None:
+                rec = self.users[user.id] = UserStats()
+            rec.messages += 1
+
+        # --- 2. ГОЛОСОВЫЕ ---
+        msg_duration = 0
+        if msg.voice:
+            msg_duration = msg.voice.duration
+        elif msg.video_note:
+            msg_duration = msg.video_note.duration
+
+        if msg_duration > 0:
+            self.total_voice_seconds += msg_duration
+            if rec: rec.voice_seconds += msg_duration
+
+        # --- 3. КЛАССИФИКАЦИЯ (один проход по тексту) ---
+        f = classify_message(msg)
+
+        # Служебные сообщения (вход, закреп...) — не медиа, в отчет не идут
+        if f.kind != "text" and f.kind != "service":
+            self.media[f.kind] += 1
+            if f.sticker_emoji: self.stickers[f.sticker_emoji] += 1
+        for emoji, count in f.reactions:
+            self.reactions[emoji] += count
+        self.links += f.links
+        if f.emojis:
+            self.emojis.update(f.emojis)
+
+        # --- 4. ДЕТЕКТОР СМЕХА ---
+        if f.laugh and rec:
+            rec.laughs += 1
+
+        # --- 5. СЛОВА ---
+        # Мат проверяем регуляркой только на новом слове: для уже виденного ответ
+        # хранит bad_words (слова из bad_words всегда есть и в words)
+        words, bad_words = self.words, self.bad_words
+        for word in f.words:
+            if len(word) < 3 or word in STOP_WORDS: continue
+            if word in words:
+                words[word] += 1
+                if word in bad_words: bad_words[word] += 1
+            else:
+                words[word] = 1
+                if is_bad_word(word): bad_words[word] = 1
+
+
+class ScanPaused(Exception):
+    """Скан остановлен из-за долгого FloodWait; прогресс сохранен в чекпоинте."""
+
+    def __init__(self, seconds):
+        super().__init__(f"FloodWait {seconds}s")
+        self.seconds = seconds
+
+
+class CheckpointOutdated(Exception):
+    """Чекпоинт записан в старом формате агрегатов (до текущей CHECKPOINT_VERSION)."""
+
+
+class ScanCheckpoint:
+    """
+    Курсор (id последнего обработанного сообщения) и частичные агрегаты
+    скана одного чата. Периодически сохраняется в БД, поэтому скан можно
+    продолжить по job_id после FloodWait или перезапуска процесса.
+    """
 
-    try:
-        history_iter = client.get_chat_history(chat_id)
+    # Меняется вместе с форматом state (StatsBucket.to_dict, ActivitySeries.to_dict):
+    # старые чекпоинты не продолжаем, а просим начать скан заново
+    CHECKPOINT_VERSION = 3
+    # v2 отличается только покрытием рядов (один диапазон вместо отрезков) — его переводим
+    UPGRADABLE_VERSIONS = (2,)
+
+    def __init__(self, job_id, chat_id, title, periods, started_at, position=0):
+        self.job_id = job_id
+        self.chat_id = chat_id
+        self.position = position
+        self.title = title
+        self.periods = sorted(set(periods))
+        self.started_at = started_at
+        self.cursor = 0
+        self.ring_idx = 0
+        self.processed = 0
+        self.rings = [StatsBucket() for _ in self.periods]
+        # Ряды активности копятся вместе с кольцами; known — отрезки id, уже учтенные в хранилище
+        self.series = ActivitySeries()
+        self.known = None
+        self.done = False
+        # Ряды уже влиты в хранилище: повторный resume не складывает их второй раз
+        self.merged = False
+
+    @classmethod
+    def from_row(cls, row):
+        cp = cls(row["job_id"], row["chat_id"], row["title"], row["periods"],
+                 datetime.fromtimestamp(row["started_at"]), row.get("position") or 0)
+        cp.cursor = row["cursor"]
+        cp.ring_idx = row["ring_idx"]
+        cp.processed = row["processed"]
+        state = json.loads(row["state"])
+        version = state.get("version")
+        if version != cls.CHECKPOINT_VERSION and version not in cls.UPGRADABLE_VERSIONS:
+            raise CheckpointOutdated(row["job_id"])
+        cp.rings = [StatsBucket.from_dict(d) for d in state["rings"]]
+        cp.series = ActivitySeries.from_dict(state["series"])
+        cp.known = state["known"]
+        if version == 2 and cp.known:
+            cp.known = [cp.known]
+        cp.done = bool(row["done"])
+        # В чекпоинтах без флага done сохранялся только после слияния рядов
+        cp.merged = state.get("merged", cp.done)
+        return cp
+
+    async def save(self):
+        # Скан этого чата ждет сохранения, поэтому агрегаты не меняются, пока
+        # поток сериализует их в JSON и пишет в БД — event loop не держим
+        row = {
+            "job_id": self.job_id,
+            "chat_id": self.chat_id,
+            "title": self.title,
+            "periods": self.periods,
+            "started_at": self.started_at.timestamp(),
+            "cursor": self.cursor,
+            "ring_idx": self.ring_idx,
+            "processed": self.processed,
+            "state": {
+                "version": self.CHECKPOINT_VERSION,
+                "rings": [r.to_dict() for r in self.rings],
+                "series": self.series.to_dict(),
+                "known": self.known,
+                "merged": self.merged,
+            },
+            "done": self.done,
+            "position": self.position,
+        }
+        try:
+            await asyncio.to_thread(stats_store.save_checkpoint, row)
+        except Exception as e:
+            print(f"Stat checkpoint error: {e}")
+
+    def windows(self):
+        """Окна периодов: сумма колец от самого свежего до текущего."""
+        windows = []
+        acc = StatsBucket()
+        for ring in self.rings:
+            acc.merge(ring)
+            windows.append(StatsBucket().merge(acc))
+        return windows
+
+
+async def _fetch_history_page(client, checkpoint, limiter):
+    """Одна страница истории (старше курсора) под общим лимитером."""
+    while True:
+        try:
+            async with limiter:
+                return [m async for m in client.get_chat_history(
+                    checkpoint.chat_id, limit=HISTORY_PAGE_SIZE, offset_id=checkpoint.cursor
+                )]
+        except FloodWait as e:
+            print(f"FW (history {checkpoint.chat_id}): {e.value}s")
+            limiter.flood(e.value)
+            # Не держим прогресс только в памяти, пока ждем
+            await checkpoint.save()
+            if e.value > STATS_MAX_FLOOD_WAIT:
+                raise ScanPaused(e.value)
+
+
+async def scan_chat(client, checkpoint, limiter, progress=None):
+    """
+    Один проход по истории чата сразу для нескольких периодов.
+
+    История идет от новых к старым, поэтому окна вложены друг в друга
+    (1 день ⊂ 7 дней ⊂ 30 дней). Каждое сообщение попадает ровно в один
+    бакет-"кольцо" между соседними границами, а окно собирается суммой колец.
+    Продолжает с курсора чекпоинта и сохраняет его каждые
+    STATS_CHECKPOINT_INTERVAL секунд.
+    Возвращает список StatsBucket в порядке отсортированных периодов.
+    """
+    cp = checkpoint
+    starts = [cp.started_at - timedelta(days=p) for p in cp.periods]
+    last_save = time.monotonic()
 
-        async for msg in history_iter:
-            try:
-                if msg.date < start_date:
+    try:
+        while not cp.done:
+            page = await _fetch_history_page(client, cp, limiter)
+            if not page:
+                cp.done = True
+                break
+
+            for msg in page:
+                while cp.ring_idx < len(starts) and msg.date < starts[cp.ring_idx]:
+                    cp.ring_idx += 1
+                if cp.ring_idx == len(starts):
+                    cp.done = True
                     break
-
-                total_messages += 1
-
-                if time.time() - last_update_time > 5:
-                    try:
-                        await status_msg.edit(f"📊 Анализ... Обработано: {total_messages}")
-                        last_update_time = time.time()
-                    except FloodWait as fw:
-                        await asyncio.sleep(fw.value)
-                    except:
-                        pass
-
-                # --- 1. ЮЗЕР ---
-                user_name = "Unknown"
-                if msg.from_user:
-                    user_name = msg.from_user.first_name or msg.from_user.username or "NoName"
-                    users_msg_counter[user_name] += 1
-
-                # --- 2. ГОЛОСОВЫЕ ---
-                msg_duration = 0
-                if msg.voice:
-                    msg_duration = msg.voice.duration
-                elif msg.video_note:
-                    msg_duration = msg.video_note.duration
-
-                if msg_duration > 0:
-                    total_voice_seconds += msg_duration
-                    if msg.from_user: users_voice_counter[user_name] += msg_duration
-
-                # --- 3. ТЕКСТ ---
-                if not msg.text and not msg.caption: continue
-                text = (msg.text or msg.caption).lower()
-
-                # --- 4. ДЕТЕКТОР СМЕХА (НОВОЕ) ---
-                # Проверяем "сырой" текст перед очисткой (чтобы сохранить скобочки)
-                if len(text) >= 3 and laugh_pattern.match(text):
-                    if msg.from_user:
-                        users_laugh_counter[user_name] += 1
-                    # Если это смех, можно не считать слова внутри, чтобы не засорять топ слов "хахаха"
-                    # continue # Раскомментируй, если не хочешь видеть "хаха" в топе слов
-
-                # Очистка для слов
-                clean_text = re.sub(r'[^\w\s-]', ' ', text)
-                words = clean_text.split()
-
-                for word in words:
-                    if len(word) < 3 or word in STOP_WORDS: continue
-                    words_counter[word] += 1
-
-                    # Проверка на мат
-                    is_bad = False
-                    if word in BAD_EXACT: is_bad = True
-                    if not is_bad:
-                        for root in BAD_STARTS:
-                            if word.startswith(root): is_bad = True; break
-                    if not is_bad:
-                        for root in BAD_CONTAINS:
-                            if root in word: is_bad = True; break
-                    if is_bad: bad_words_counter[word] += 1
-
-            except FloodWait as e:
-                print(f"FW: {e.value}s");
-                await asyncio.sleep(e.value + 1)
+                try:
+                    cp.rings[cp.ring_idx].add_message(msg)
+                    cp.series.add(msg, cp.known)
+                except Exception:
+                    continue
+
+            cp.cursor = page[-1].id
+            cp.processed += len(page)
+            if progress:
+                progress(cp.chat_id, cp.processed)
+
+            if time.monotonic() - last_save > STATS_CHECKPOINT_INTERVAL:
+                await cp.save()
+                last_save = time.monotonic()
+    except asyncio.CancelledError:
+        await cp.save()
+        raise
+
+    # Инкрементально обновляем роллапы для веб-графиков (один раз на чекпоинт:
+    # resume уже завершенного задания ряды повторно не вливает)
+    if not cp.merged:
+        try:
+            await asyncio.to_thread(merge_into_store, cp.chat_id, cp.title, cp.series)
+            cp.merged = True
+        except Exception as e:
+            print(f"Activity series error: {e}")
+    await cp.save()
+    return cp.windows()
+
+
+def build_report(stats, period_days, chat_title=None, end_date=None, names=None):
+    """Текстовый отчет по одному окну. names — {user_id: имя}, резолвятся один раз на отчет."""
+    names = names or {}
+    end_date = end_date or datetime.now()
+    start_date = end_date - timedelta(days=period_days)
+    date_str = f"{start_date.strftime('%d.%m')} - {end_date.strftime('%d.%m')}"
+    voice_str = format_duration(stats.total_voice_seconds)
+
+    report = f"📊 **Статистика чата**" + (f" «{chat_title}»" if chat_title else "") + "\n"
+    report += f"📅 Период: {date_str} ({period_days} дн.)\n"
+    report += f"✉️ Сообщений: {stats.total_messages}\n"
+    report += f"🎙 Общее ГС: {voice_str}\n\n"
+
+    # Топ слов
+    report += "🗣 **Топ-15 слов:**\n"
+    if stats.words:
+        for i, (w, c) in enumerate(stats.words.most_common(15), 1):
+            if w in stats.bad_words: w = f"||{w}||"
+            report += f"{i}. {w} — {c}\n"
+    else:
+        report += "_Пусто_\n"
+
+    # Топ мата
+    report += "\n🤬 **Топ-10 ругательств:**\n"
+    if stats.bad_words:
+        for i, (w, c) in enumerate(stats.bad_words.most_common(10), 1):
+            report += f"{i}. ||{w}|| — {c}\n"
+    else:
+        report += "✨ _Культурный чат_ ✨\n"
+
+    # Эмодзи, реакции, стикеры, медиа
+    report += "\n😀 **Топ эмодзи:** "
+    report += " ".join(f"{e}×{c}" for e, c in stats.emojis.most_common(10)) if stats.emojis else "_нет_"
+    report += "\n❤️ **Топ реакций:** "
+    report += " ".join(f"{e}×{c}" for e, c in stats.reactions.most_common(10)) if stats.reactions else "_нет_"
+    if stats.stickers:
+        report += "\n🎭 **Стикеры:** " + " ".join(f"{e}×{c}" for e, c in stats.stickers.most_common(5))
+    if stats.media:
+        report += "\n📦 **Медиа:** " + ", ".join(
+            f"{MEDIA_LABELS.get(k, k)}: {c}" for k, c in stats.media.most_common()
+        )
+    report += f"\n🔗 **Ссылок:** {stats.links}\n"
+
+    # Топ смеха
+    report += "\n😂 **Топ-5 хохотунов:**\n"
+    top_laugh = stats.top_users(5, "laughs")
+    if top_laugh:
+        for i, (uid, rec) in enumerate(top_laugh, 1):
+            report += f"{i}. **{names.get(uid, uid)}** — {rec.laughs} раз\n"
+    else:
+        report += "_Слишком серьезные_ 🗿\n"
+
+    # Топ людей
+    report += "\n🏆 **Топ-10 активных:**\n"
+    top_active = stats.top_users(10, "messages")
+    if top_active:
+        for i, (uid, rec) in enumerate(top_active, 1):
+            v_sec = rec.voice_seconds
+            v_str = f" | 🎙 {format_duration(v_sec)}" if v_sec > 0 else ""
+            report += f"{i}. **{names.get(uid, uid)}** — {rec.messages} смс{v_str}\n"
+    else:
+        report += "_Пусто_\n"
+
+    return report
+
+
+async def resolve_user_names(client, user_ids, fallback=None):
+    """
+    Имена участников одним батч-запросом на отчет (а не на каждое сообщение).
+    fallback — имена, запомненные при скане (для удаленных/недоступных аккаунтов).
+    """
+    names = dict(fallback or {})
+    ids = list(user_ids)
+    for i in range(0, len(ids), 200):
+        try:
+            users = await client.get_users(ids[i:i + 200])
+            for u in users:
+                names[u.id] = u.first_name or u.username or "NoName"
+        except Exception:
+            pass
+    return {uid: names.get(uid, f"id{uid}") for uid in ids}
+
+
+def build_summary(results, periods):
+    """Сводная таблица: чат × период (для сравнения нескольких чатов/окон)."""
+    summary = "📊 **Сводка**\n"
+    for title, windows in results:
+        summary += f"\n💬 **{title}**\n"
+        for days, stats in zip(periods, windows):
+            summary += (f"• {days} дн.: ✉️ {stats.total_messages} | "
+                        f"🎙 {format_duration(stats.total_voice_seconds)}\n")
+    return summary
+
+
+async def analyze_chats(client, message, chat_ids=None, periods=None, job_id=None):
+    """
+    Статистика по нескольким чатам и периодам за один проход на чат.
+    Чаты сканируются параллельно под общим FloodWait-aware лимитером,
+    результат — один общий отчет (или лонгрид, если он длинный).
+    С job_id продолжает ранее прерванное задание из чекпоинтов.
+    """
+    if job_id:
+        rows = stats_store.load_job(job_id)
+        if not rows:
+            return await edit_or_reply(message, f"❌ Задание `{job_id}` не найдено.")
+        try:
+            checkpoints = [ScanCheckpoint.from_row(r) for r in rows]
+        except CheckpointOutdated:
+            return await edit_or_reply(
+                message, f"❌ Задание `{job_id}` сохранено старой версией бота — запустите `.stat` заново."
+            )
+        periods = checkpoints[0].periods
+    else:
+        stats_store.prune_jobs()
+        job_id = stats_store.new_job_id()
+        periods = sorted(set(periods))
+        started_at = datetime.now()
+        checkpoints = []
+        for position, chat_id in enumerate(chat_ids):
+            # Резолвим чаты (заодно кешируем peer)
+            try:
+                chat = await client.get_chat(chat_id)
+                chat_id, title = chat.id, chat.title or chat.first_name or str(chat_id)
+            except Exception:
+                title = str(chat_id)
+            cp = ScanCheckpoint(job_id, chat_id, title, periods, started_at, position)
+            cp.known = known_ranges(chat_id)
+            checkpoints.append(cp)
+        # Задание сразу в БД: после падения до первого чекпоинта его найдет .stat resume
+        for cp in checkpoints:
+            await cp.save()
+
+    periods_str = ", ".join(f"{p}" for p in periods)
+    status_msg = await edit_or_reply(
+        message,
+        f"📊 Кеширую чаты ({len(checkpoints)}) и начинаю анализ ({periods_str} дн)...\n"
+        f"🔖 Задание: `{job_id}`"
+    )
+
+    for cp in checkpoints:
+        if not cp.done:
+            try:
+                await client.get_chat(cp.chat_id)
             except Exception:
-                continue
-
-        # --- ОТЧЕТ ---
-        date_str = f"{start_date.strftime('%d.%m')} - {datetime.now().strftime('%d.%m')}"
-        voice_str = format_duration(total_voice_seconds)
-
-        report = f"📊 **Статистика чата**\n"
-        report += f"📅 Период: {date_str} ({period_days} дн.)\n"
-        report += f"✉️ Сообщений: {total_messages}\n"
-        report += f"🎙 Общее ГС: {voice_str}\n\n"
-
-        # Топ слов
-        report += "🗣 **Топ-15 слов:**\n"
-        if words_counter:
-            for i, (w, c) in enumerate(words_counter.most_common(15), 1):
-                if w in bad_words_counter: w = f"||{w}||"
-                report += f"{i}. {w} — {c}\n"
-        else:
-            report += "_Пусто_\n"
-
-        # Топ мата
-        report += "\n🤬 **Топ-10 ругательств:**\n"
-        if bad_words_counter:
-            for i, (w, c) in enumerate(bad_words_counter.most_common(10), 1):
-                report += f"{i}. ||{w}|| — {c}\n"
-        else:
-            report += "✨ _Культурный чат_ ✨\n"
-
-        # Топ смеха (НОВОЕ)
-        report += "\n😂 **Топ-5 хохотунов:**\n"
-        if users_laugh_counter:
-            for i, (u, c) in enumerate(users_laugh_counter.most_common(5), 1):
-                report += f"{i}. **{u}** — {c} раз\n"
-        else:
-            report += "_Слишком серьезные_ 🗿\n"
-
-        # Топ людей
-        report += "\n🏆 **Топ-10 активных:**\n"
-        if users_msg_counter:
-            for i, (u, c) in enumerate(users_msg_counter.most_common(10), 1):
-                v_sec = users_voice_counter.get(u, 0)
-                v_str = f" | 🎙 {format_duration(v_sec)}" if v_sec > 0 else ""
-                report += f"{i}. **{u}** — {c} смс{v_str}\n"
-        else:
-            report += "_Пусто_\n"
-
-        chat_title = message.chat.title or "Chat"
+                pass
+
+    limiter = FloodLimiter()
+    processed = {cp.chat_id: cp.processed for cp in checkpoints}
+    last_update_time = time.time()
+
+    def progress(chat_id, count):
+        nonlocal last_update_time
+        processed[chat_id] = count
+        if time.time() - last_update_time > 5:
+            last_update_time = time.time()
+            asyncio.create_task(_edit_progress())
+
+    async def _edit_progress():
+        try:
+            await status_msg.edit(f"📊 Анализ... Обработано: {sum(processed.values())}\n🔖 Задание: `{job_id}`")
+        except FloodWait as fw:
+            limiter.flood(fw.value)
+        except Exception:
+            pass
+
+    try:
+        tasks = [asyncio.create_task(scan_chat(client, cp, limiter, progress)) for cp in checkpoints]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+
+        if pending:
+            # Один из сканов упал (обычно долгий FloodWait): останавливаем остальные,
+            # они сохранят курсор в чекпоинт при отмене
+            for t in pending:
+                t.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        for t in done:
+            exc = t.exception()
+            if isinstance(exc, ScanPaused):
+                return await status_msg.edit(
+                    f"⏸ Telegram попросил подождать {format_duration(exc.seconds)}.\n"
+                    f"Прогресс сохранен, продолжить: `.stat resume {job_id}`"
+                )
+            if exc:
+                raise exc
+
+        # --- ОТЧЕТ (из смерженных чекпоинтов) ---
+        results = [(cp.title, cp.windows()) for cp in checkpoints]
+        end_date = checkpoints[0].started_at
+        multi_chat = len(results) > 1
+
+        shown_ids = set()
+        known_names = {}
+        for cp, (_, windows) in zip(checkpoints, results):
+            known_names.update(cp.series.names)
+            for stats in windows:
+                shown_ids.update(uid for uid, _ in stats.top_users(10, "messages"))
+                shown_ids.update(uid for uid, _ in stats.top_users(5, "laughs"))
+        names = await resolve_user_names(client, shown_ids, known_names)
+
+        sections = []
+        if multi_chat or len(periods) > 1:
+            sections.append(build_summary(results, periods))
+        for title, windows in results:
+            for days, stats in zip(periods, windows):
+                sections.append(build_report(stats, days, title if multi_chat else None, end_date, names))
+
+        # Ссылки по токену: по chat_id страницы не открываются
+        links = []
+        for cp in checkpoints:
+            token = await asyncio.to_thread(stats_store.series_token, cp.chat_id)
+            if token:
+                links.append(f"• {cp.title}: {MY_DOMAIN}/stats/{token}")
+        if links:
+            sections.append("📈 **Графики активности:**\n" + "\n".join(links))
+
+        report = "\n\n".join(sections)
+        chat_title = results[0][0] if not multi_chat else f"{len(results)} chats"
         await smart_reply(status_msg, report, title=f"Stats: {chat_title}")
 
     except Exception as e:
-        await status_msg.edit(f"❌ Ошибка анализа: {e}")
\ No newline at end of file
+        await status_msg.edit(f"❌ Ошибка анализа: {e}\nПродолжить: `.stat resume {job_id}`")
+
+
+async def analyze_chat_history(client, message, period_days=30):
+    """
+    Анализирует историю чата: слова, мат, активность, ГС и СМЕХ.
+    """
+    await analyze_chats(client, message, [message.chat.id], [period_days])
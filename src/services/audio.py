@@ -1,13 +1,20 @@
 import asyncio
-import os
+import io
 import re
-import time
 import struct
 from google.genai import types
-from src.services.ai_core import get_ai_client, rotate_key_and_retry
-from src.config import AVAILABLE_VOICES, AVAILABLE_TTS_MODELS, VOICE_NAMES_LIST
+from src.services import ai_core, transcoder, tts_cache
+from src.services.ai_core import get_ai_client, rotate_key_and_retry, run_on_key
+from src.config import (
+    AVAILABLE_VOICES, AVAILABLE_TTS_MODELS, VOICE_NAMES_LIST,
+    TTS_CHUNK_CHARS, TTS_MAX_PARALLEL, TTS_CHUNK_GAP_MS
+)
 from src.state import SETTINGS
 
+MULTISPEAKER_MODEL = "gemini-2.5-flash-preview-tts"
+# Мультиспикерный конфиг Gemini принимает не больше двух голосов
+MULTISPEAKER_MAX_SPEAKERS = 2
+
 
 def parse_audio_mime_type(mime_type: str):
     """Парсит параметры аудио (частоту и битность) из MIME-типа."""
@@ -28,13 +35,11 @@ def parse_audio_mime_type(mime_type: str):
     return {"bits": bits, "rate": rate}
 
 
-def convert_to_wav(data: bytes, mime_type: str) -> bytes:
-    """Добавляет WAV заголовок к сырым PCM данным."""
+def wav_header(data_size: int, mime_type: str) -> bytes:
+    """WAV заголовок (44 байта) для сырых PCM данных размером data_size."""
     p = parse_audio_mime_type(mime_type)
-    data_size = len(data)
 
-    # WAV Header (44 bytes)
-    header = struct.pack(
+    return struct.pack(
         '<4sI4s4sIHHIIHH4sI',
         b'RIFF',
         36 + data_size,
@@ -50,114 +55,486 @@ def convert_to_wav(data: bytes, mime_type: str) -> bytes:
         b'data',
         data_size
     )
-    return header + data
 
 
-async def convert_wav_to_ogg(wav_path):
+def convert_to_wav(data: bytes, mime_type: str) -> bytes:
+    """Добавляет WAV заголовок к сырым PCM данным."""
+    return wav_header(len(data), mime_type) + data
+
+
+async def convert_wav_to_ogg(wav_path, priority=transcoder.PRIORITY_INTERACTIVE):
     """
-    Конвертирует WAV в OGG Opus (формат голосовых Telegram).
+    Конвертирует WAV в OGG Opus (формат голосовых Telegram) через общий пул ffmpeg.
     """
     ogg_path = wav_path.replace(".wav", ".ogg")
 
-    cmd = [
-        "ffmpeg", "-i", wav_path,
-        "-c:a", "libopus", "-b:a", "32k", "-vn", "-y",
-        ogg_path
-    ]
-
     try:
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.DEVNULL,
-            stderr=asyncio.subprocess.DEVNULL
+        with open(wav_path, "rb") as f:
+            data = f.read()
+        ogg = await transcoder.transcode(
+            data, [], ["-c:a", "libopus", "-b:a", "32k", "-vn", "-f", "ogg"],
+            priority=priority, label="wav_to_ogg"
         )
-        await process.communicate()
-
-        return ogg_path if os.path.exists(ogg_path) else None
+        if not ogg:
+            return None
+        with open(ogg_path, "wb") as f:
+            f.write(ogg)
+        return ogg_path
     except Exception as e:
         print(f"FFmpeg Error: {e}")
         return None
 
 
-async def generate_gemini_tts(text):
+class PcmEncoder:
     """
-    Одиночная генерация голоса (Single Speaker).
+    ffmpeg как стриминговый энкодер: сырой PCM пишется в stdin по мере прихода
+    чанков, OGG Opus читается из stdout в память. Без WAV-файлов на диске.
+    Держит потоковый слот transcoder (job, stream=True) до finish/abort:
+    энкодер почти все время ждет чанки от Gemini, поэтому CPU-пул не занимает.
     """
 
-    async def _worker():
-        client = get_ai_client()
-        if not client: raise Exception("No Gemini Client available")
+    def __init__(self, process, job):
+        self.process = process
+        self.job = job
+        self._reader = asyncio.create_task(process.stdout.read())
+
+    @classmethod
+    async def start(cls, mime_type, job, bitrate="32k"):
+        p = parse_audio_mime_type(mime_type)
+        cmd = [
+            "ffmpeg", "-loglevel", "error",
+            "-f", f"s{p['bits']}le", "-ar", str(p['rate']), "-ac", "1", "-i", "pipe:0",
+            "-c:a", "libopus", "-b:a", bitrate, "-f", "ogg", "pipe:1"
+        ]
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+        except BaseException:
+            job.release()
+            raise
+        return cls(process, job)
+
+    async def feed(self, data):
+        self.process.stdin.write(data)
+        await self.process.stdin.drain()
+
+    async def finish(self):
+        """Закрывает stdin и возвращает готовый OGG (bytes) или None при ошибке ffmpeg."""
+        self.process.stdin.close()
+        await self.process.stdin.wait_closed()
+        try:
+            data = await self._reader
+            await self.process.wait()
+        finally:
+            self.job.release()
+        return data if self.process.returncode == 0 and data else None
+
+    def abort(self):
+        if self.process.returncode is None:
+            self.process.kill()
+        self._reader.cancel()
+        self.job.release()
+
+
+def audio_buffer(data, name, duration=0):
+    """BytesIO с именем файла (Pyrogram берет из него mime/имя) и длительностью."""
+    buf = io.BytesIO(data)
+    buf.name = name
+    buf.duration = duration
+    return buf
+
+
+async def iter_tts_pcm(stream):
+    """Достает из стрима Gemini TTS пары (pcm_bytes, mime_type)."""
+    async for chunk in stream:
+        # ВАЖНОЕ ИСПРАВЛЕНИЕ: Проверяем content перед обращением к parts
+        if not (chunk.candidates and
+                chunk.candidates[0].content and
+                chunk.candidates[0].content.parts):
+            continue
+
+        part = chunk.candidates[0].content.parts[0]
+        if part.inline_data:
+            yield part.inline_data.data, part.inline_data.mime_type
+
+
+class AudioSink:
+    """
+    Приемник PCM: output="ogg" — ffmpeg стартует на первом чанке и кодирует
+    на лету; output="wav" — PCM пишется в BytesIO, заголовок дописывается в конце.
+    Если все потоковые слоты transcoder заняты, PCM копится в памяти и уходит
+    в энкодер, как только слот освободится (стрим Gemini при этом не тормозится).
+    Больше PENDING_MAX_BYTES не копим — ждем слот, придерживая чтение стрима.
+    """
 
-        t_key = SETTINGS.get("tts_model_key", "1")
-        model_id = AVAILABLE_TTS_MODELS.get(t_key, AVAILABLE_TTS_MODELS["1"])
+    PENDING_MAX_BYTES = 8 * 1024 * 1024  # ~3 мин PCM 24 kHz 16 bit
+
+    def __init__(self, output="ogg", filename="voice", priority=transcoder.PRIORITY_INTERACTIVE):
+        self.output = output
+        self.filename = filename
+        self.priority = priority
+        self.mime_type = "audio/wav"
+        self.pcm_size = 0
+        self.encoder = None
+        self.pending = bytearray()
+        self.wav_io = None
+
+    async def _ensure_encoder(self, wait=False):
+        if self.encoder:
+            return True
+        if wait:
+            job = await transcoder.acquire(self.priority, "tts", stream=True)
+        else:
+            job = transcoder.try_acquire("tts", stream=True)
+        if not job:
+            return False
+
+        self.encoder = await PcmEncoder.start(self.mime_type, job)
+        if self.pending:
+            await self.encoder.feed(self.pending)
+            self.pending = bytearray()
+        return True
+
+    async def write(self, data, mime_type):
+        self.mime_type = mime_type
+        self.pcm_size += len(data)
+
+        if self.output == "wav":
+            if self.wav_io is None:
+                self.wav_io = io.BytesIO()
+                self.wav_io.seek(44)  # место под заголовок, допишем в конце
+            self.wav_io.write(data)
+            return
+
+        full = len(self.pending) + len(data) > self.PENDING_MAX_BYTES
+        if await self._ensure_encoder(wait=full):
+            await self.encoder.feed(data)
+        else:
+            self.pending += data
+
+    async def write_silence(self, ms):
+        p = parse_audio_mime_type(self.mime_type)
+        frames = p['rate'] * ms // 1000
+        await self.write(bytes(frames * p['bits'] // 8), self.mime_type)
+
+    async def finish(self):
+        """Возвращает BytesIO (с .name и .duration) или бросает исключение."""
+        if not self.pcm_size:
+            raise Exception("Gemini returned empty audio data")
 
-        v_key = SETTINGS.get("voice_key", "1")
-        v_data = AVAILABLE_VOICES.get(v_key, AVAILABLE_VOICES["1"])
-        v_name = v_data["name"]
+        p = parse_audio_mime_type(self.mime_type)
+        duration = self.pcm_size // (p['rate'] * p['bits'] // 8)
 
-        config = types.GenerateContentConfig(
-            response_modalities=["audio"],
-            speech_config=types.SpeechConfig(
-                voice_config=types.VoiceConfig(
-                    prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=v_name)
-                )
+        if self.output == "wav":
+            self.wav_io.seek(0)
+            self.wav_io.write(wav_header(self.pcm_size, self.mime_type))
+            self.wav_io.seek(0)
+            self.wav_io.name = f"{self.filename}.wav"
+            self.wav_io.duration = duration
+            return self.wav_io
+
+        await self._ensure_encoder(wait=True)
+        ogg = await self.encoder.finish()
+        if not ogg:
+            raise Exception("FFmpeg encoding failed")
+        return audio_buffer(ogg, f"{self.filename}.ogg", duration)
+
+    def abort(self):
+        if self.encoder:
+            self.encoder.abort()
+
+
+async def collect_tts_audio(stream, output="ogg", filename="voice"):
+    """
+    Собирает аудио из стрима Gemini TTS.
+    output="ogg": PCM идет в ffmpeg сразу, без промежуточного bytearray и WAV-файла.
+    output="wav": PCM + WAV-заголовок в памяти (для .saywav).
+    Возвращает BytesIO (с .name и .duration) или бросает исключение для ротации ключа.
+    """
+    sink = AudioSink(output, filename)
+    try:
+        async for data, mime_type in iter_tts_pcm(stream):
+            await sink.write(data, mime_type)
+        return await sink.finish()
+    except BaseException:
+        sink.abort()
+        raise
+
+
+def split_tts_text(text, limit=TTS_CHUNK_CHARS):
+    """
+    Режет текст на куски до limit символов по границам предложений.
+    Слишком длинное предложение режется по словам.
+    """
+    sentences = re.split(r"(?<=[.!?…])\s+|\n+", text.strip())
+    chunks = []
+    current = ""
+
+    for sentence in sentences:
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+
+        pieces = [sentence]
+        if len(sentence) > limit:
+            pieces, buf = [], ""
+            for word in sentence.split():
+                if buf and len(buf) + len(word) + 1 > limit:
+                    pieces.append(buf)
+                    buf = ""
+                buf = f"{buf} {word}".strip()
+            if buf: pieces.append(buf)
+
+        for piece in pieces:
+            if current and len(current) + len(piece) + 1 > limit:
+                chunks.append(current)
+                current = ""
+            current = f"{current} {piece}".strip()
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def get_tts_config(voice_name=None):
+    """Модель и конфиг одиночного голоса (по умолчанию — из текущих настроек)."""
+    t_key = SETTINGS.get("tts_model_key", "1")
+    model_id = AVAILABLE_TTS_MODELS.get(t_key, AVAILABLE_TTS_MODELS["1"])
+
+    config = types.GenerateContentConfig(
+        response_modalities=["audio"],
+        speech_config=types.SpeechConfig(
+            voice_config=types.VoiceConfig(
+                prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=voice_name or get_voice_name())
             )
         )
+    )
+    return model_id, config
+
+
+def get_voice_name():
+    v_key = SETTINGS.get("voice_key", "1")
+    return AVAILABLE_VOICES.get(v_key, AVAILABLE_VOICES["1"])["name"]
+
 
-        accumulated_data = bytearray()
-        mime_type = "audio/wav"
-
-        async for chunk in await client.aio.models.generate_content_stream(
-                model=model_id,
-                contents=text,
-                config=config
-        ):
-            # ВАЖНОЕ ИСПРАВЛЕНИЕ: Проверяем content перед обращением к parts
-            if (chunk.candidates and
-                    chunk.candidates[0].content and
-                    chunk.candidates[0].content.parts):
-
-                part = chunk.candidates[0].content.parts[0]
-                if part.inline_data:
-                    accumulated_data.extend(part.inline_data.data)
-                    mime_type = part.inline_data.mime_type
-
-        if not accumulated_data:
+async def synthesize_pcm(text, model_id, config, key_index=0, limiter=None):
+    """
+    Озвучивает один кусок целиком в PCM (bytes, mime_type) на ключе key_index
+    (с переходом на следующие ключи при лимитах).
+    """
+
+    async def _worker(client):
+        pcm = bytearray()
+        mime_type = None
+        stream = await client.aio.models.generate_content_stream(
+            model=model_id, contents=text, config=config
+        )
+        async for data, mime_type in iter_tts_pcm(stream):
+            pcm += data
+        if not pcm:
             raise Exception("Gemini returned empty audio data")
+        return pcm, mime_type
+
+    if limiter is None:
+        return await run_on_key(_worker, key_index)
+    async with limiter:
+        return await run_on_key(_worker, key_index)
 
-        return accumulated_data, mime_type
 
+async def synthesize_in_order(jobs, model_id, output="ogg", filename="gemini_voice"):
+    """
+    jobs — список (text, config). Куски озвучиваются параллельно (не больше
+    TTS_MAX_PARALLEL, каждый начинает со своего ключа), PCM склеивается по порядку
+    с короткой паузой и кодируется один раз. Готовые куски уходят в энкодер,
+    пока остальные еще синтезируются.
+    """
+    limiter = asyncio.Semaphore(TTS_MAX_PARALLEL)
+    tasks = [
+        asyncio.create_task(synthesize_pcm(text, model_id, config, ai_core.current_key_index + i, limiter))
+        for i, (text, config) in enumerate(jobs)
+    ]
+
+    sink = AudioSink(output, filename)
     try:
-        result = await rotate_key_and_retry(_worker)
+        for i, task in enumerate(tasks):
+            pcm, mime_type = await task
+            if i:
+                await sink.write_silence(TTS_CHUNK_GAP_MS)
+            await sink.write(pcm, mime_type)
+        return await sink.finish()
+    except BaseException:
+        sink.abort()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def generate_long_tts(chunks, output="ogg", filename="gemini_voice"):
+    """Длинный текст одним голосом: куски параллельно, склейка по порядку."""
+    model_id, config = get_tts_config()
+    return await synthesize_in_order([(chunk, config) for chunk in chunks], model_id, output, filename)
+
+
+async def generate_gemini_tts(text, output="ogg"):
+    """
+    Одиночная генерация голоса (Single Speaker).
+    Текст длиннее TTS_CHUNK_CHARS озвучивается кусками параллельно.
+    Возвращает BytesIO (OGG Opus или WAV) — без временных файлов.
+    Повторный текст с тем же голосом/моделью/форматом берется из TTS-кэша.
+    """
+    model_id, _ = get_tts_config()
+    key = tts_cache.cache_key(text, get_voice_name(), model_id, output)
+    cached = await tts_cache.load_audio(key)
+    if cached:
+        return cached
+
+    audio = await _generate_gemini_tts(text, output)
+    if audio:
+        await tts_cache.store_audio(key, audio)
+    return audio
+
+
+async def _generate_gemini_tts(text, output):
+    chunks = split_tts_text(text)
+    if len(chunks) > 1:
+        try:
+            return await generate_long_tts(chunks, output)
+        except Exception as e:
+            print(f"Long TTS Generation Error: {e}")
+            return None
 
-        if result and isinstance(result, tuple):
-            acc_data, mime = result
-            wav_data = convert_to_wav(bytes(acc_data), mime)
+    async def _worker():
+        client = get_ai_client()
+        if not client: raise Exception("No Gemini Client available")
 
-            filename = f"gemini_voice_{int(time.time())}.wav"
-            with open(filename, "wb") as f:
-                f.write(wav_data)
-            return filename
+        model_id, config = get_tts_config()
+        stream = await client.aio.models.generate_content_stream(
+            model=model_id,
+            contents=text,
+            config=config
+        )
+        return await collect_tts_audio(stream, output, filename="gemini_voice")
 
-        return None
+    try:
+        return await rotate_key_and_retry(_worker)
     except Exception as e:
         print(f"TTS Generation Error: {e}")
         return None
 
 
+SPEAKER_PATTERN = re.compile(r"^([A-Za-zА-Яа-я0-9_ ]+):", re.MULTILINE)
+
+
+def parse_dialog_script(script_text):
+    """
+    Разбирает сценарий на реплики [(speaker, line), ...] в порядке сценария.
+    Строки без "Имя:" дописываются к предыдущей реплике (или к Narrator).
+    """
+    segments = []
+    for raw in script_text.splitlines():
+        raw = raw.strip()
+        if not raw:
+            continue
+        m = SPEAKER_PATTERN.match(raw)
+        if m:
+            segments.append([m.group(1), raw[m.end():].strip()])
+        elif segments:
+            segments[-1][1] = f"{segments[-1][1]} {raw}".strip()
+        else:
+            segments.append(["Narrator", raw])
+    return [(speaker, line) for speaker, line in segments if line]
+
+
+def cast_voices(speakers, custom_cast=None):
+    """Голос для каждого спикера: из custom_cast или по кругу из VOICE_NAMES_LIST."""
+    cast = {}
+    for i, speaker_name in enumerate(sorted(set(speakers))):
+        if custom_cast and speaker_name in custom_cast:
+            cast[speaker_name] = custom_cast[speaker_name]
+        else:
+            cast[speaker_name] = VOICE_NAMES_LIST[i % len(VOICE_NAMES_LIST)]
+    return cast
+
+
+def pick_dialog_engine(script_text):
+    """
+    "multi" — один запрос мультиспикерной модели (до 2 спикеров),
+    "lines" — каждая реплика своим голосом параллельно.
+    Настройка dialog_engine: auto / multi / lines.
+    """
+    engine = SETTINGS.get("dialog_engine", "auto")
+    if engine in ("multi", "lines"):
+        return engine
+    speakers = set(SPEAKER_PATTERN.findall(script_text))
+    return "lines" if len(speakers) > MULTISPEAKER_MAX_SPEAKERS else "multi"
+
+
 async def generate_multispeaker_tts(script_text, custom_cast=None):
     """
     Мультиспикерная генерация (Диалоги).
+    Возвращает BytesIO с OGG Opus (повторы — из TTS-кэша).
     """
+    engine = pick_dialog_engine(script_text)
+    if engine == "lines":
+        model_id, _ = get_tts_config()
+    else:
+        model_id = MULTISPEAKER_MODEL
+
+    cast = ",".join(f"{k}={v}" for k, v in sorted((custom_cast or {}).items()))
+    key = tts_cache.cache_key(script_text, f"{engine}:{cast}", model_id, "ogg")
+    cached = await tts_cache.load_audio(key)
+    if cached:
+        return cached
+
+    if engine == "lines":
+        audio = await generate_dialog_lines_tts(script_text, custom_cast)
+    else:
+        audio = await _generate_multispeaker_tts(script_text, custom_cast)
+    if audio:
+        await tts_cache.store_audio(key, audio)
+    return audio
+
+
+async def generate_dialog_lines_tts(script_text, custom_cast=None):
+    """
+    Движок "по репликам": каждая реплика озвучивается одиночным голосом своего
+    спикера на модели из tts_model_key, параллельно по ключам; PCM склеивается
+    в порядке сценария. Число спикеров не ограничено.
+    """
+    segments = parse_dialog_script(script_text)
+    if not segments:
+        return None
+
+    cast = cast_voices([speaker for speaker, _ in segments], custom_cast)
+    model_id, _ = get_tts_config()
+    configs = {}
+    jobs = []
+    for speaker, line in segments:
+        voice = cast[speaker]
+        if voice not in configs:
+            configs[voice] = get_tts_config(voice)[1]
+        for piece in split_tts_text(line):
+            jobs.append((piece, configs[voice]))
+
+    try:
+        return await synthesize_in_order(jobs, model_id, "ogg", filename="dialog")
+    except Exception as e:
+        print(f"Dialog Lines TTS Error: {e}")
+        return None
 
+
+async def _generate_multispeaker_tts(script_text, custom_cast=None):
     async def _worker():
         client = get_ai_client()
         if not client: raise Exception("No Gemini Client available")
 
         # 1. Поиск спикеров
-        import re
-        speaker_pattern = re.compile(r"^([A-Za-zА-Яа-я0-9_ ]+):", re.MULTILINE)
-        found_speakers = sorted(list(set(speaker_pattern.findall(script_text))))
+        found_speakers = sorted(list(set(SPEAKER_PATTERN.findall(script_text))))
 
         actual_script = script_text
         if not found_speakers:
@@ -165,24 +542,18 @@ async def generate_multispeaker_tts(script_text, custom_cast=None):
             actual_script = f"Narrator: {script_text}"
 
         # 2. Кастинг
-        speaker_configs = []
-        for i, speaker_name in enumerate(found_speakers):
-            if custom_cast and speaker_name in custom_cast:
-                voice_name = custom_cast[speaker_name]
-            else:
-                voice_name = VOICE_NAMES_LIST[i % len(VOICE_NAMES_LIST)]
-
-            speaker_configs.append(
-                types.SpeakerVoiceConfig(
-                    speaker=speaker_name,
-                    voice_config=types.VoiceConfig(
-                        prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=voice_name)
-                    )
+        speaker_configs = [
+            types.SpeakerVoiceConfig(
+                speaker=speaker_name,
+                voice_config=types.VoiceConfig(
+                    prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=voice_name)
                 )
             )
+            for speaker_name, voice_name in cast_voices(found_speakers, custom_cast).items()
+        ]
 
         # 3. Конфиг
-        model_id = "gemini-2.5-flash-preview-tts"
+        model_id = MULTISPEAKER_MODEL
 
         config = types.GenerateContentConfig(
             response_modalities=["AUDIO"],
@@ -193,44 +564,17 @@ async def generate_multispeaker_tts(script_text, custom_cast=None):
             )
         )
 
-        accumulated_data = bytearray()
-        mime_type = "audio/wav"
-
         full_prompt = f"TTS the following conversation:\n{actual_script}"
 
-        async for chunk in await client.aio.models.generate_content_stream(
-                model=model_id,
-                contents=full_prompt,
-                config=config
-        ):
-            # ВАЖНОЕ ИСПРАВЛЕНИЕ: Проверяем content
-            if (chunk.candidates and
-                    chunk.candidates[0].content and
-                    chunk.candidates[0].content.parts):
-
-                part = chunk.candidates[0].content.parts[0]
-                if part.inline_data:
-                    accumulated_data.extend(part.inline_data.data)
-                    mime_type = part.inline_data.mime_type
-
-        if not accumulated_data:
-            raise Exception("Gemini returned empty multispeaker data")
-
-        return accumulated_data, mime_type
+        stream = await client.aio.models.generate_content_stream(
+            model=model_id,
+            contents=full_prompt,
+            config=config
+        )
+        return await collect_tts_audio(stream, "ogg", filename="dialog")
 
     try:
-        result = await rotate_key_and_retry(_worker)
-
-        if result and isinstance(result, tuple):
-            acc_data, mime = result
-            wav_data = convert_to_wav(bytes(acc_data), mime)
-
-            filename = f"dialog_{int(time.time())}.wav"
-            with open(filename, "wb") as f:
-                f.write(wav_data)
-            return filename
-
-        return None
+        return await rotate_key_and_retry(_worker)
     except Exception as e:
         print(f"MultiSpeaker Error: {e}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,183 @@
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from src.config import AUTO_STT_WORKERS, AUTO_STT_QUEUE_MAX, AUTO_STT_GEMINI_PARALLEL
+from src.services import metrics, transcoder
+from src.services.speech import (
+    transcribe_via_gemini, transcribe_bytes, preprocess_audio, format_transcript, is_short_voice
+)
+from src.services.transcript_cache import media_of, get_transcript, save_transcript
+from src.services.utils import smart_reply
+from src.services.workspace import workspace
+from src.state import SETTINGS
+
+# Очередь фоновой расшифровки: (длительность, seq, job) — короткие голосовые первыми
+_queue = None
+_workers = []
+_seq = itertools.count()
+# file_unique_id -> Future с результатом (пока задание в очереди или в работе)
+_jobs = {}
+_running = set()
+# Задания из очереди, которые забрал интерактивный .stt (воркер их пропускает)
+_claimed = set()
+# Приоритет .stt над фоном в Gemini: фон ждет, пока идут интерактивные расшифровки
+_interactive = 0
+_gemini_gate = None
+_no_interactive = None
+
+
+def _get_gate():
+    global _gemini_gate, _no_interactive
+    if _gemini_gate is None:
+        _gemini_gate = asyncio.Semaphore(max(1, AUTO_STT_GEMINI_PARALLEL))
+        _no_interactive = asyncio.Event()
+        _no_interactive.set()
+    return _gemini_gate, _no_interactive
+
+
+def chat_settings(chat_id):
+    """Настройки авторасшифровки чата ({"reply": bool}) или None, если выключена."""
+    return SETTINGS.get("autostt_chats", {}).get(str(chat_id))
+
+
+def _ensure_workers():
+    global _queue
+    if _queue is None:
+        _queue = asyncio.PriorityQueue(maxsize=AUTO_STT_QUEUE_MAX)
+    _workers[:] = [w for w in _workers if not w.done()]
+    while len(_workers) < AUTO_STT_WORKERS:
+        _workers.append(asyncio.create_task(_worker()))
+
+
+def enqueue(client, message):
+    """
+    Ставит голосовое/кружок в фоновую очередь. Повторы того же файла
+    (пересылки, несколько аккаунтов в чате) не дублируются.
+    Возвращает False, если очередь переполнена.
+    """
+    media = media_of(message)
+    if not media or media.file_unique_id in _jobs:
+        return True
+
+    _ensure_workers()
+    job = (client, message, media, asyncio.get_running_loop().create_future())
+    try:
+        _queue.put_nowait((media.duration or 0, next(_seq), job))
+    except asyncio.QueueFull:
+        metrics.inc("autostt_dropped")
+        return False
+
+    _jobs[media.file_unique_id] = job[3]
+    metrics.inc("autostt_queued")
+    return True
+
+
+def running_job(file_unique_id):
+    """
+    Future уже выполняющегося задания — фоновым воркером или забравшим его .stt
+    (чтобы не запускать вторую расшифровку того же файла).
+    """
+    if file_unique_id in _running or file_unique_id in _claimed:
+        return _jobs.get(file_unique_id)
+    return None
+
+
+def claim_job(file_unique_id):
+    """
+    Забирает у очереди еще не начатое задание на этот файл: воркер его пропустит,
+    а ждущие running_job получат результат из release_job. True, если забрали.
+    """
+    if file_unique_id not in _jobs or file_unique_id in _running or file_unique_id in _claimed:
+        return False
+    _claimed.add(file_unique_id)
+    return True
+
+
+def release_job(file_unique_id, result):
+    """Завершает забранное задание результатом .stt (None — прервано)."""
+    _claimed.discard(file_unique_id)
+    fut = _jobs.pop(file_unique_id, None)
+    if fut and not fut.done():
+        fut.set_result(result or {"error": "Расшифровка прервана"})
+
+
+@asynccontextmanager
+async def interactive():
+    """Интерактивный .stt: пока он идет, фоновые задания не начинают запросы к Gemini."""
+    global _interactive
+    _, idle = _get_gate()
+    _interactive += 1
+    idle.clear()
+    try:
+        yield
+    finally:
+        _interactive -= 1
+        if not _interactive:
+            idle.set()
+
+
+@asynccontextmanager
+async def _background_gemini():
+    """Слот фонового запроса к Gemini: не больше AUTO_STT_GEMINI_PARALLEL и после интерактивных."""
+    gate, idle = _get_gate()
+    async with gate:
+        await idle.wait()
+        yield
+
+
+async def _transcribe(client, message, media):
+    cached = await get_transcript(media.file_unique_id)
+    if cached:
+        return cached
+
+    if is_short_voice(message):
+        buf = await client.download_media(message, in_memory=True)
+        async with _background_gemini():
+            res = await transcribe_bytes(bytes(buf.getbuffer()), media.mime_type or "audio/ogg")
+    else:
+        async with workspace("autostt") as ws:
+            path = await client.download_media(message, file_name=f"{ws.dir}/")
+            prepared = await preprocess_audio(path, priority=transcoder.PRIORITY_BACKGROUND)
+            async with _background_gemini():
+                res = await transcribe_via_gemini(path, prepared=prepared, priority=transcoder.PRIORITY_BACKGROUND)
+
+    await save_transcript(media.file_unique_id, res)
+    return res
+
+
+async def _worker():
+    while True:
+        _, _, (client, message, media, fut) = await _queue.get()
+        fid = media.file_unique_id
+        if fut.done() or fid in _claimed:
+            # Задание забрал .stt (claim_job) — результат отдаст он
+            _queue.task_done()
+            continue
+        _running.add(fid)
+        try:
+            res = await _transcribe(client, message, media)
+            if not fut.done(): fut.set_result(res)
+
+            if "error" in res:
+                metrics.inc("autostt_failed")
+                print(f"AutoSTT Error ({message.chat.id}/{message.id}): {res['error']}")
+            else:
+                metrics.inc("autostt_done")
+                settings = chat_settings(message.chat.id)
+                if settings and settings.get("reply"):
+                    await smart_reply(message, format_transcript(res), title="Transcription")
+        except asyncio.CancelledError:
+            if not fut.done(): fut.cancel()
+            raise
+        except Exception as e:
+            metrics.inc("autostt_failed")
+            print(f"AutoSTT Error ({message.chat.id}/{message.id}): {e}")
+            if not fut.done(): fut.set_result({"error": str(e)})
+        finally:
+            _running.discard(fid)
+            _jobs.pop(fid, None)
+            _queue.task_done()
+
+
+def queue_size():
+    return _queue.qsize() if _queue else 0
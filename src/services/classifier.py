@@ -0,0 +1,78 @@
+import re
+
+# Смех: сообщение целиком из этих символов (рус/англ "хаха", скобочки, дефисы, пробелы)
+LAUGH_CHARS = "хахэпзвъжолhaxjlo)(- \t\n\r"
+
+# Один проход по тексту: ссылка | эмодзи (флаг = пара regional indicators) | слово.
+# Модификаторы тона кожи (U+1F3FB–1F3FF), ZWJ и вариационные селекторы
+# не попадают ни в одну группу и просто пропускаются.
+TOKEN_PATTERN = re.compile(
+    r"(https?://\S+|www\.\S+|t\.me/\S+)"
+    r"|([\U0001F1E6-\U0001F1FF]{2}|[\U0001F300-\U0001F3FA\U0001F400-\U0001FAFF\u2600-\u27BF\u2300-\u23FF\u2B50\u2B55])"
+    r"|([\w-]+)"
+)
+
+class MessageFeatures:
+    """
+    Признаки сообщения для аналитики.
+    kind — "text", тип медиа Pyrogram ("photo", "sticker", "voice", ...) или "service".
+    """
+    __slots__ = ("kind", "laugh", "words", "emojis", "links", "sticker_emoji", "reactions")
+
+    def __init__(self):
+        self.kind = "text"
+        self.laugh = False
+        self.words = ()
+        self.emojis = ()
+        self.links = 0
+        self.sticker_emoji = None
+        self.reactions = ()
+
+
+def classify_text(text, features):
+    """Разбор текста (уже в нижнем регистре) за один проход регулярки."""
+    # strip по набору символов смеха — C-уровень, обрывается на первом "чужом" символе
+    features.laugh = len(text) >= 3 and not text.strip(LAUGH_CHARS)
+
+    words = []
+    emojis = []
+    links = 0
+    for link, emoji, word in TOKEN_PATTERN.findall(text):
+        if word:
+            words.append(word)
+        elif emoji:
+            emojis.append(emoji)
+        else:
+            links += 1
+
+    features.words = words
+    features.emojis = emojis
+    features.links += links
+    return features
+
+
+def classify_message(msg):
+    """Все признаки сообщения: тип, смех, слова, эмодзи, ссылки, стикер, реакции."""
+    features = MessageFeatures()
+
+    media = msg.media
+    if media is not None:
+        features.kind = media.value
+        if msg.sticker:
+            features.sticker_emoji = msg.sticker.emoji
+    elif msg.service:
+        features.kind = "service"
+
+    reactions = msg.reactions
+    if reactions and reactions.reactions:
+        features.reactions = [(r.emoji or "custom", r.count) for r in reactions.reactions]
+
+    text = msg.text or msg.caption
+    if text:
+        # Скрытые ссылки ([текст](url)) видны только в entities
+        entities = msg.entities or msg.caption_entities
+        if entities:
+            features.links = sum(1 for e in entities if e.type.value == "text_link")
+        classify_text(text.lower(), features)
+
+    return features
@@ -0,0 +1,166 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from src.config import DL_MAX_PARALLEL
+from src.services import metrics
+from src.services.info_cache import normalize_url
+from src.services.progress import format_transfer
+from src.services.workspace import open_workspace
+from src.services.media import download_video, download_yandex_track
+
+# (normalized_url, mode) -> DownloadJob, пока задание качается или его файлы кем-то используются
+_jobs = {}
+_limiter = None
+
+
+def _get_limiter():
+    global _limiter
+    if _limiter is None:
+        _limiter = asyncio.Semaphore(DL_MAX_PARALLEL)
+    return _limiter
+
+
+class DownloadJob:
+    """
+    Одна загрузка (общая для всех, кто прислал ту же ссылку с тем же режимом).
+    progress — последнее событие yt-dlp (downloaded_bytes, total_bytes, speed, eta...).
+    slots — треки альбома по порядку: None — качается, False — ошибка, иначе путь.
+    Файлы лежат в своей рабочей папке (workspace) и удаляются вместе с ней,
+    когда загрузка закончилась и ее отпустил последний пользователь.
+    """
+
+    def __init__(self, key, url, mode):
+        self.key = key
+        self.url = url
+        self.mode = mode
+        self.state = "queued"
+        self.progress = {}
+        self.paths = []
+        self.slots = []
+        self.workspace = None
+        self.users = 0
+        self.loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self.task = asyncio.create_task(self._run())
+        self.task.add_done_callback(lambda _: self._changed.set())
+        self.task.add_done_callback(lambda _: self._maybe_cleanup())
+
+    def hook(self, event):
+        """progress hook для yt-dlp: вызывается из потока, событие переносится в цикл."""
+        self.loop.call_soon_threadsafe(self._publish, dict(event))
+
+    def _publish(self, event):
+        event.pop("info_dict", None)
+        self.progress = event
+
+    def _on_track(self, index, total, path):
+        if len(self.slots) != total:
+            self.slots = [None] * total
+        self.slots[index] = path or False
+        self._changed.set()
+
+    async def _run(self):
+        async with _get_limiter():
+            # Место на диске: при превышении квоты ждем, пока другие задания освободят
+            self.workspace = await open_workspace("dl")
+            self.state = "downloading"
+            workdir = self.workspace.dir
+            if "music.yandex" in self.url:
+                paths = await download_yandex_track(
+                    self.url, progress_hook=self.hook, on_track=self._on_track, workdir=workdir
+                )
+            else:
+                path = await download_video(self.url, self.mode, progress_hook=self.hook, workdir=workdir)
+                paths = [path] if path else []
+        # Пути к файлам или NamedSpool (MP3 в памяти из быстрого аудио-пути)
+        self.paths = [p for p in paths if p and (not isinstance(p, str) or os.path.exists(p))]
+        self.state = "done"
+        metrics.inc("dl_jobs")
+        return self.paths
+
+    async def wait(self):
+        """Пути к файлам (пустой список при ошибке). Отмена ожидающего не отменяет загрузку."""
+        return await asyncio.shield(self.task)
+
+    async def batches(self, size=10):
+        """
+        Готовые файлы в исходном порядке пачками до size штук.
+        Пачка отдается, как только докачан весь префикс до нее, не дожидаясь остальных;
+        последняя (неполная) — после окончания загрузки.
+        """
+        sent = 0
+        while True:
+            self._changed.clear()
+            finished = self.task.done()
+            slots = self.slots or (self.paths if finished else [])
+            ready = len(slots) if finished else next(
+                (i for i, p in enumerate(slots) if p is None), len(slots))
+
+            batch = []
+            for i in range(sent, ready):
+                if slots[i]:
+                    batch.append(slots[i])
+                if len(batch) == size:
+                    yield batch
+                    batch, sent = [], i + 1
+            if finished:
+                if batch:
+                    yield batch
+                return
+            await self._changed.wait()
+
+    def status_text(self):
+        if self.state == "queued":
+            return "⏳ В очереди на скачивание..."
+        p = self.progress
+        if "tracks_total" in p:
+            return f"📥 Скачиваю треки: {p['tracks_done']}/{p['tracks_total']}"
+        if p.get("status") == "finished":
+            return "⚙️ Обработка файла..."
+        done = p.get("downloaded_bytes")
+        if not done:
+            return "📥 Скачиваю на сервер..."
+
+        total = p.get("total_bytes") or p.get("total_bytes_estimate")
+        return format_transfer("📥 Скачиваю", done, total, p.get("speed"), p.get("eta"))
+
+    def release(self):
+        self.users -= 1
+        self._maybe_cleanup()
+
+    def _maybe_cleanup(self):
+        if self.users > 0 or not self.task.done():
+            return
+        if _jobs.get(self.key) is self:
+            del _jobs[self.key]
+        for item in self.paths:
+            if not isinstance(item, str):
+                item.close()
+        if self.workspace:
+            self.workspace.close()
+
+
+@asynccontextmanager
+async def download(url, mode=0):
+    """
+    Берет (или создает) задание загрузки. Одинаковые ссылки в работе
+    делят одно задание; файлы живут до выхода последнего пользователя.
+    """
+    key = (normalize_url(url), mode)
+    job = _jobs.get(key)
+    if job is None:
+        job = _jobs[key] = DownloadJob(key, url, mode)
+    else:
+        metrics.inc("dl_dedup")
+    job.users += 1
+    try:
+        yield job
+    finally:
+        job.release()
+
+
+async def watch_progress(job, reporter):
+    """Пока задание качается, передает его статус в ProgressReporter (он сам ограничивает частоту правок)."""
+    while not job.task.done():
+        await reporter.update(job.status_text())
+        await asyncio.sleep(1)
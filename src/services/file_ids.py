@@ -0,0 +1,95 @@
+import asyncio
+import sqlite3
+import time
+from src.services.local_web import DB_PATH
+
+# Таблица создается один раз за процесс, а не на каждом обращении
+_db_ready = False
+
+
+def init_file_ids_db():
+    """Инициализирует общий кэш file_id (TTS, .dl), если он не существует (один раз за процесс)"""
+    global _db_ready
+    if _db_ready:
+        return
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        # file_id привязан к аккаунту, поэтому ключ включает account;
+        # kind — кто положил запись ("tts", "dl"), key — ключ в его кэше
+        conn.execute('''CREATE TABLE IF NOT EXISTS file_ids
+                        (
+                            kind TEXT,
+                            key TEXT,
+                            account INTEGER,
+                            file_id TEXT,
+                            size INTEGER,
+                            created REAL,
+                            PRIMARY KEY (kind, key, account)
+                        )''')
+        conn.commit()
+    finally:
+        conn.close()
+    _db_ready = True
+
+
+def _get(kind, key, account):
+    init_file_ids_db()
+    conn = sqlite3.connect(DB_PATH, timeout=10)
+    try:
+        return conn.execute(
+            "SELECT file_id, size FROM file_ids WHERE kind = ? AND key = ? AND account = ?",
+            (kind, key, account)
+        ).fetchone()
+    finally:
+        conn.close()
+
+
+def _set(kind, key, account, file_id, size):
+    init_file_ids_db()
+    conn = sqlite3.connect(DB_PATH, timeout=10)
+    try:
+        if file_id:
+            conn.execute(
+                "INSERT OR REPLACE INTO file_ids (kind, key, account, file_id, size, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, key, account, file_id, size, time.time())
+            )
+        else:
+            conn.execute(
+                "DELETE FROM file_ids WHERE kind = ? AND key = ? AND account = ?", (kind, key, account)
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def delete_key(conn, kind, key):
+    """
+    Удаляет file_id всех аккаунтов для key в транзакции вызывающего (при вытеснении
+    из его кэша). Таблица к этому моменту должна быть создана (init_file_ids_db).
+    """
+    conn.execute("DELETE FROM file_ids WHERE kind = ? AND key = ?", (kind, key))
+
+
+def account_of(client):
+    return client.me.id if client.me else 0
+
+
+async def get_file_id(client, kind, key):
+    """(file_id, size) файла, который этот аккаунт уже загружал под key, или None."""
+    return await asyncio.to_thread(_get, kind, key, account_of(client))
+
+
+async def remember(client, kind, key, media):
+    """Запоминает file_id отправленного медиа (document/video/audio/voice)."""
+    if not media:
+        return
+    try:
+        await asyncio.to_thread(_set, kind, key, account_of(client), media.file_id, media.file_size or 0)
+    except Exception as e:
+        print(f"File ID Cache Error: {e}")
+
+
+async def forget(client, kind, key):
+    """Забывает file_id (протух: file reference и т.п.)."""
+    await asyncio.to_thread(_set, kind, key, account_of(client), None, 0)
@@ -0,0 +1,53 @@
+import aiohttp
+from src.config import HTTP_LIMIT, HTTP_LIMIT_PER_HOST, HTTP_DNS_TTL, HTTP_KEEPALIVE, HTTP_TIMEOUT
+
+# Таймаут по умолчанию; долгие запросы (генерация картинок) передают свой timeout в get/post
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=HTTP_TIMEOUT, sock_connect=10)
+
+# Один пул соединений на процесс: keep-alive, DNS-кэш и лимит на хост общие для всех сессий
+_connector = None
+# name -> ClientSession (у сервисов со своими заголовками/куками — своя сессия поверх общего пула)
+_sessions = {}
+
+
+def _get_connector():
+    global _connector
+    if _connector is None or _connector.closed:
+        _connector = aiohttp.TCPConnector(
+            limit=HTTP_LIMIT,
+            limit_per_host=HTTP_LIMIT_PER_HOST,
+            ttl_dns_cache=HTTP_DNS_TTL,
+            keepalive_timeout=HTTP_KEEPALIVE,
+        )
+    return _connector
+
+
+def get_session(name="default", **kwargs):
+    """
+    Общая aiohttp-сессия по имени (создается при первом обращении).
+    kwargs (headers, cookies, timeout) применяются только при создании.
+    Сессию не закрывать — это делает close_all() при остановке бота.
+    """
+    session = _sessions.get(name)
+    if session is None or session.closed:
+        kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+        session = _sessions[name] = aiohttp.ClientSession(
+            connector=_get_connector(), connector_owner=False, **kwargs
+        )
+    return session
+
+
+async def start():
+    """Поднимает пул и основную сессию вместе с приложением."""
+    get_session()
+
+
+async def close_all():
+    """Закрывает все сессии и пул (при выходе из main)."""
+    global _connector
+    for session in list(_sessions.values()):
+        await session.close()
+    _sessions.clear()
+    if _connector is not None:
+        await _connector.close()
+        _connector = None
@@ -4,14 +4,17 @@ import time
 import random
 import aiohttp
 from src.services.ai_core import get_ai_client, rotate_key_and_retry
+from src.services.http import get_session
 from src.config import IMAGEN_MODEL
 from google.genai import types
 
+FLUX_TIMEOUT = aiohttp.ClientTimeout(total=180, sock_connect=10)
 
-async def generate_imagen(prompt):
+
+async def generate_imagen(prompt, workdir=None):
     """
     Генерация через Google Imagen 3.
-    Использует ротацию ключей.
+    Использует ротацию ключей. workdir — папка задания (workspace).
     """
 
     async def _worker():
@@ -35,7 +38,7 @@ async def generate_imagen(prompt):
             # Сохраняем результат
             if response.generated_images:
                 image_data = response.generated_images[0].image.image_bytes
-                filename = f"img_imagen_{int(time.time())}.jpg"
+                filename = os.path.join(workdir or "", f"img_imagen_{int(time.time())}.jpg")
 
                 with open(filename, "wb") as f:
                     f.write(image_data)
@@ -56,10 +59,10 @@ async def generate_imagen(prompt):
         return None, str(e)
 
 
-async def generate_flux(prompt):
+async def generate_flux(prompt, workdir=None):
     """
     Генерация через Pollinations (Flux).
-    Полностью бесплатно, без ключей.
+    Полностью бесплатно, без ключей. workdir — папка задания (workspace).
     """
     # Добавляем seed для вариативности
     seed = random.randint(0, 100000)
@@ -69,17 +72,17 @@ async def generate_flux(prompt):
 
     url = f"https://image.pollinations.ai/prompt/{safe_prompt}?width=1024&height=1024&seed={seed}&model=flux"
 
-    filename = f"img_flux_{int(time.time())}.jpg"
+    filename = os.path.join(workdir or "", f"img_flux_{int(time.time())}.jpg")
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as resp:
-                if resp.status == 200:
-                    data = await resp.read()
-                    with open(filename, "wb") as f:
-                        f.write(data)
-                    return filename, None
-                else:
-                    return None, f"HTTP Error: {resp.status}"
+        # Генерация идет, пока открыт запрос — даем больше общего таймаута
+        async with get_session().get(url, timeout=FLUX_TIMEOUT) as resp:
+            if resp.status == 200:
+                data = await resp.read()
+                with open(filename, "wb") as f:
+                    f.write(data)
+                return filename, None
+            else:
+                return None, f"HTTP Error: {resp.status}"
     except Exception as e:
         return None, str(e)
\ No newline at end of file
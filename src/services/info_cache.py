@@ -0,0 +1,125 @@
+import asyncio
+import json
+import re
+import sqlite3
+import time
+import zlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from src.config import INFO_CACHE_TTL
+from src.services import metrics
+from src.services.local_web import DB_PATH
+
+# Параметры-трекеры, которые не меняют сам медиафайл
+TRACKING_PARAMS = re.compile(r"^(utm_\w+|si|feature|fbclid|gclid|igshid|ref|ref_src|pp)$")
+# Таблица создается один раз за процесс, а не на каждом обращении
+_db_ready = False
+
+
+def normalize_url(url):
+    """
+    Приводит ссылку к каноническому виду для дедупа/кэша:
+    схема и хост в нижнем регистре, без www./m., без трекеров и якоря,
+    youtu.be/ID и /shorts/ID -> youtube.com/watch?v=ID.
+    """
+    url = url.strip().strip("<>")
+    if "://" not in url:
+        url = f"https://{url}"
+    parts = urlsplit(url)
+    host = parts.netloc.lower()
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    path = parts.path.rstrip("/") or "/"
+    query = [(k, v) for k, v in parse_qsl(parts.query) if not TRACKING_PARAMS.match(k)]
+
+    if host == "youtu.be":
+        host, query, path = "youtube.com", [("v", path.strip("/"))] + query, "/watch"
+    elif host in ("youtube.com", "music.youtube.com"):
+        m = re.match(r"^/(shorts|live)/([\w-]+)", path)
+        if m:
+            query, path = [("v", m.group(2))] + query, "/watch"
+        if path == "/watch":
+            # Для видео значим только id (плейлист/таймкод файл не меняют)
+            query = [(k, v) for k, v in query if k == "v"]
+
+    return urlunsplit(("https", host, path, urlencode(sorted(query)), ""))
+
+
+def init_info_cache_db():
+    """Инициализирует кэш результатов yt-dlp extract_info, если он не существует (один раз за процесс)"""
+    global _db_ready
+    if _db_ready:
+        return
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        # info — zlib(JSON) сырого ответа экстрактора (до выбора формата)
+        conn.execute('''CREATE TABLE IF NOT EXISTS ytdlp_info
+                        (
+                            url TEXT PRIMARY KEY,
+                            info BLOB,
+                            created REAL
+                        )''')
+        conn.commit()
+    finally:
+        conn.close()
+    _db_ready = True
+
+
+def _load(url):
+    init_info_cache_db()
+    conn = sqlite3.connect(DB_PATH, timeout=10)
+    try:
+        row = conn.execute(
+            "SELECT info FROM ytdlp_info WHERE url = ? AND created > ?", (url, time.time() - INFO_CACHE_TTL)
+        ).fetchone()
+    finally:
+        conn.close()
+    return json.loads(zlib.decompress(row[0])) if row else None
+
+
+def _store(url, info):
+    init_info_cache_db()
+    blob = zlib.compress(json.dumps(info, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    conn = sqlite3.connect(DB_PATH, timeout=10)
+    try:
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO ytdlp_info (url, info, created) VALUES (?, ?, ?)", (url, blob, now)
+        )
+        # Ссылки на форматы подписаны и протухают — старое не храним
+        conn.execute("DELETE FROM ytdlp_info WHERE created <= ?", (now - INFO_CACHE_TTL,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _forget(url):
+    init_info_cache_db()
+    conn = sqlite3.connect(DB_PATH, timeout=10)
+    try:
+        conn.execute("DELETE FROM ytdlp_info WHERE url = ?", (url,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+async def load_info(url):
+    """info dict для нормализованной ссылки, если он моложе INFO_CACHE_TTL, иначе None."""
+    try:
+        info = await asyncio.to_thread(_load, url)
+    except Exception as e:
+        print(f"Info Cache Error: {e}")
+        info = None
+    metrics.inc("info_cache_hits" if info else "info_cache_misses")
+    return info
+
+
+async def store_info(url, info):
+    try:
+        await asyncio.to_thread(_store, url, info)
+    except Exception as e:
+        print(f"Info Cache Error: {e}")
+
+
+async def forget_info(url):
+    await asyncio.to_thread(_forget, url)
@@ -1,140 +1,399 @@
 import asyncio
+import copy
 import os
+import tempfile
 import re
+import time
 import logging
+import aiohttp
 import yt_dlp
 from yandex_music import Client as YMClient
-from src.config import YANDEX_TOKEN
+from yandex_music.exceptions import UnauthorizedError
+from src.config import YANDEX_TOKEN, YM_MAX_PARALLEL, YM_ACCOUNT_TTL, AUDIO_SPOOL_MAX_MB
+from src.services import transcoder
+from src.services.info_cache import normalize_url, load_info, store_info, forget_info
+from src.services.segmented import download_file
 
-# Инициализация Yandex Music
-ym_client = YMClient(YANDEX_TOKEN).init() if YANDEX_TOKEN else None
+# Клиент Yandex Music создается лениво (init() ходит в сеть — не на импорте)
+_ym_client = None
+_ym_checked_at = 0
+_ym_lock = asyncio.Lock()
 logger = logging.getLogger(__name__)
 
 
-async def download_video(link: str, quality_mode: int):
+async def get_ym_client(force=False):
     """
-    Скачивание видео/аудио через yt-dlp.
+    Клиент Яндекс.Музыки (или None без токена).
+    Создается в потоке при первом обращении и кэшируется; данные аккаунта
+    перезапрашиваются раз в YM_ACCOUNT_TTL сек, force=True — пересоздать (после 401).
+    """
+    global _ym_client, _ym_checked_at
+    if not YANDEX_TOKEN:
+        return None
+
+    async with _ym_lock:
+        now = time.monotonic()
+        if force or _ym_client is None:
+            _ym_client = await asyncio.to_thread(YMClient(YANDEX_TOKEN).init)
+            _ym_checked_at = now
+        elif now - _ym_checked_at > YM_ACCOUNT_TTL:
+            try:
+                await asyncio.to_thread(_ym_client.init)
+            except UnauthorizedError:
+                # Сессия отозвана — пересоздаем клиент
+                _ym_client = await asyncio.to_thread(YMClient(YANDEX_TOKEN).init)
+            except Exception as e:
+                # Сеть моргнула — работаем со старыми данными аккаунта
+                print(f"Yandex Music Refresh Error: {e}")
+            _ym_checked_at = now
+        return _ym_client
+
+
+def ydl_options(quality_mode: int, progress_hook=None, workdir=None):
+    """
+    Опции yt-dlp под режим качества.
     quality_mode:
     0 - Лучшее качество (видео + аудио) -> MP4
     1 - Низкое качество (для экономии трафика) -> MP4
     2 - Только аудио -> MP3
     """
+    options = {
+        'outtmpl': os.path.join(workdir or "", '%(title)s.%(ext)s'),
+        'quiet': True,
+        'no_warnings': True,
+        # ВАЖНО: Пакуем в MP4, чтобы Telegram нормально отображал превью
+        'merge_output_format': 'mp4',
+        'geo_bypass': True,
+    }
+    if progress_hook:
+        options['progress_hooks'] = [progress_hook]
 
-    def _sync_dl():
-        options = {
-            'outtmpl': '%(title)s.%(ext)s',
-            'quiet': True,
-            'no_warnings': True,
-            # ВАЖНО: Пакуем в MP4, чтобы Telegram нормально отображал превью
-            'merge_output_format': 'mp4',
-            'geo_bypass': True,
-        }
+    if quality_mode == 2:
+        # --- AUDIO (MP3) ---
+        options.update({
+            'format': 'bestaudio/best',
+            'postprocessors': [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'mp3',
+                'preferredquality': '192',
+            }],
+            # Для аудио mp4 контейнер не нужен
+            'merge_output_format': None
+        })
+    elif quality_mode == 1:
+        # --- LOW QUALITY (480p) ---
+        # Ищем формат mp4 высотой <= 480
+        options.update({'format': 'bestvideo[height<=480][ext=mp4]+bestaudio/best[height<=480]/best'})
+    else:
+        # --- BEST QUALITY ---
+        options.update({'format': 'bestvideo+bestaudio/best'})
+    return options
 
-        if quality_mode == 2:
-            # --- AUDIO (MP3) ---
-            options.update({
-                'format': 'bestaudio/best',
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
-                }],
-                # Для аудио mp4 контейнер не нужен
-                'merge_output_format': None
-            })
-        elif quality_mode == 1:
-            # --- LOW QUALITY (480p) ---
-            # Ищем формат mp4 высотой <= 480
-            options.update({'format': 'bestvideo[height<=480][ext=mp4]+bestaudio/best[height<=480]/best'})
-        else:
-            # --- BEST QUALITY ---
-            options.update({'format': 'bestvideo+bestaudio/best'})
 
-        try:
-            with yt_dlp.YoutubeDL(options) as ydl:
-                info = ydl.extract_info(link, download=True)
-
-                if quality_mode == 2:
-                    title = info['title']
-                    # yt-dlp чистит имя файла, но мы перестрахуемся
-                    sanitized_title = re.sub(r'[\\/*?:"<>|]', "", title)
-                    # Ищем файл с расширением mp3 (так как постпроцессор его конвертировал)
-                    # Иногда yt-dlp меняет имя, поэтому лучше вернуть ожидаемое имя
-                    # Но самый надежный способ - найти файл в папке, который начинается так же
-
-                    # Простой вариант возврата (обычно работает корректно с outtmpl)
-                    return f"{sanitized_title}.mp3"
-
-                # Для видео возвращаем имя, которое подготовил yt-dlp
-                # prepare_filename может вернуть расширение webm, но merge_output_format сделает mp4
-                # Поэтому мы подменяем расширение в пути
-                filename = ydl.prepare_filename(info)
-                base_name = filename.rsplit('.', 1)[0]
-                return f"{base_name}.mp4"
+async def extract_raw_info(ydl, link):
+    """
+    Результат экстрактора до выбора формата (страница, плеер, список форматов) — (info, из кэша).
+    Одиночные видео кэшируются по нормализованной ссылке на INFO_CACHE_TTL:
+    повторный .dl или смена режима после .dl info не платят за извлечение еще раз.
+    Редиректы (_type url — короткие ссылки) сразу разворачиваются до видео.
+    В кэш идет JSON-копия (sanitize_info), вызывающий получает исходный info.
+    """
+    key = normalize_url(link)
+    info = await load_info(key)
+    if info:
+        return info, True
+
+    info = await asyncio.to_thread(ydl.extract_info, link, download=False, process=False)
+    for _ in range(3):
+        if info.get('_type') != 'url':
+            break
+        info = await asyncio.to_thread(
+            ydl.extract_info, info['url'], download=False, process=False, ie_key=info.get('ie_key')
+        )
+    # Плейлисты и оставшиеся редиректы (url_transparent) не кэшируем
+    if info.get('_type', 'video') == 'video':
+        sanitized = await asyncio.to_thread(ydl.sanitize_info, info, True)
+        await store_info(key, sanitized)
+    return info, False
+
+
+async def download_video(link: str, quality_mode: int, progress_hook=None, workdir=None):
+    """
+    Скачивание видео/аудио через yt-dlp (режимы — см. ydl_options).
+    progress_hook — yt-dlp progress hook (вызывается из потока загрузки).
+    workdir — папка задания (workspace), иначе текущая.
+    Возвращает путь к файлу, в режиме 2 — NamedSpool (MP3 в памяти), или None.
+    """
+
+    # Итоговый путь сообщают post-processor hooks (ExtractAudio, Merger, MoveFiles...) — не угадываем
+    final_paths = []
+
+    def _pp_hook(event):
+        if event.get('status') == 'finished' and event.get('info_dict', {}).get('filepath'):
+            final_paths.append(event['info_dict']['filepath'])
+
+    def _sync_dl(ydl, info):
+        final_paths.clear()
+        ydl.process_info(info)
+        if final_paths:
+            return final_paths[-1]
+
+        # Постпроцессоры не запускались: файл — ровно то, что подготовил yt-dlp
+        # (при склейке merge_output_format дает mp4, для аудио — mp3)
+        filename = ydl.prepare_filename(info)
+        base_name = filename.rsplit('.', 1)[0]
+        return f"{base_name}.mp3" if quality_mode == 2 else f"{base_name}.mp4"
+
+    async def _download(ydl, raw_info):
+        # Выбор формата под режим — локально, по готовому списку форматов
+        info = await asyncio.to_thread(ydl.process_ie_result, raw_info, download=False)
+
+        # Аудио: ffmpeg сам читает поток по ссылке и кодирует в MP3 — без исходника на диске
+        if quality_mode == 2 and is_streamable_audio(info):
+            audio = await stream_audio(ydl, info, workdir, progress_hook)
+            if audio:
+                return audio
+
+        # Один прямой файл без склейки — качаем сами, параллельными Range-кусками
+        if quality_mode != 2 and is_direct_format(info):
+            path = ydl.prepare_filename(info)
+            if await download_file(info['url'], path, headers=info.get('http_headers'),
+                                   progress_hook=progress_hook):
+                return path
+
+        return await asyncio.to_thread(_sync_dl, ydl, info)
+
+    try:
+        options = ydl_options(quality_mode, progress_hook, workdir)
+        options['postprocessor_hooks'] = [_pp_hook]
+        with yt_dlp.YoutubeDL(options) as ydl:
+            raw_info, cached = await extract_raw_info(ydl, link)
+            try:
+                return await _download(ydl, raw_info)
+            except Exception as e:
+                if not cached:
+                    raise
+                # Подписанные ссылки из кэша могли протухнуть — извлекаем заново
+                print(f"yt-dlp cached info failed, re-extracting: {e}")
+                await forget_info(normalize_url(link))
+                raw_info, _ = await extract_raw_info(ydl, link)
+                return await _download(ydl, raw_info)
+
+    except Exception as e:
+        print(f"yt-dlp Error: {e}")
+        return None
+
+
+def estimate_size(info, quality_mode):
+    """Примерный размер результата в байтах (или None, если сайт его не сообщает)."""
+    if quality_mode == 2 and info.get('duration'):
+        # Итог — MP3 192 kbps, размер исходника не важен
+        return int(info['duration'] * 192000 / 8)
+    formats = info.get('requested_formats') or [info]
+    sizes = [f.get('filesize') or f.get('filesize_approx') for f in formats]
+    return sum(sizes) if all(sizes) else None
+
+
+async def probe_video(link: str):
+    """
+    Превью для `.dl info`: название, автор, длительность и для каждого режима —
+    выбранное качество и примерный размер. Извлечение идет через кэш,
+    так что следующий `.dl` по этой ссылке начинается сразу с загрузки.
+    """
+    with yt_dlp.YoutubeDL(ydl_options(0)) as ydl:
+        raw_info, cached = await extract_raw_info(ydl, link)
+
+    preview = {
+        "title": raw_info.get('title') or link,
+        "uploader": raw_info.get('uploader') or raw_info.get('channel'),
+        "duration": raw_info.get('duration'),
+        "cached": cached,
+        "playlist": raw_info.get('_type') in ('playlist', 'multi_video'),
+        "modes": {},
+    }
+    if preview["playlist"]:
+        return preview
 
+    def _select(mode):
+        with yt_dlp.YoutubeDL(ydl_options(mode)) as ydl:
+            return ydl.process_ie_result(copy.deepcopy(raw_info), download=False)
+
+    for mode in (0, 1, 2):
+        try:
+            info = await asyncio.to_thread(_select, mode)
         except Exception as e:
-            print(f"yt-dlp Error: {e}")
+            print(f"yt-dlp Probe Error (mode {mode}): {e}")
+            continue
+        preview["modes"][mode] = {
+            "height": info.get('height'),
+            "ext": "mp3" if mode == 2 else info.get('ext'),
+            "size": estimate_size(info, mode),
+        }
+    return preview
+
+
+def is_direct_format(info):
+    """Выбранный формат — одиночный файл по http(s) (без склейки видео+аудио и без HLS/DASH)."""
+    return (
+        info.get('_type', 'video') == 'video'
+        and not info.get('requested_formats')
+        and info.get('protocol') in ('http', 'https')
+        and bool(info.get('url'))
+    )
+
+
+def is_streamable_audio(info):
+    """
+    Выбранный аудиоформат ffmpeg может читать сам: один поток по http(s) или HLS.
+    Форматы с http_chunk_size (YouTube) не подходят: одним GET без разбиения на куски
+    сервер режет скорость до проигрывания — их качает yt-dlp.
+    """
+    return (
+        info.get('_type', 'video') == 'video'
+        and not info.get('requested_formats')
+        and info.get('protocol') in ('http', 'https', 'm3u8', 'm3u8_native')
+        and not (info.get('downloader_options') or {}).get('http_chunk_size')
+        and bool(info.get('url'))
+    )
+
+
+class NamedSpool(tempfile.SpooledTemporaryFile):
+    """SpooledTemporaryFile с именем для Telegram (name у базового класса — только для чтения)."""
+
+    def __init__(self, file_name, max_size, dir=None):
+        super().__init__(max_size=max_size, dir=dir)
+        self.file_name = file_name
+
+
+async def stream_audio(ydl, info, workdir=None, progress_hook=None):
+    """
+    Быстрый путь для режима MP3: ffmpeg читает выбранный аудиопоток прямо по ссылке
+    и отдает MP3 в stdout, который пишется в память (на диск — только сверх
+    AUDIO_SPOOL_MAX_MB, анонимным файлом в workdir). Имя — из шаблона yt-dlp.
+    Возвращает NamedSpool или None (тогда качаем обычным путем).
+    """
+    headers = "".join(f"{k}: {v}\r\n" for k, v in (info.get('http_headers') or {}).items())
+    name = os.path.splitext(os.path.basename(ydl.prepare_filename(info)))[0] + ".mp3"
+    spool = NamedSpool(name, AUDIO_SPOOL_MAX_MB * 1024 * 1024, dir=workdir or None)
+    # MP3 192 kbps: размер известен заранее с точностью до тегов
+    estimate = int(info['duration'] * 192000 / 8) if info.get('duration') else None
+
+    def _progress(written):
+        if progress_hook:
+            progress_hook({"status": "downloading", "downloaded_bytes": written, "total_bytes_estimate": estimate})
+
+    # Обрыв соединения посреди потока — ffmpeg переподключается сам (с Range от текущей позиции)
+    args = ["-loglevel", "error", "-reconnect", "1", "-reconnect_streamed", "1", "-reconnect_delay_max", "10"]
+    if headers:
+        args += ["-headers", headers]
+    args += ["-i", info['url'], "-vn", "-c:a", "libmp3lame", "-b:a", "192k", "-f", "mp3", "pipe:1"]
+    try:
+        # Скорость задает сеть, кодирование MP3 — доли CPU: слот потоковый, CPU-пул не держим
+        code, err = await transcoder.stream_ffmpeg(
+            args, spool, label="audio_stream", on_chunk=_progress, stream=True
+        )
+    except OSError as e:
+        print(f"FFmpeg Error: {e}")
+        code, err = -1, b""
+    if code != 0 or not spool.tell():
+        print(f"Audio Stream Error: {err.decode(errors='ignore')[-300:]}")
+        spool.close()
+        return None
+    spool.seek(0)
+    return spool
+
+
+def _yandex_tracks(ym_client, url):
+    """Треки по ссылке на трек или альбом (синхронные вызовы API — запускать в потоке)."""
+    if "track" in url:
+        # Извлекаем ID трека
+        match = re.search(r'track/(\d+)', url)
+        if match:
+            return [ym_client.tracks([match.group(1)])[0]]
+    elif "album" in url:
+        # Извлекаем ID альбома, берем все диски по порядку
+        match = re.search(r'album/(\d+)', url)
+        if match:
+            album = ym_client.albums_with_tracks(match.group(1))
+            if album and album.volumes:
+                return [track for volume in album.volumes for track in volume]
+    return []
+
+
+def _track_filename(track, index=None):
+    # Формируем имя: "Название - Артист.mp3", в альбоме — с номером "01. Название - Артист.mp3":
+    # ремиксы и live-версии с тем же названием иначе писались бы параллельно в один файл
+    safe_title = re.sub(r'[\\/*?:"<>|]', "", track.title)
+    safe_artist = re.sub(r'[\\/*?:"<>|]', "", track.artists[0].name if track.artists else "Unknown")
+    prefix = f"{index + 1:02d}. " if index is not None else ""
+    return f"{prefix}{safe_title} - {safe_artist}.mp3"
+
+
+def _direct_link(track):
+    info = track.get_download_info(get_direct_links=True)
+    return info[0].get_direct_link() if info else None
+
+
+async def _download_track(session, track, limiter, workdir, index=None):
+    """Один трек: прямая ссылка (в потоке), тело — Range-кусками на диск. index — номер в альбоме."""
+    async with limiter:
+        direct_link = await asyncio.to_thread(_direct_link, track)
+        if not direct_link:
             return None
 
-    return await asyncio.to_thread(_sync_dl)
+        # Range-кусками через общий пул альбома (соединений не больше YM_MAX_PARALLEL)
+        path = os.path.join(workdir or "", _track_filename(track, index))
+        return await download_file(direct_link, path, session=session)
 
 
-async def download_yandex_track(url: str):
+async def download_yandex_track(url: str, progress_hook=None, on_track=None, workdir=None):
     """
     Скачивание треков с Яндекс.Музыки.
-    Возвращает список путей к скачанным файлам.
+    Возвращает список путей к скачанным файлам (в порядке альбома).
+    Треки альбома качаются параллельно (не больше YM_MAX_PARALLEL соединений),
+    тело пишется на диск кусками — память не зависит от размера трека.
+    on_track(index, total, path) вызывается по готовности каждого трека
+    (path=None при ошибке); progress_hook получает события в формате yt-dlp.
+    workdir — папка задания (workspace), иначе текущая.
     """
+    try:
+        ym_client = await get_ym_client()
+        if not ym_client:
+            print("Yandex Token missing")
+            return []
+        try:
+            tracks = await asyncio.to_thread(_yandex_tracks, ym_client, url)
+        except UnauthorizedError:
+            # Сессия устарела — пересоздаем клиент и пробуем еще раз
+            ym_client = await get_ym_client(force=True)
+            tracks = await asyncio.to_thread(_yandex_tracks, ym_client, url)
+    except Exception as e:
+        print(f"Yandex Music Error: {e}")
+        return []
+    if not tracks:
+        return []
 
-    def _sync_download():
-        tracks_paths = []
+    total = len(tracks)
+    paths = [None] * total
+    done = 0
+    limiter = asyncio.Semaphore(YM_MAX_PARALLEL)
+
+    async def _one(index, track):
+        nonlocal done
         try:
-            if not ym_client:
-                print("Yandex Token missing")
-                return []
-
-            tracks = []
-            if "track" in url:
-                # Извлекаем ID трека
-                match = re.search(r'track/(\d+)', url)
-                if match:
-                    track_id = match.group(1)
-                    tracks = [ym_client.tracks([track_id])[0]]
-            elif "album" in url:
-                # Извлекаем ID альбома
-                match = re.search(r'album/(\d+)', url)
-                if match:
-                    album_id = match.group(1)
-                    album = ym_client.albums_with_tracks(album_id)
-                    if album and album.volumes:
-                        tracks = album.volumes[0]
-
-            if not tracks:
-                return []
-
-            for track in tracks:
-                # Получаем инфо для скачивания
-                info = track.get_download_info(get_direct_links=True)
-                if not info: continue
-
-                # Скачиваем байты
-                direct_link = info[0].get_direct_link()
-                # Импортируем requests локально, чтобы не засорять глобальную область
-                import requests
-                track_data = requests.get(direct_link).content
-
-                # Формируем имя: "Название - Артист.mp3"
-                safe_title = re.sub(r'[\\/*?:"<>|]', "", track.title)
-                safe_artist = re.sub(r'[\\/*?:"<>|]', "", track.artists[0].name if track.artists else "Unknown")
-                filename = f"{safe_title} - {safe_artist}.mp3"
-
-                with open(filename, 'wb') as f:
-                    f.write(track_data)
-
-                tracks_paths.append(filename)
-
-            return tracks_paths
+            paths[index] = await _download_track(
+                session, track, limiter, workdir, index if total > 1 else None
+            )
         except Exception as e:
-            print(f"Yandex Music Error: {e}")
-            return []
+            print(f"Yandex Music Error ({track.title}): {e}")
+        done += 1
+        if progress_hook:
+            progress_hook({"status": "downloading", "tracks_done": done, "tracks_total": total})
+        if on_track:
+            on_track(index, total, paths[index])
+
+    connector = aiohttp.TCPConnector(limit=YM_MAX_PARALLEL)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(_one(i, t) for i, t in enumerate(tracks)))
 
-    return await asyncio.to_thread(_sync_download)
\ No newline at end of file
+    return [p for p in paths if p]
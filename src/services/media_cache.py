@@ -0,0 +1,22 @@
+from src.services import file_ids, metrics
+
+
+def _key(url, mode):
+    return f"{mode}:{url}"
+
+
+async def get_file_id(client, url, mode):
+    """(file_id, size) ранее загруженного файла для нормализованной ссылки и режима или None."""
+    row = await file_ids.get_file_id(client, "dl", _key(url, mode))
+    metrics.inc("dl_cache_hits" if row else "dl_cache_misses")
+    return row
+
+
+async def remember(client, url, mode, sent):
+    """Запоминает file_id отправленного документа (из кэша он уходит через send_document)."""
+    media = sent.document if sent else None
+    await file_ids.remember(client, "dl", _key(url, mode), media)
+
+
+async def forget(client, url, mode):
+    await file_ids.forget(client, "dl", _key(url, mode))
@@ -0,0 +1,87 @@
+import time
+from collections import Counter, defaultdict, deque
+
+# Счетчики процесса (бот и веб-сервер живут в одном процессе)
+COUNTERS = Counter()
+# Последние замеры времени (сек) по имени
+TIMINGS = defaultdict(lambda: deque(maxlen=200))
+STARTED_AT = time.time()
+
+
+def inc(name, value=1):
+    COUNTERS[name] += value
+
+
+def observe(name, seconds):
+    TIMINGS[name].append(seconds)
+
+
+def timing_summary(name):
+    """count / avg / p95 / max (мс) по последним замерам."""
+    values = sorted(TIMINGS.get(name, ()))
+    if not values:
+        return None
+    return {
+        "count": len(values),
+        "avg_ms": round(sum(values) / len(values) * 1000, 1),
+        "p95_ms": round(values[int(0.95 * (len(values) - 1))] * 1000, 1),
+        "max_ms": round(values[-1] * 1000, 1),
+    }
+
+
+def ratio(hits, misses):
+    total = COUNTERS[hits] + COUNTERS[misses]
+    return COUNTERS[hits] / total if total else 0.0
+
+
+def snapshot():
+    """Все счетчики + производные метрики (для /api/metrics)."""
+    data = dict(COUNTERS)
+    data["uptime"] = int(time.time() - STARTED_AT)
+    data["tts_cache_hit_ratio"] = round(ratio("tts_cache_hits", "tts_cache_misses"), 3)
+    data["stt_cache_hit_ratio"] = round(ratio("stt_cache_hits", "stt_cache_misses"), 3)
+    data["info_cache_hit_ratio"] = round(ratio("info_cache_hits", "info_cache_misses"), 3)
+    data["timings"] = {name: timing_summary(name) for name in list(TIMINGS)}
+    return data
+
+
+def format_metrics():
+    """Короткий блок для .sys"""
+    text = (
+        f"🗄 TTS Cache: `{COUNTERS['tts_cache_hits']}/{COUNTERS['tts_cache_hits'] + COUNTERS['tts_cache_misses']}` "
+        f"({ratio('tts_cache_hits', 'tts_cache_misses'):.0%}), "
+        f"saved `{COUNTERS['tts_cache_bytes_saved'] / 1024 / 1024:.1f} MB`, "
+        f"uploads skipped `{COUNTERS['tts_upload_skipped']}`"
+    )
+    stt_total = COUNTERS['stt_cache_hits'] + COUNTERS['stt_cache_misses']
+    if stt_total:
+        text += (
+            f"\n📝 STT Cache: `{COUNTERS['stt_cache_hits']}/{stt_total}` "
+            f"({ratio('stt_cache_hits', 'stt_cache_misses'):.0%})"
+        )
+    dl_total = COUNTERS['dl_cache_hits'] + COUNTERS['dl_cache_misses']
+    if dl_total:
+        text += (
+            f"\n📦 DL Cache: `{COUNTERS['dl_cache_hits']}/{dl_total}`, "
+            f"saved `{COUNTERS['dl_cache_bytes_saved'] / 1024 / 1024:.1f} MB`"
+        )
+    upload = timing_summary("upload_big")
+    if upload:
+        text += (
+            f"\n📤 Uploads: `{COUNTERS['upload_big_files']}` big, "
+            f"avg `{upload['avg_ms'] / 1000:.1f} s`, part retries `{COUNTERS['upload_part_retries']}`"
+        )
+    info_total = COUNTERS['info_cache_hits'] + COUNTERS['info_cache_misses']
+    if info_total:
+        text += (
+            f"\n🔎 yt-dlp Info Cache: `{COUNTERS['info_cache_hits']}/{info_total}` "
+            f"({ratio('info_cache_hits', 'info_cache_misses'):.0%})"
+        )
+    run = timing_summary("transcode_run")
+    if run:
+        wait = timing_summary("transcode_wait")
+        text += (
+            f"\n🎞 FFmpeg: `{COUNTERS['transcode_jobs']}` jobs, "
+            f"run avg `{run['avg_ms']:.0f} ms`, wait p95 `{wait['p95_ms']:.0f} ms`"
+        )
+    return text
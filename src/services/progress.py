@@ -0,0 +1,51 @@
+import time
+
+
+def format_transfer(title, done, total=None, speed=None, eta=None):
+    """"📥 Скачиваю: 42.0% (42.0/100.0 MB) · 3.1 MB/s · ETA 0:18" (скорость в байтах/с, eta в секундах)."""
+    if total:
+        text = f"{title}: {done * 100 / total:.1f}% ({done / 1024 / 1024:.1f}/{total / 1024 / 1024:.1f} MB)"
+    else:
+        text = f"{title}: {done / 1024 / 1024:.1f} MB"
+    if speed:
+        text += f" · {speed / 1024 / 1024:.1f} MB/s"
+    if eta is not None:
+        m, s = divmod(int(eta), 60)
+        text += f" · ETA {m}:{s:02d}"
+    return text
+
+
+class ProgressReporter:
+    """
+    Один статус на задание: все стадии (очередь, скачивание, загрузка в Telegram)
+    пишут сюда, а сообщение правится не чаще interval сек и только при изменении текста.
+    """
+
+    def __init__(self, edit, interval=2.5):
+        self.edit = edit
+        self.interval = interval
+        self.last_text = None
+        self.last_at = 0
+
+    async def update(self, text, force=False):
+        now = time.monotonic()
+        if text == self.last_text or (not force and now - self.last_at < self.interval):
+            return
+        self.last_at = now
+        try:
+            await self.edit(text)
+            self.last_text = text
+        except Exception:
+            pass
+
+    def transfer(self, title):
+        """progress(current, total) для передачи байтов: сам считает скорость и ETA стадии."""
+        started = time.monotonic()
+
+        async def progress(current, total):
+            elapsed = time.monotonic() - started
+            speed = current / elapsed if elapsed > 0 else None
+            eta = (total - current) / speed if speed and total else None
+            await self.update(format_transfer(title, current, total, speed, eta), force=current >= total)
+
+        return progress
@@ -0,0 +1,164 @@
+import asyncio
+import os
+import re
+import time
+import aiohttp
+from src.config import DL_SEGMENTS, DL_SEGMENT_MIN_MB, DL_SEGMENT_RETRIES
+from src.services import metrics
+
+CHUNK_SIZE = 256 * 1024
+CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+# Медленный, но живой сегмент не убиваем: ограничиваем только паузы между кусками
+SEGMENT_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=15, sock_read=60)
+
+
+async def probe(session, url, headers=None):
+    """
+    (размер, поддержка Range). Спрашиваем сразу первый байт: HEAD многие CDN
+    отдают без Accept-Ranges или вовсе не поддерживают.
+    """
+    async with session.get(url, headers={**(headers or {}), "Range": "bytes=0-0"}) as resp:
+        resp.raise_for_status()
+        if resp.status == 206:
+            m = CONTENT_RANGE.match(resp.headers.get("Content-Range", ""))
+            if m:
+                return int(m.group(3)), True
+        return resp.content_length, False
+
+
+def plan_ranges(size, segments=DL_SEGMENTS):
+    """Делит [0, size) на не больше segments кусков не меньше DL_SEGMENT_MIN_MB."""
+    min_size = max(1, DL_SEGMENT_MIN_MB) * 1024 * 1024
+    count = max(1, min(segments, size // min_size))
+    step = -(-size // count)
+    return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+
+class _Progress:
+    """Событие в формате yt-dlp progress hook (downloaded_bytes, total_bytes, speed, eta)."""
+
+    def __init__(self, total, hook):
+        self.total = total
+        self.hook = hook
+        self.done = 0
+        self.started = time.monotonic()
+        self.last = 0
+
+    def add(self, n):
+        self.done += n
+        now = time.monotonic()
+        if not self.hook or now - self.last < 0.5:
+            return
+        self.last = now
+        speed = self.done / max(now - self.started, 1e-3)
+        event = {"status": "downloading", "downloaded_bytes": self.done, "speed": speed}
+        if self.total:
+            event["total_bytes"] = self.total
+            event["eta"] = (self.total - self.done) / speed if speed else None
+        self.hook(event)
+
+
+async def _fetch_range(session, url, fd, start, end, headers, progress):
+    """
+    Качает [start, end) в fd через os.pwrite (в потоке — запись не держит event loop).
+    При обрыве повторяет только
+    недокачанный хвост сегмента (до DL_SEGMENT_RETRIES раз).
+    """
+    pos = start
+    for attempt in range(DL_SEGMENT_RETRIES + 1):
+        try:
+            rng = {"Range": f"bytes={pos}-{end - 1}"}
+            async with session.get(url, headers={**headers, **rng}, timeout=SEGMENT_TIMEOUT) as resp:
+                if resp.status != 206:
+                    raise Exception(f"Range not honored (HTTP {resp.status})")
+                async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                    chunk = chunk[:end - pos]
+                    await asyncio.to_thread(os.pwrite, fd, chunk, pos)
+                    pos += len(chunk)
+                    progress.add(len(chunk))
+                    if pos >= end:
+                        return
+            if pos >= end:
+                return
+            raise Exception(f"Segment {start}-{end} truncated at {pos}")
+        except Exception as e:
+            if attempt == DL_SEGMENT_RETRIES:
+                raise
+            metrics.inc("dl_segment_retries")
+            print(f"Segment Retry ({attempt + 1}/{DL_SEGMENT_RETRIES}) {start}-{end}: {e}")
+            await asyncio.sleep(min(2 ** attempt, 8))
+
+
+async def _fetch_stream(session, url, path, headers, progress):
+    """Один поток, когда сервер не умеет Range или размер неизвестен (запись — как в _fetch_range)."""
+    async with session.get(url, headers=headers, timeout=SEGMENT_TIMEOUT) as resp:
+        resp.raise_for_status()
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                await asyncio.to_thread(os.pwrite, fd, chunk, progress.done)
+                progress.add(len(chunk))
+        finally:
+            os.close(fd)
+    return progress.done
+
+
+async def download_file(url, path, headers=None, session=None, segments=DL_SEGMENTS, progress_hook=None):
+    """
+    Скачивает прямую ссылку в path.
+    Если сервер поддерживает Range — segments кусков параллельно в заранее
+    выделенный файл (os.pwrite по смещениям), каждый кусок повторяется отдельно.
+    Итоговый размер сверяется с Content-Range. Возвращает path или None при ошибке.
+    session — общий пул соединений (например, альбома), иначе создается свой.
+    """
+    headers = dict(headers or {})
+    own_session = session is None
+    if own_session:
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=segments))
+
+    try:
+        size, ranged = await probe(session, url, headers)
+        progress = _Progress(size, progress_hook)
+        ranges = plan_ranges(size, segments) if ranged and size else []
+
+        if len(ranges) < 2:
+            written = await _fetch_stream(session, url, path, headers, progress)
+            if size and written != size:
+                raise Exception(f"Size mismatch: {written}/{size}")
+        else:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                # Место под файл сразу: куски пишутся в свои смещения, без дыр и перераспределений
+                if hasattr(os, "posix_fallocate"):
+                    os.posix_fallocate(fd, 0, size)
+                else:
+                    os.ftruncate(fd, size)
+                tasks = [
+                    asyncio.create_task(_fetch_range(session, url, fd, start, end, headers, progress))
+                    for start, end in ranges
+                ]
+                try:
+                    await asyncio.gather(*tasks)
+                finally:
+                    # Сегмент упал — гасим остальные до закрытия fd
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+            finally:
+                os.close(fd)
+            if progress.done != size or os.path.getsize(path) != size:
+                raise Exception(f"Size mismatch: {progress.done}/{size}")
+            metrics.inc("dl_segmented")
+
+        if progress_hook:
+            progress_hook({"status": "finished", "downloaded_bytes": progress.done, "total_bytes": size})
+        metrics.inc("dl_native_bytes", progress.done)
+        return path
+    except Exception as e:
+        print(f"Segmented Download Error: {e}")
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+    finally:
+        if own_session:
+            await session.close()
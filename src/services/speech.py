@@ -1,40 +1,23 @@
 import json
 import asyncio
+import hashlib
+import io
 import os
+import re
+import time
 from google.genai import types
-from src.services.ai_core import get_ai_client, rotate_key_and_retry
+from src.services import ai_core, metrics, transcoder
+from src.services.ai_core import get_ai_client, rotate_key_and_retry, run_on_key
+from src.services.http import get_session
+from src.config import (
+    STT_LONG_SECONDS, STT_SEGMENT_SECONDS, STT_SEGMENT_OVERLAP, STT_CUT_WINDOW, STT_MAX_PARALLEL,
+    STT_INLINE_MAX_BYTES, STT_FAST_MAX_BYTES
+)
 
 
-async def transcribe_via_gemini(file_path):
-    """
-    Транскрибация аудио/видео через Gemini File API.
-    Использует ротацию ключей для стабильности.
-    """
-
-    # Внутренняя функция-воркер, которую мы будем перезапускать при смене ключа
-    async def _worker():
-        client = get_ai_client()
-        if not client: return {"error": "No Gemini Keys available"}
-
-        # 1. Загрузка файла (Upload)
-        file_ref = await client.aio.files.upload(file=file_path)
-
-        # 2. Ожидание обработки (Processing)
-        # Ждем максимум 60 сек, чтобы не зависнуть навечно
-        for _ in range(30):
-            if file_ref.state.name == "ACTIVE":
-                break
-            if file_ref.state.name == "FAILED":
-                return {"error": "Google File Processing Failed"}
-
-            await asyncio.sleep(2)
-            file_ref = await client.aio.files.get(name=file_ref.name)
-
-        if file_ref.state.name != "ACTIVE":
-            return {"error": "File processing timeout"}
+TRANSCRIBE_MODEL = "gemini-2.5-flash"
 
-        # 3. Промпт и Схема
-        prompt = """
+TRANSCRIBE_PROMPT = """
         Analyze this audio/video file. 
         Generate a detailed transcription in Russian.
         Requirements:
@@ -44,56 +27,525 @@ async def transcribe_via_gemini(file_path):
         - Provide a summary
         """
 
-        schema = {
-            "type": "OBJECT",
-            "properties": {
-                "summary": {"type": "STRING"},
-                "segments": {
-                    "type": "ARRAY",
-                    "items": {
-                        "type": "OBJECT",
-                        "properties": {
-                            "time": {"type": "STRING"},
-                            "speaker": {"type": "STRING"},
-                            "text": {"type": "STRING"},
-                            "emotion": {"type": "STRING"}
-                        }
-                    }
+TRANSCRIBE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "summary": {"type": "STRING"},
+        "segments": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "time": {"type": "STRING"},
+                    "speaker": {"type": "STRING"},
+                    "text": {"type": "STRING"},
+                    "emotion": {"type": "STRING"}
                 }
-            },
-            "required": ["summary", "segments"]
+            }
         }
+    },
+    "required": ["summary", "segments"]
+}
 
-        # 4. Генерация
-        response = await client.aio.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[
-                types.Content(
-                    parts=[
-                        types.Part.from_uri(file_uri=file_ref.uri, mime_type=file_ref.mime_type),
-                        types.Part.from_text(text=prompt)
-                    ]
-                )
-            ],
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema=schema
+# Для частей длинной записи дополнительно просим описать спикеров,
+# чтобы остальные части использовали те же метки
+SEGMENT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        **TRANSCRIBE_SCHEMA["properties"],
+        "speakers": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "label": {"type": "STRING"},
+                    "description": {"type": "STRING"}
+                }
+            }
+        }
+    },
+    "required": ["summary", "segments"]
+}
+
+
+# Версия промпта/схемы: при их изменении старые транскрипты в кэше не используются
+TRANSCRIPT_VERSION = hashlib.sha1(json.dumps(
+    [TRANSCRIBE_MODEL, TRANSCRIBE_PROMPT, TRANSCRIBE_SCHEMA, SEGMENT_SCHEMA], sort_keys=True
+).encode()).hexdigest()[:12]
+
+
+def parse_timestamp(value):
+    """'MM:SS', 'HH:MM:SS', '[01:02.5]' -> секунды (или None)."""
+    parts = re.findall(r"\d+(?:\.\d+)?", str(value or ""))
+    if not parts or len(parts) > 3:
+        return None
+    seconds = 0.0
+    for p in parts:
+        seconds = seconds * 60 + float(p)
+    return seconds
+
+
+def format_timestamp(seconds):
+    seconds = int(seconds)
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    return f"{h}:{m:02d}:{s:02d}" if h else f"{m:02d}:{s:02d}"
+
+
+def format_transcript(res):
+    """Текст для чата из результата транскрибации."""
+    out = f"📝 **Суть:** {res.get('summary', '-')}\n\n"
+
+    emojis = {"Happy": "😄", "Sad": "😔", "Angry": "😡", "Neutral": "😐", "Excited": "🤩", "Serious": "🤔"}
+    for s in res.get('segments', []):
+        emo = emojis.get(s.get('emotion'), "🗣")
+        out += f"`{s.get('time')}` {emo} **{s.get('speaker')}:** {s.get('text')}\n"
+    if res.get('failed_segments'):
+        parts = ", ".join(str(i) for i in res['failed_segments'])
+        out += f"\n⚠️ Не удалось распознать части: {parts} — транскрипт неполный"
+    return out
+
+
+def is_short_voice(message):
+    """
+    Подходит ли сообщение для быстрого пути (в память и inline, без ffmpeg):
+    только голосовые — они уже mono Opus — не длиннее STT_LONG_SECONDS и
+    не больше STT_FAST_MAX_BYTES. Аудио идет через preprocess_audio.
+    """
+    voice = message.voice if message else None
+    return bool(
+        voice and voice.file_size and voice.file_size <= STT_FAST_MAX_BYTES
+        and (voice.duration or 0) <= STT_LONG_SECONDS
+    )
+
+
+def _parse_response(response):
+    try:
+        return json.loads(response.text)
+    except:
+        return response.parsed
+
+
+async def _wait_active(client, file_ref, timeout=60):
+    """
+    Ждет обработки файла в File API. Опрос с экспоненциальной паузой
+    (0.2 с, x2, не больше 3 с), максимум timeout сек. None при ошибке/таймауте.
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.2
+    while True:
+        if file_ref.state.name == "ACTIVE":
+            return file_ref
+        if file_ref.state.name == "FAILED" or time.monotonic() >= deadline:
+            return None
+
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 3)
+        file_ref = await client.aio.files.get(name=file_ref.name)
+
+
+async def _generate_transcript(client, media_part, prompt, schema):
+    response = await client.aio.models.generate_content(
+        model=TRANSCRIBE_MODEL,
+        contents=[
+            types.Content(
+                parts=[
+                    media_part,
+                    types.Part.from_text(text=prompt)
+                ]
             )
+        ],
+        config=types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=schema
+        )
+    )
+    return _parse_response(response)
+
+
+async def _transcribe_with(client, prompt, schema, data=None, mime_type="audio/ogg", file_path=None):
+    """
+    Маленький вход (до STT_INLINE_MAX_BYTES) уходит inline-байтами прямо в запросе,
+    без File API. Остальное: upload -> ожидание ACTIVE -> generate -> delete.
+    """
+    if data is not None and len(data) <= STT_INLINE_MAX_BYTES:
+        metrics.inc("stt_inline")
+        return await _generate_transcript(
+            client, types.Part.from_bytes(data=data, mime_type=mime_type), prompt, schema
+        )
+
+    metrics.inc("stt_file_api")
+    if data is not None:
+        file_ref = await client.aio.files.upload(
+            file=io.BytesIO(data), config=types.UploadFileConfig(mime_type=mime_type)
         )
+    else:
+        file_ref = await client.aio.files.upload(file=file_path)
 
-        # 5. Удаление файла из облака (Cleanup)
-        # Делаем это в finally блоке внутри worker было бы сложно,
-        # поэтому делаем сразу после генерации
+    try:
+        active = await _wait_active(client, file_ref)
+        if not active:
+            raise Exception("Google File Processing Failed or timed out")
+        return await _generate_transcript(
+            client, types.Part.from_uri(file_uri=active.uri, mime_type=active.mime_type), prompt, schema
+        )
+    finally:
+        # Удаление файла из облака (Cleanup)
         try:
             await client.aio.files.delete(name=file_ref.name)
         except:
             pass
 
-        # 6. Парсинг ответа
+
+async def probe_media(file_path):
+    """
+    Параметры медиа через ffprobe: duration, has_video и первая аудиодорожка
+    (codec, channels, sample_rate). None, если ffprobe недоступен или файл битый.
+    """
+    try:
+        process = await asyncio.create_subprocess_exec(
+            "ffprobe", "-v", "error", "-print_format", "json",
+            "-show_entries", "format=duration:stream=codec_type,codec_name,channels,sample_rate",
+            file_path,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        out, _ = await process.communicate()
+        info = json.loads(out)
+    except Exception:
+        return None
+
+    streams = info.get("streams", [])
+    audio = next((st for st in streams if st.get("codec_type") == "audio"), None)
+    try:
+        duration = float(info.get("format", {}).get("duration"))
+    except (TypeError, ValueError):
+        duration = None
+    return {
+        "duration": duration,
+        "has_video": any(st.get("codec_type") == "video" for st in streams),
+        "has_audio": audio is not None,
+        "codec": audio.get("codec_name") if audio else None,
+        "channels": int(audio.get("channels") or 0) if audio else 0,
+        "sample_rate": int(audio.get("sample_rate") or 0) if audio else 0,
+    }
+
+
+async def probe_duration(file_path):
+    """Длительность медиа в секундах через ffprobe (None, если не удалось)."""
+    info = await probe_media(file_path)
+    return info["duration"] if info else None
+
+
+class PreparedAudio:
+    """
+    Результат предобработки перед загрузкой в Gemini.
+    data — mono 16 kHz Opus в памяти (или None: грузим оригинал);
+    stages / skipped — что сделано и что пропущено (для отчета в чат).
+    """
+
+    def __init__(self, file_path, info):
+        self.file_path = file_path
+        self.info = info
+        self.duration = info["duration"] if info else None
+        self.data = None
+        self.stages = []
+        self.skipped = []
+        self.size_in = os.path.getsize(file_path)
+
+    @property
+    def size_out(self):
+        return len(self.data) if self.data is not None else self.size_in
+
+    def summary(self):
+        def mb(n): return f"{n / 1024 / 1024:.1f} MB" if n >= 1024 * 1024 else f"{n / 1024:.0f} KB"
+
+        lines = []
+        if self.stages:
+            lines.append(f"🎛 {', '.join(self.stages)}: {mb(self.size_in)} → {mb(self.size_out)}")
+        if self.skipped:
+            lines.append(f"⏭ Пропущено: {', '.join(self.skipped)}")
+        return "\n".join(lines)
+
+
+async def preprocess_audio(file_path, priority=transcoder.PRIORITY_INTERACTIVE):
+    """
+    Оставляет только аудиодорожку, сводит в моно 16 kHz и жмет в Opus одним
+    проходом ffmpeg (файл -> stdout в память). Уже подходящий вход (моно Opus
+    без видео) не трогается. Ошибки не фатальны — тогда грузится оригинал.
+    Длинные записи (> STT_LONG_SECONDS) целиком не кодируются: transcribe_long
+    сам вырезает каждую часть сразу в mono Opus.
+    """
+    info = await probe_media(file_path)
+    prep = PreparedAudio(file_path, info)
+    if not info:
+        prep.skipped.append("предобработка (ffprobe недоступен)")
+        return prep
+    if not info["has_audio"]:
+        prep.skipped.append("предобработка (нет аудиодорожки)")
+        return prep
+    if prep.duration and prep.duration > STT_LONG_SECONDS:
+        prep.skipped.append("предобработка целиком (длинная запись — части кодируются отдельно)")
+        return prep
+
+    stages = []
+    if info["has_video"]:
+        stages.append("видео → аудио")
+    else:
+        prep.skipped.append("извлечение аудио (видео нет)")
+
+    if info["channels"] > 1:
+        stages.append(f"{info['channels']}ch → моно")
+    else:
+        prep.skipped.append("сведение в моно (уже моно)")
+
+    if info["codec"] != "opus":
+        stages.append(f"{info['codec']} → Opus 16 kHz")
+    else:
+        prep.skipped.append("перекодирование (уже Opus)")
+
+    if not stages:
+        return prep
+
+    try:
+        code, out, _ = await transcoder.run_ffmpeg(
+            ["-loglevel", "error", "-i", file_path, "-vn", "-map", "0:a:0", "-ac", "1", "-ar", "16000",
+             "-c:a", "libopus", "-b:a", "24k", "-application", "voip", "-f", "ogg", "pipe:1"],
+            priority=priority, label="stt_preprocess"
+        )
+    except OSError as e:
+        code, out = -1, None
+        print(f"FFmpeg Error: {e}")
+
+    if code == 0 and out and len(out) < prep.size_in:
+        prep.data = out
+        prep.stages = stages
+    else:
+        prep.skipped.append("предобработка (ffmpeg не справился или файл не уменьшился)")
+    return prep
+
+
+async def detect_silences(file_path, priority=transcoder.PRIORITY_INTERACTIVE):
+    """Паузы [(start, end), ...] через silencedetect (пустой список при ошибке)."""
+    try:
+        code, _, err = await transcoder.run_ffmpeg(
+            ["-i", file_path, "-vn", "-af", "silencedetect=noise=-30dB:d=0.5", "-f", "null", "-"],
+            priority=priority, label="silencedetect"
+        )
+    except OSError:
+        return []
+    if code != 0:
+        return []
+
+    starts = [float(x) for x in re.findall(rb"silence_start: (-?[\d.]+)", err)]
+    ends = [float(x) for x in re.findall(rb"silence_end: ([\d.]+)", err)]
+    return list(zip(starts, ends))
+
+
+def plan_segments(duration, silences, length=STT_SEGMENT_SECONDS, window=STT_CUT_WINDOW):
+    """
+    Точки разреза около каждых length секунд: середина ближайшей паузы
+    в пределах ±window, иначе жесткий разрез. Возвращает [(start, end), ...].
+    """
+    cuts = [0.0]
+    while duration - cuts[-1] > length + window:
+        ideal = cuts[-1] + length
+        candidates = [
+            (abs((a + b) / 2 - ideal), (a + b) / 2)
+            for a, b in silences if abs((a + b) / 2 - ideal) <= window
+        ]
+        cuts.append(min(candidates)[1] if candidates else ideal)
+    cuts.append(duration)
+    return list(zip(cuts, cuts[1:]))
+
+
+async def extract_segment(file_path, start, end, priority=transcoder.PRIORITY_INTERACTIVE):
+    """Кусок [start, end) как mono 16 kHz Opus в памяти."""
+    code, out, _ = await transcoder.run_ffmpeg(
+        ["-loglevel", "error", "-ss", f"{start:.2f}", "-t", f"{end - start:.2f}", "-i", file_path,
+         "-vn", "-ac", "1", "-ar", "16000", "-c:a", "libopus", "-b:a", "24k", "-f", "ogg", "pipe:1"],
+        priority=priority, label="stt_segment"
+    )
+    if code != 0 or not out:
+        raise Exception("FFmpeg segment extraction failed")
+    return out
+
+
+async def transcribe_segment(data, prompt, key_index=0):
+    """Одна часть длинной записи на ключе key_index (inline или через File API)."""
+
+    async def _worker(client):
+        return await _transcribe_with(client, prompt, SEGMENT_SCHEMA, data=data)
+
+    return await run_on_key(_worker, key_index)
+
+
+def _segment_prompt(index, total, roster):
+    prompt = TRANSCRIBE_PROMPT + (
+        f"        - This is part {index + 1} of {total} of a longer recording; "
+        "timestamps are relative to the start of this part\n"
+        "        - List the speakers you heard with a short voice description\n"
+    )
+    if roster:
+        known = "; ".join(f"{s.get('label')} — {s.get('description')}" for s in roster)
+        prompt += (
+            f"        - Known speakers from earlier parts: {known}. "
+            "Reuse these labels for the same voices, number new speakers after them\n"
+        )
+    return prompt
+
+
+def merge_segments(parts, plan):
+    """
+    Склеивает части: сдвигает таймкоды на начало части, оставляет только реплики
+    из ее собственного отрезка (перекрытие достается соседу) и убирает
+    повтор реплики на стыке.
+    """
+    merged = []
+    summaries = []
+    for (start, end), (offset, res) in zip(plan, parts):
+        if res.get("summary"):
+            summaries.append(res["summary"])
+        for seg in res.get("segments", []):
+            t = parse_timestamp(seg.get("time"))
+            absolute = offset + (t or 0)
+            if absolute < start - 1 or absolute >= end:
+                continue
+            if merged and merged[-1].get("text", "").strip() == seg.get("text", "").strip():
+                continue
+            merged.append({**seg, "time": format_timestamp(absolute)})
+    return {"summary": " ".join(summaries), "segments": merged}
+
+
+async def _summarize(summaries):
+    """Общая суть по сутям частей (при ошибке — просто склейка)."""
+    if len(summaries) < 2:
+        return " ".join(summaries)
+
+    async def _worker(client):
+        response = await client.aio.models.generate_content(
+            model=TRANSCRIBE_MODEL,
+            contents="Объедини краткие пересказы частей одной записи в один связный "
+                     "пересказ на русском (3-5 предложений):\n\n" + "\n".join(
+                         f"Часть {i + 1}: {s}" for i, s in enumerate(summaries))
+        )
+        return response.text.strip()
+
+    try:
+        return await run_on_key(_worker, ai_core.current_key_index)
+    except Exception as e:
+        print(f"STT Summary Error: {e}")
+        return " ".join(summaries)
+
+
+async def transcribe_long(file_path, duration, on_partial=None, priority=transcoder.PRIORITY_INTERACTIVE):
+    """
+    Длинная запись: разрез по паузам на части ~STT_SEGMENT_SECONDS с перекрытием
+    STT_SEGMENT_OVERLAP, первая часть задает список спикеров, остальные
+    распознаются параллельно по ключам (не больше STT_MAX_PARALLEL).
+    on_partial(result, done, total) вызывается, когда готов очередной
+    непрерывный префикс частей.
+    Упавшие части помечаются заглушкой в тексте и номером в failed_segments
+    (такой результат неполный и в кэш не попадает); упали все — ошибка.
+    """
+    silences = await detect_silences(file_path, priority)
+    plan = plan_segments(duration, silences)
+    total = len(plan)
+    limiter = asyncio.Semaphore(STT_MAX_PARALLEL)
+    results = [None] * total
+    roster = []
+    failed = []
+
+    async def _run(index):
+        start, end = plan[index]
+        offset = max(0.0, start - STT_SEGMENT_OVERLAP)
+        async with limiter:
+            data = await extract_segment(file_path, offset, min(duration, end + STT_SEGMENT_OVERLAP), priority)
+            try:
+                res = await transcribe_segment(
+                    data, _segment_prompt(index, total, roster), ai_core.current_key_index + index
+                )
+            except Exception as e:
+                print(f"STT Segment {index + 1}/{total} Error: {e}")
+                failed.append(index + 1)
+                # Таймкод — начало собственного отрезка части, иначе merge_segments отбросит заглушку
+                res = {"summary": "", "segments": [
+                    {"time": format_timestamp(start - offset), "speaker": "—",
+                     "text": "[не удалось распознать фрагмент]", "emotion": ""}
+                ]}
+        return index, offset, res
+
+    ready = 0
+
+    async def _publish():
+        nonlocal ready
+        advanced = False
+        while ready < total and results[ready] is not None:
+            ready += 1
+            advanced = True
+        if advanced and on_partial and ready < total:
+            try:
+                await on_partial(merge_segments(results[:ready], plan[:ready]), ready, total)
+            except Exception as e:
+                print(f"STT Partial Error: {e}")
+
+    # 1. Первая часть — отдельно, чтобы получить список спикеров
+    index, offset, res = await _run(0)
+    results[0] = (offset, res)
+    roster.extend(res.get("speakers") or [])
+    await _publish()
+
+    # 2. Остальные — параллельно
+    tasks = [asyncio.create_task(_run(i)) for i in range(1, total)]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            index, offset, res = await fut
+            results[index] = (offset, res)
+            await _publish()
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    if len(failed) == total:
+        return {"error": f"Не удалось распознать ни одной из {total} частей"}
+
+    merged = merge_segments(results, plan)
+    merged["summary"] = await _summarize([r.get("summary") for _, r in results if r.get("summary")])
+    if failed:
+        merged["failed_segments"] = sorted(failed)
+    return merged
+
+
+async def transcribe_via_gemini(file_path, on_partial=None, prepared=None, priority=transcoder.PRIORITY_INTERACTIVE):
+    """
+    Транскрибация аудио/видео через Gemini File API.
+    Использует ротацию ключей для стабильности.
+    Перед загрузкой медиа сводится в mono 16 kHz Opus (см. preprocess_audio;
+    prepared — уже готовый результат, если вызывающий показывал отчет).
+    Записи длиннее STT_LONG_SECONDS режутся на части и распознаются параллельно
+    (см. transcribe_long), промежуточный результат отдается в on_partial.
+    priority — приоритет ffmpeg-задач в общем пуле (фоновая расшифровка ниже команд).
+    """
+    if prepared is None:
+        prepared = await preprocess_audio(file_path, priority)
+
+    duration = prepared.duration
+    if duration and duration > STT_LONG_SECONDS:
         try:
-            return json.loads(response.text)
-        except:
-            return response.parsed
+            return await transcribe_long(file_path, duration, on_partial, priority)
+        except Exception as e:
+            return {"error": str(e)}
+
+    # Внутренняя функция-воркер, которую мы будем перезапускать при смене ключа
+    async def _worker():
+        client = get_ai_client()
+        if not client: return {"error": "No Gemini Keys available"}
+
+        # Сжатое аудио из памяти (inline, если маленькое) или оригинал через File API
+        if prepared.data is not None:
+            return await _transcribe_with(client, TRANSCRIBE_PROMPT, TRANSCRIBE_SCHEMA, data=prepared.data)
+        return await _transcribe_with(client, TRANSCRIBE_PROMPT, TRANSCRIBE_SCHEMA, file_path=file_path)
 
     # Запускаем через механизм ротации
     try:
@@ -102,12 +554,26 @@ async def transcribe_via_gemini(file_path):
         return {"error": str(e)}
 
 
-async def generate_freetts(text):
+async def transcribe_bytes(data, mime_type="audio/ogg"):
+    """
+    Быстрый путь для коротких голосовых: медиа уже в памяти
+    (download_media(in_memory=True)) и уходит inline, без диска и File API.
+    """
+
+    async def _worker():
+        client = get_ai_client()
+        if not client: return {"error": "No Gemini Keys available"}
+        return await _transcribe_with(client, TRANSCRIBE_PROMPT, TRANSCRIBE_SCHEMA, data=data, mime_type=mime_type)
+
+    try:
+        return await rotate_key_and_retry(_worker)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+async def generate_freetts(text, workdir=None):
     # (Этот код у тебя уже есть, оставляем без изменений, он не зависит от Gemini)
     # ... скопируй функцию generate_freetts из прошлых ответов ...
-    import aiohttp
-    import time
-
     url_synth = "https://freetts.ru/api/synthesis"
     url_history = "https://freetts.ru/api/history"
     current_uid = "710a7bacbccdad2f8207f2b3a7f921d0"
@@ -124,29 +590,30 @@ async def generate_freetts(text):
     cookies = {"uid": current_uid}
 
     try:
-        async with aiohttp.ClientSession(headers=headers, cookies=cookies) as session:
-            payload = {"text": text, "voiceid": voice_id, "ext": "mp3"}
-            async with session.post(url_synth, json=payload) as resp:
-                if resp.status != 200: return None, f"HTTP {resp.status}"
-
-            for i in range(15):
-                await asyncio.sleep(2)
-                async with session.get(url_history) as hist_resp:
-                    if hist_resp.status != 200: continue
-                    hist_data = await hist_resp.json()
-
-                    if hist_data.get("status") == "success" and isinstance(hist_data.get("data"), list):
-                        for task in hist_data["data"][:5]:
-                            if text[:10] in task.get("text", ""):
-                                if task["status"] == "done":
-                                    async with session.get(task["url"]) as audio_resp:
-                                        if audio_resp.status == 200:
-                                            content = await audio_resp.read()
-                                            filename = f"freetts_{int(time.time())}.mp3"
-                                            with open(filename, "wb") as f: f.write(content)
-                                            return filename, None
-                                elif task["status"] == "error":
-                                    return None, "Server Error"
-            return None, "Timeout"
+        # Своя сессия поверх общего пула: заголовки и uid-кука freetts
+        session = get_session("freetts", headers=headers, cookies=cookies)
+        payload = {"text": text, "voiceid": voice_id, "ext": "mp3"}
+        async with session.post(url_synth, json=payload) as resp:
+            if resp.status != 200: return None, f"HTTP {resp.status}"
+
+        for i in range(15):
+            await asyncio.sleep(2)
+            async with session.get(url_history) as hist_resp:
+                if hist_resp.status != 200: continue
+                hist_data = await hist_resp.json()
+
+                if hist_data.get("status") == "success" and isinstance(hist_data.get("data"), list):
+                    for task in hist_data["data"][:5]:
+                        if text[:10] in task.get("text", ""):
+                            if task["status"] == "done":
+                                async with session.get(task["url"]) as audio_resp:
+                                    if audio_resp.status == 200:
+                                        content = await audio_resp.read()
+                                        filename = os.path.join(workdir or "", f"freetts_{int(time.time())}.mp3")
+                                        with open(filename, "wb") as f: f.write(content)
+                                        return filename, None
+                            elif task["status"] == "error":
+                                return None, "Server Error"
+        return None, "Timeout"
     except Exception as e:
         return None, str(e)
\ No newline at end of file
@@ -0,0 +1,233 @@
+import json
+import sqlite3
+import time
+import uuid
+from src.services.local_web import DB_PATH
+
+# Незавершенные/старые задания .stat храним неделю
+JOB_MAX_AGE = 7 * 24 * 3600
+# Таблицы создаются один раз за процесс, а не на каждом обращении
+_db_ready = False
+
+
+def init_stats_db():
+    """Инициализирует таблицу чекпоинтов .stat, если она не существует (один раз за процесс)"""
+    global _db_ready
+    if _db_ready:
+        return
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        conn.execute('''CREATE TABLE IF NOT EXISTS stat_jobs
+                        (
+                            job_id TEXT,
+                            chat_id TEXT,
+                            title TEXT,
+                            periods TEXT,
+                            started_at REAL,
+                            cursor INTEGER,
+                            ring_idx INTEGER,
+                            processed INTEGER,
+                            state TEXT,
+                            done INTEGER,
+                            updated REAL,
+                            position INTEGER,
+                            PRIMARY KEY (job_id, chat_id)
+                        )''')
+        # Порядок чатов в задании: INSERT OR REPLACE меняет rowid на каждом чекпоинте
+        columns = [r[1] for r in conn.execute("PRAGMA table_info(stat_jobs)")]
+        if "position" not in columns:
+            conn.execute("ALTER TABLE stat_jobs ADD COLUMN position INTEGER")
+        # Роллапы активности (тепловая карта, дневные ряды) — копятся между сканами
+        conn.execute('''CREATE TABLE IF NOT EXISTS chat_series
+                        (
+                            chat_id INTEGER PRIMARY KEY,
+                            title TEXT,
+                            min_id INTEGER,
+                            max_id INTEGER,
+                            day0 INTEGER,
+                            hour_week BLOB,
+                            daily BLOB,
+                            updated REAL,
+                            token TEXT,
+                            ranges TEXT
+                        )''')
+        # Страницы графиков открываются по случайному токену, а не по перебираемому chat_id
+        columns = [r[1] for r in conn.execute("PRAGMA table_info(chat_series)")]
+        if "token" not in columns:
+            conn.execute("ALTER TABLE chat_series ADD COLUMN token TEXT")
+        # Покрытие отрезками id (JSON [[lo, hi], ...]); min_id/max_id — общие границы
+        if "ranges" not in columns:
+            conn.execute("ALTER TABLE chat_series ADD COLUMN ranges TEXT")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS chat_series_token ON chat_series (token)")
+        conn.execute('''CREATE TABLE IF NOT EXISTS chat_user_series
+                        (
+                            chat_id INTEGER,
+                            user_id INTEGER,
+                            name TEXT,
+                            daily BLOB,
+                            PRIMARY KEY (chat_id, user_id)
+                        )''')
+        conn.commit()
+    finally:
+        conn.close()
+    _db_ready = True
+
+
+def new_job_id():
+    return uuid.uuid4().hex[:8]
+
+
+def save_checkpoint(row: dict):
+    """
+    Сохраняет (перезаписывает) чекпоинт скана одного чата.
+    row["state"] — dict агрегатов, сериализуется здесь (вызывать в потоке).
+    """
+    init_stats_db()
+    state = json.dumps(row["state"], ensure_ascii=False)
+    conn = sqlite3.connect(DB_PATH, timeout=10)
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO stat_jobs "
+            "(job_id, chat_id, title, periods, started_at, cursor, ring_idx, processed, state, done, updated, "
+            "position) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (row["job_id"], json.dumps(row["chat_id"]), row["title"], json.dumps(row["periods"]),
+             row["started_at"], row["cursor"], row["ring_idx"], row["processed"],
+             state, int(row["done"]), time.time(), row["position"])
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def load_job(job_id):
+    """Все чекпоинты задания (по одному на чат), в порядке чатов из команды."""
+    init_stats_db()
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute(
+            "SELECT * FROM stat_jobs WHERE job_id = ? ORDER BY position, rowid", (job_id,)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    result = []
+    for r in rows:
+        row = dict(r)
+        row["chat_id"] = json.loads(row["chat_id"])
+        row["periods"] = json.loads(row["periods"])
+        result.append(row)
+    return result
+
+
+def latest_unfinished_job():
+    """ID последнего задания, у которого остались недосканированные чаты."""
+    init_stats_db()
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        row = conn.execute(
+            "SELECT job_id FROM stat_jobs WHERE done = 0 ORDER BY updated DESC LIMIT 1"
+        ).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+def prune_jobs():
+    """Удаляет задания старше JOB_MAX_AGE."""
+    init_stats_db()
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        conn.execute("DELETE FROM stat_jobs WHERE updated < ?", (time.time() - JOB_MAX_AGE,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def load_series(chat_id):
+    """
+    Сохраненные ряды активности чата или None.
+    Массивы возвращаются как сырые bytes (array('I').tobytes()).
+    """
+    init_stats_db()
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    try:
+        row = conn.execute("SELECT * FROM chat_series WHERE chat_id = ?", (chat_id,)).fetchone()
+        if not row:
+            return None
+        users = conn.execute(
+            "SELECT user_id, name, daily FROM chat_user_series WHERE chat_id = ?", (chat_id,)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    data = dict(row)
+    data["users"] = [(u["user_id"], u["name"], u["daily"]) for u in users]
+    return data
+
+
+def load_series_meta(chat_id):
+    """Только заголовок и покрытие рядов чата (title, min_id, max_id, ranges, day0) — без массивов, или None."""
+    init_stats_db()
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    try:
+        row = conn.execute(
+            "SELECT title, min_id, max_id, ranges, day0 FROM chat_series WHERE chat_id = ?", (chat_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+    return dict(row) if row else None
+
+
+def save_series(data: dict):
+    """Перезаписывает ряды активности чата (формат как у load_series); токен страницы сохраняется."""
+    init_stats_db()
+    conn = sqlite3.connect(DB_PATH, timeout=10)
+    try:
+        conn.execute(
+            "INSERT INTO chat_series "
+            "(chat_id, title, min_id, max_id, ranges, day0, hour_week, daily, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (chat_id) DO UPDATE SET title = excluded.title, min_id = excluded.min_id, "
+            "max_id = excluded.max_id, ranges = excluded.ranges, day0 = excluded.day0, "
+            "hour_week = excluded.hour_week, daily = excluded.daily, updated = excluded.updated",
+            (data["chat_id"], data["title"], data["min_id"], data["max_id"], data["ranges"], data["day0"],
+             data["hour_week"], data["daily"], time.time())
+        )
+        conn.execute("DELETE FROM chat_user_series WHERE chat_id = ?", (data["chat_id"],))
+        conn.executemany(
+            "INSERT INTO chat_user_series (chat_id, user_id, name, daily) VALUES (?, ?, ?, ?)",
+            [(data["chat_id"], uid, name, daily) for uid, name, daily in data["users"]]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def series_token(chat_id):
+    """Токен страницы графиков чата (создается при первом обращении) или None, если рядов нет."""
+    init_stats_db()
+    conn = sqlite3.connect(DB_PATH, timeout=10)
+    try:
+        conn.execute(
+            "UPDATE chat_series SET token = ? WHERE chat_id = ? AND token IS NULL",
+            (uuid.uuid4().hex, chat_id)
+        )
+        conn.commit()
+        row = conn.execute("SELECT token FROM chat_series WHERE chat_id = ?", (chat_id,)).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+def series_chat_id(token):
+    """chat_id по токену страницы графиков или None."""
+    init_stats_db()
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        row = conn.execute("SELECT chat_id FROM chat_series WHERE token = ?", (token,)).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
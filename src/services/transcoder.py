@@ -0,0 +1,224 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from src.config import TRANSCODE_MAX_JOBS, TRANSCODE_STREAM_JOBS
+from src.services import metrics
+
+# Меньше — раньше. Интерактивные команды (.say, .dialog) обгоняют фоновые задачи
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+
+def cpu_quota():
+    """
+    Доступные CPU с учетом квоты контейнера (cgroup v2 cpu.max / v1 cfs_quota),
+    иначе os.cpu_count().
+    """
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return os.cpu_count() or 1
+
+
+def default_max_jobs():
+    # Округляем вниз: при квоте 1.5 CPU параллельно кодирует один ffmpeg
+    return TRANSCODE_MAX_JOBS or max(1, math.floor(cpu_quota()))
+
+
+class PrioritySemaphore:
+    """Семафор, который отдает освободившийся слот ожидающему с наименьшим priority (FIFO внутри)."""
+
+    def __init__(self, value):
+        self.value = value
+        self._waiters = []
+        self._seq = itertools.count()
+
+    def locked(self):
+        return self.value <= 0 or bool(self._waiters)
+
+    def try_acquire(self):
+        if self.locked():
+            return False
+        self.value -= 1
+        return True
+
+    async def acquire(self, priority=PRIORITY_INTERACTIVE):
+        if self.try_acquire():
+            return
+        fut = asyncio.get_running_loop().create_future()
+        entry = [priority, next(self._seq), fut]
+        heapq.heappush(self._waiters, entry)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Слот уже передан нам — отдаем дальше
+                self.release()
+            elif entry in self._waiters:
+                # release() мог уже снять отмененную запись с кучи (и отдать слот следующему)
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.value += 1
+
+
+_semaphore = None
+_stream_semaphore = None
+
+
+def get_semaphore(stream=False):
+    """
+    Пул CPU-слотов (по квоте контейнера) или, при stream=True, отдельный лимит
+    потоковых ffmpeg: они почти все время ждут вход из сети и CPU-слоты не занимают.
+    """
+    global _semaphore, _stream_semaphore
+    if stream:
+        if _stream_semaphore is None:
+            _stream_semaphore = PrioritySemaphore(max(1, TRANSCODE_STREAM_JOBS))
+        return _stream_semaphore
+    if _semaphore is None:
+        _semaphore = PrioritySemaphore(default_max_jobs())
+    return _semaphore
+
+
+class TranscodeJob:
+    """Занятый слот кодирования: считает время ожидания и работы."""
+
+    def __init__(self, label, queued_at, stream=False):
+        self.label = label
+        self.semaphore = get_semaphore(stream)
+        self.queued_at = queued_at
+        self.started_at = time.monotonic()
+        self.released = False
+        metrics.inc("transcode_jobs")
+        metrics.observe("transcode_wait", self.started_at - queued_at)
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        self.semaphore.release()
+        run = time.monotonic() - self.started_at
+        metrics.observe("transcode_run", run)
+        metrics.observe(f"transcode_run_{self.label}", run)
+
+
+def try_acquire(label="job", stream=False):
+    """Слот без ожидания (или None, если все заняты / есть очередь)."""
+    if get_semaphore(stream).try_acquire():
+        return TranscodeJob(label, time.monotonic(), stream)
+    return None
+
+
+async def acquire(priority=PRIORITY_INTERACTIVE, label="job", stream=False):
+    queued_at = time.monotonic()
+    await get_semaphore(stream).acquire(priority)
+    return TranscodeJob(label, queued_at, stream)
+
+
+@asynccontextmanager
+async def slot(priority=PRIORITY_INTERACTIVE, label="job", stream=False):
+    job = await acquire(priority, label, stream)
+    try:
+        yield job
+    finally:
+        job.release()
+
+
+async def run_ffmpeg(args, data=None, priority=PRIORITY_INTERACTIVE, label="job"):
+    """
+    ffmpeg со своими аргументами под слотом пула.
+    data (если есть) идет в stdin. Возвращает (returncode, stdout, stderr).
+    """
+    cmd = ["ffmpeg", "-hide_banner", *args]
+    if data is None:
+        cmd.insert(1, "-nostdin")
+    async with slot(priority, label):
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.PIPE if data is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            out, err = await process.communicate(data)
+        except BaseException:
+            if process.returncode is None:
+                process.kill()
+            raise
+        return process.returncode, out, err
+
+
+async def stream_ffmpeg(args, output, priority=PRIORITY_INTERACTIVE, label="job", on_chunk=None, stream=False):
+    """
+    ffmpeg без stdin (вход — URL/файл в args), stdout кусками пишется в output.write —
+    результат не копится в памяти целиком. on_chunk(всего_байт) — для прогресса.
+    stream=True — вход по сети: слот из потокового лимита, а не из CPU-пула.
+    Возвращает (returncode, stderr).
+    """
+    async with slot(priority, label, stream):
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-nostdin", "-hide_banner", *args,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        # stderr читаем параллельно, иначе заполненный пайп остановит ffmpeg
+        err_task = asyncio.create_task(process.stderr.read())
+        written = 0
+        try:
+            while True:
+                chunk = await process.stdout.read(256 * 1024)
+                if not chunk:
+                    break
+                output.write(chunk)
+                written += len(chunk)
+                if on_chunk:
+                    on_chunk(written)
+            await process.wait()
+        except BaseException:
+            if process.returncode is None:
+                process.kill()
+            err_task.cancel()
+            raise
+        return process.returncode, await err_task
+
+
+async def transcode(data, input_args, output_args, priority=PRIORITY_INTERACTIVE, label="job"):
+    """
+    ffmpeg в памяти: data -> stdin, результат из stdout (bytes или None при ошибке).
+    input_args/output_args — аргументы до и после "-i pipe:0".
+    """
+    try:
+        code, out, _ = await run_ffmpeg(
+            ["-loglevel", "error", *input_args, "-i", "pipe:0", *output_args, "pipe:1"],
+            data, priority, label
+        )
+    except OSError as e:
+        print(f"FFmpeg Error: {e}")
+        return None
+    return out if code == 0 and out else None
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import sqlite3
+import time
+from src.services import metrics
+from src.services.local_web import DB_PATH
+from src.services.speech import TRANSCRIPT_VERSION
+
+# Таблица создается один раз за процесс, а не на каждом обращении
+_db_ready = False
+
+
+def init_transcript_db():
+    """Инициализирует кэш транскриптов, если он не существует (один раз за процесс)"""
+    global _db_ready
+    if _db_ready:
+        return
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        conn.execute('''CREATE TABLE IF NOT EXISTS transcripts
+                        (
+                            file_unique_id TEXT,
+                            version TEXT,
+                            result TEXT,
+                            created REAL,
+                            PRIMARY KEY (file_unique_id, version)
+                        )''')
+        conn.commit()
+    finally:
+        conn.close()
+    _db_ready = True
+
+
+def media_of(message):
+    """Голосовое/аудио/видео/кружок сообщения (или None)."""
+    if not message:
+        return None
+    return message.voice or message.audio or message.video or message.video_note
+
+
+def _get(file_unique_id):
+    init_transcript_db()
+    conn = sqlite3.connect(DB_PATH, timeout=10)
+    try:
+        row = conn.execute(
+            "SELECT result FROM transcripts WHERE file_unique_id = ? AND version = ?",
+            (file_unique_id, TRANSCRIPT_VERSION)
+        ).fetchone()
+    finally:
+        conn.close()
+    return json.loads(row[0]) if row else None
+
+
+def _put(file_unique_id, result):
+    init_transcript_db()
+    conn = sqlite3.connect(DB_PATH, timeout=10)
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO transcripts (file_unique_id, version, result, created) VALUES (?, ?, ?, ?)",
+            (file_unique_id, TRANSCRIPT_VERSION, json.dumps(result, ensure_ascii=False), time.time())
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+async def get_transcript(file_unique_id):
+    """Готовый транскрипт (dict) для file_unique_id текущей версии промпта или None."""
+    result = await asyncio.to_thread(_get, file_unique_id)
+    metrics.inc("stt_cache_hits" if result else "stt_cache_misses")
+    return result
+
+
+async def save_transcript(file_unique_id, result):
+    """
+    Сохраняет успешный транскрипт. Ошибки и неполные результаты (части длинной
+    записи не распознались — failed_segments) не кэшируются: следующий .stt
+    распознает файл заново.
+    """
+    if not result or "error" in result or result.get("failed_segments"):
+        return
+    try:
+        await asyncio.to_thread(_put, file_unique_id, result)
+    except Exception as e:
+        print(f"Transcript Cache Error: {e}")
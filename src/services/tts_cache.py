@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import io
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from pyrogram.errors import RPCError
+from src.config import TTS_CACHE_DIR, TTS_CACHE_MAX_MB
+from src.services import file_ids, metrics
+from src.services.local_web import DB_PATH
+
+# Таблицы создаются один раз за процесс, а не на каждом обращении
+_db_ready = False
+
+
+def init_tts_cache_db():
+    """Инициализирует индекс TTS-кэша, если он не существует (один раз за процесс)"""
+    global _db_ready
+    if _db_ready:
+        return
+    os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+    # file_id отправленных файлов — в общем кэше (вытесняются вместе с записью)
+    file_ids.init_file_ids_db()
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        conn.execute('''CREATE TABLE IF NOT EXISTS tts_cache
+                        (
+                            key TEXT PRIMARY KEY,
+                            path TEXT,
+                            size INTEGER,
+                            duration INTEGER,
+                            created REAL,
+                            last_used REAL
+                        )''')
+        conn.commit()
+    finally:
+        conn.close()
+    _db_ready = True
+
+
+def cache_key(text, voice, model_id, output):
+    """sha256 от нормализованного текста + голос + модель + формат."""
+    norm = re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+    raw = "\x00".join([norm, voice, model_id, output])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _load(key):
+    init_tts_cache_db()
+    conn = sqlite3.connect(DB_PATH, timeout=10)
+    try:
+        row = conn.execute("SELECT path, size, duration FROM tts_cache WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        path, size, duration = row
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            conn.execute("DELETE FROM tts_cache WHERE key = ?", (key,))
+            conn.commit()
+            return None
+        conn.execute("UPDATE tts_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+        conn.commit()
+    finally:
+        conn.close()
+
+    buf = io.BytesIO(data)
+    buf.name = os.path.basename(path)
+    buf.duration = duration
+    buf.cache_key = key
+    return buf
+
+
+def _store(key, data, name, duration):
+    init_tts_cache_db()
+    ext = os.path.splitext(name)[1] or ".ogg"
+    path = os.path.join(TTS_CACHE_DIR, f"{key}{ext}")
+    with open(path, "wb") as f:
+        f.write(data)
+
+    conn = sqlite3.connect(DB_PATH, timeout=10)
+    try:
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO tts_cache (key, path, size, duration, created, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, path, len(data), duration, now, now)
+        )
+        conn.commit()
+        _evict(conn)
+    finally:
+        conn.close()
+
+
+def _evict(conn):
+    """LRU: удаляет давно не использованные записи, пока кэш больше TTS_CACHE_MAX_MB."""
+    limit = TTS_CACHE_MAX_MB * 1024 * 1024
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM tts_cache").fetchone()[0]
+    if total <= limit:
+        return
+
+    for key, path, size in conn.execute(
+            "SELECT key, path, size FROM tts_cache ORDER BY last_used").fetchall():
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        conn.execute("DELETE FROM tts_cache WHERE key = ?", (key,))
+        file_ids.delete_key(conn, "tts", key)
+        total -= size
+    conn.commit()
+
+
+async def load_audio(key):
+    """BytesIO из кэша (с .name, .duration, .cache_key) или None."""
+    buf = await asyncio.to_thread(_load, key)
+    if buf:
+        metrics.inc("tts_cache_hits")
+        metrics.inc("tts_cache_bytes_saved", buf.getbuffer().nbytes)
+    else:
+        metrics.inc("tts_cache_misses")
+    return buf
+
+
+async def store_audio(key, audio):
+    """Кладет готовое аудио в кэш и помечает буфер ключом."""
+    try:
+        await asyncio.to_thread(_store, key, audio.getvalue(), audio.name, getattr(audio, "duration", 0))
+        audio.cache_key = key
+    except Exception as e:
+        print(f"TTS Cache Error: {e}")
+
+
+async def send_cached_audio(client, kind, chat_id, audio, **kwargs):
+    """
+    Отправляет аудио (kind: "voice" / "audio").
+    Если этот аккаунт уже загружал такой же файл — шлет по file_id без загрузки;
+    после первой загрузки запоминает file_id.
+    """
+    send = getattr(client, f"send_{kind}")
+    key = getattr(audio, "cache_key", None)
+
+    if key:
+        row = await file_ids.get_file_id(client, "tts", key)
+        if row:
+            try:
+                sent = await send(chat_id, row[0], **kwargs)
+                metrics.inc("tts_upload_skipped")
+                metrics.inc("tts_upload_bytes_saved", audio.getbuffer().nbytes)
+                return sent
+            except RPCError as e:
+                # file_id протух (file reference и т.п.) — забываем и грузим заново
+                print(f"TTS Cache file_id Error: {e}")
+                await file_ids.forget(client, "tts", key)
+
+    sent = await send(chat_id, audio, **kwargs)
+    if key:
+        await file_ids.remember(client, "tts", key, getattr(sent, kind, None) or sent.document)
+    return sent
@@ -0,0 +1,202 @@
+import asyncio
+import io
+import itertools
+import math
+import os
+import time
+from pyrogram import raw, types, utils
+from pyrogram.errors import FloodWait, FilePartMissing
+from pyrogram.session import Session
+from src.config import UPLOAD_SESSIONS, UPLOAD_WORKERS, UPLOAD_PART_RETRIES
+from src.services import metrics
+
+# Больше — только SaveBigFilePart (требование Telegram), меньше — обычный send_document
+BIG_FILE_SIZE = 10 * 1024 * 1024
+# Часть должна делить 512 KB нацело; 512 KB — максимум
+MAX_PART_SIZE = 512 * 1024
+MIN_PART_SIZE = 64 * 1024
+
+
+def source_size(source):
+    """Размер файла: путь или файловый объект (SpooledTemporaryFile и т.п.)."""
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    return source.seek(0, os.SEEK_END)
+
+
+def read_at(source, fd, offset, size):
+    """
+    Кусок по смещению. Для пути — os.pread (позиция не нужна), для объекта —
+    seek+read без await между ними, поэтому параллельные воркеры друг другу не мешают.
+    """
+    if fd is not None:
+        return os.pread(fd, size, offset)
+    source.seek(offset)
+    return source.read(size)
+
+
+def choose_part_size(size):
+    """
+    Размер части под файл: 512 KB (меньше запросов), но мельче, если частей
+    получается меньше, чем нужно, чтобы занять все воркеры (по 4 на каждый).
+    """
+    part = MAX_PART_SIZE
+    while part > MIN_PART_SIZE and math.ceil(size / part) < UPLOAD_WORKERS * 4:
+        part //= 2
+    return part
+
+
+async def _save_part(invoke, read, file_id, part, part_size, total_parts):
+    """Одна часть с повторами: сеть/сессия — до UPLOAD_PART_RETRIES раз, FloodWait — ждем и не считаем."""
+    chunk = read(part * part_size, part_size)
+    rpc = raw.functions.upload.SaveBigFilePart(
+        file_id=file_id, file_part=part, file_total_parts=total_parts, bytes=chunk
+    )
+    attempt = 0
+    while True:
+        try:
+            if await invoke(rpc):
+                return len(chunk)
+            raise Exception(f"SaveBigFilePart {part} returned False")
+        except FloodWait as e:
+            await asyncio.sleep(e.value)
+        except Exception as e:
+            attempt += 1
+            if attempt > UPLOAD_PART_RETRIES:
+                raise
+            metrics.inc("upload_part_retries")
+            print(f"Upload Part Retry ({attempt}/{UPLOAD_PART_RETRIES}) #{part}: {e}")
+            await asyncio.sleep(min(2 ** attempt, 8))
+
+
+async def upload_file(client, source, file_name, progress=None):
+    """
+    Большой файл (> 10 MB) в Telegram: части параллельно UPLOAD_WORKERS воркерами
+    через UPLOAD_SESSIONS медиа-сессий, упавшая часть повторяется отдельно.
+    source — путь или файловый объект. progress — async progress(current, total).
+    Возвращает InputFileBig.
+    """
+    size = source_size(source)
+    limit_mib = 4000 if client.me and client.me.is_premium else 2000
+    if size > limit_mib * 1024 * 1024:
+        raise ValueError(f"Can't upload files bigger than {limit_mib} MiB")
+
+    part_size = choose_part_size(size)
+    total_parts = math.ceil(size / part_size)
+    file_id = client.rnd_id()
+    parts = iter(range(total_parts))
+    done = 0
+    started = time.monotonic()
+
+    dc_id, auth_key, test_mode = (
+        await client.storage.dc_id(), await client.storage.auth_key(), await client.storage.test_mode()
+    )
+    sessions = [
+        Session(client, dc_id, auth_key, test_mode, is_media=True)
+        for _ in range(max(1, UPLOAD_SESSIONS))
+    ]
+
+    async def worker(session):
+        nonlocal done
+        # Общий итератор: освободившийся воркер берет следующую часть
+        for part in parts:
+            sent = await _save_part(session.invoke, read, file_id, part, part_size, total_parts)
+            done += sent
+            if progress:
+                await progress(done, size)
+
+    fd = os.open(source, os.O_RDONLY) if isinstance(source, str) else None
+
+    def read(offset, length):
+        return read_at(source, fd, offset, length)
+
+    tasks = []
+    try:
+        await asyncio.gather(*(session.start() for session in sessions))
+        tasks = [
+            asyncio.create_task(worker(session))
+            for session in itertools.islice(itertools.cycle(sessions), max(1, UPLOAD_WORKERS))
+        ]
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if fd is not None:
+            os.close(fd)
+        for session in sessions:
+            try:
+                await session.stop()
+            except Exception:
+                pass
+
+    metrics.inc("upload_big_files")
+    metrics.inc("upload_bytes", size)
+    metrics.observe("upload_big", time.monotonic() - started)
+    return raw.types.InputFileBig(id=file_id, parts=total_parts, name=file_name)
+
+
+async def send_document(client, chat_id, source, caption="", progress=None):
+    """
+    Отправляет файл документом. source — путь или файловый объект
+    (имя берется из .file_name, как у NamedSpool). Мелкие — обычным send_document,
+    большие — через upload_file и raw SendMedia; возвращает разобранный Message (с file_id для кэша).
+    """
+    is_path = isinstance(source, str)
+    file_name = os.path.basename(source) if is_path else getattr(source, "file_name", None) or "file"
+    size = source_size(source)
+
+    if size <= BIG_FILE_SIZE:
+        if not is_path:
+            # Своя копия: pyrogram читает последовательно и сдвигает позицию общего объекта
+            source = io.BytesIO(read_at(source, None, 0, size))
+        # force_document: иначе Telegram по типу содержимого может прислать audio/video,
+        # и file_id из кэша потом не примет send_document
+        return await client.send_document(
+            chat_id, source, file_name=file_name, caption=caption, progress=progress, force_document=True
+        )
+
+    file = await upload_file(client, source, file_name, progress)
+    media = raw.types.InputMediaUploadedDocument(
+        mime_type=client.guess_mime_type(file_name) or "application/zip",
+        file=file,
+        attributes=[raw.types.DocumentAttributeFilename(file_name=file_name)],
+        force_file=True
+    )
+
+    reuploads = 0
+    while True:
+        try:
+            r = await client.invoke(
+                raw.functions.messages.SendMedia(
+                    peer=await client.resolve_peer(chat_id),
+                    media=media,
+                    random_id=client.rnd_id(),
+                    **await utils.parse_text_entities(client, caption, None, None)
+                )
+            )
+        except FilePartMissing as e:
+            # Telegram не досчитался части — догружаем только ее (не бесконечно)
+            reuploads += 1
+            if reuploads > UPLOAD_PART_RETRIES:
+                raise
+            metrics.inc("upload_part_missing")
+            print(f"Upload Part Missing ({reuploads}/{UPLOAD_PART_RETRIES}) #{e.value}")
+            fd = os.open(source, os.O_RDONLY) if is_path else None
+            try:
+                await _save_part(
+                    client.invoke, lambda offset, length: read_at(source, fd, offset, length),
+                    file.id, e.value, choose_part_size(size), file.parts
+                )
+            finally:
+                if fd is not None:
+                    os.close(fd)
+        else:
+            for i in r.updates:
+                if isinstance(i, (raw.types.UpdateNewMessage, raw.types.UpdateNewChannelMessage)):
+                    return await types.Message._parse(
+                        client, i.message,
+                        {u.id: u for u in r.users},
+                        {c.id: c for c in r.chats}
+                    )
+            return None
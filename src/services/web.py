@@ -4,7 +4,6 @@ import os
 import re
 import platform # Для определения ОС
 import psutil   # Для системной инфо
-import aiohttp
 import markdown
 import requests
 from io import BytesIO
@@ -19,6 +18,8 @@ from selenium.webdriver.firefox.service import Service as FirefoxService
 from telegraph import Telegraph
 
 from src.config import EXCHANGE_KEY
+from src.services.http import get_session
+from src.services.metrics import format_metrics
 from src.state import SETTINGS, save_settings
 
 # Инициализация Telegraph
@@ -173,9 +174,10 @@ async def create_telegraph_page(title, markdown_text):
     return await asyncio.to_thread(_sync_upload)
 
 
-async def olx_parser(query: str, max_pages: int = 1, with_images: bool = True):
+async def olx_parser(query: str, max_pages: int = 1, with_images: bool = True, workdir=None):
     """
     Парсит OLX.uz (Явное указание путей для RPi).
+    workdir — папка задания (workspace): туда пишутся превью и xlsx.
     """
 
     def _scrape():
@@ -263,7 +265,7 @@ async def olx_parser(query: str, max_pages: int = 1, with_images: bool = True):
                                             img = Image.open(BytesIO(resp.content))
                                             img.thumbnail((150, 150))
 
-                                            path = f"temp_img_{row}.png"
+                                            path = os.path.join(workdir or "", f"temp_img_{row}.png")
                                             img.save(path)
 
                                             excel_img = ExcelImage(path)
@@ -291,7 +293,7 @@ async def olx_parser(query: str, max_pages: int = 1, with_images: bool = True):
 
                 if len(cards) < 5: break
 
-            fname = f"olx_{query}_{int(time.time())}.xlsx"
+            fname = os.path.join(workdir or "", f"olx_{query}_{int(time.time())}.xlsx")
             wb.save(fname)
             return fname
         finally:
@@ -310,9 +312,8 @@ async def get_currency(amount, raw_from, raw_to=None):
     url = f"https://v6.exchangerate-api.com/v6/{EXCHANGE_KEY}/latest/{from_cur}"
 
     try:
-        async with aiohttp.ClientSession() as s:
-            async with s.get(url) as r:
-                data = await r.json()
+        async with get_session().get(url) as r:
+            data = await r.json()
     except Exception as e:
         return f"❌ Network Error: {e}"
 
@@ -402,7 +403,8 @@ async def get_sys_info():
             f"🧠 CPU: `{cpu_usage}%`\n"
             f"💾 RAM: `{ram.percent}%`\n"
             f"⏱ Uptime: `{uptime_str}`\n"
-            f"🤖 AI Model: `{model}`"
+            f"🤖 AI Model: `{model}`\n"
+            f"{format_metrics()}"
         )
     except Exception as e:
         return f"Sys info error: {e}"
\ No newline at end of file
@@ -0,0 +1,164 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from src.config import (
+    WORKSPACE_ROOT, WORKSPACE_QUOTA_MB, WORKSPACE_RESERVE_MB, WORKSPACE_STALE_HOURS, WORKSPACE_SWEEP_INTERVAL
+)
+from src.services import metrics
+
+# Префикс папок сервиса: sweep удаляет только их, а не все подряд в WORKSPACE_ROOT
+DIR_PREFIX = "ws_"
+
+# path -> Workspace, пока задание с ним работает
+_active = {}
+_released = None
+
+
+def _get_released():
+    global _released
+    if _released is None:
+        _released = asyncio.Condition()
+    return _released
+
+
+def dir_size(path):
+    total = 0
+    for base, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(base, name))
+            except OSError:
+                pass
+    return total
+
+
+def _usage():
+    return sum(max(dir_size(path), ws.reserve) for path, ws in list(_active.items()))
+
+
+async def usage():
+    """
+    Сколько квоты заняли живые рабочие папки: у каждой — ее размер на диске,
+    но не меньше резерва (свежая папка пуста, а файлы задания еще впереди).
+    Обход папок — в потоке, не на event loop.
+    """
+    return await asyncio.to_thread(_usage)
+
+
+class Workspace:
+    """
+    Отдельная папка под одно задание (загрузка, картинка, OLX...).
+    Все файлы задания пишутся сюда; close() удаляет папку целиком.
+    """
+
+    def __init__(self, label, reserve=0):
+        os.makedirs(WORKSPACE_ROOT, exist_ok=True)
+        self.label = label
+        self.reserve = reserve
+        self.dir = tempfile.mkdtemp(prefix=f"{DIR_PREFIX}{label}_", dir=WORKSPACE_ROOT)
+        self.created = time.time()
+        _active[self.dir] = self
+
+    def path(self, name):
+        return os.path.join(self.dir, os.path.basename(name))
+
+    def close(self):
+        if _active.pop(self.dir, None) is None:
+            return
+        shutil.rmtree(self.dir, ignore_errors=True)
+        try:
+            asyncio.get_running_loop().create_task(_notify_released())
+        except RuntimeError:
+            # Закрыли из потока (sweep) — ожидающих будит sweeper
+            pass
+
+
+async def _notify_released():
+    released = _get_released()
+    async with released:
+        released.notify_all()
+
+
+async def open_workspace(label="job", reserve_mb=None):
+    """
+    Новая рабочая папка. Задание сразу занимает в квоте резерв reserve_mb
+    (по умолчанию WORKSPACE_RESERVE_MB), поэтому пачка новых заданий не проскочит
+    квоту, пока их папки еще пусты. Если резерв не влезает в WORKSPACE_QUOTA_MB —
+    ждем, пока другие задания освободят место (одно задание пропускаем всегда,
+    иначе слишком большой файл заблокировал бы очередь навсегда).
+    Проверка и создание идут под общим замком — параллельные open не обгоняют друг друга.
+    """
+    quota = WORKSPACE_QUOTA_MB * 1024 * 1024
+    reserve = (WORKSPACE_RESERVE_MB if reserve_mb is None else reserve_mb) * 1024 * 1024
+    released = _get_released()
+    async with released:
+        if quota and _active and await usage() + reserve > quota:
+            metrics.inc("workspace_waits")
+            started = time.monotonic()
+            while _active and await usage() + reserve > quota:
+                try:
+                    # Файлы могут и усыхать (удалили промежуточные) — перепроверяем и по таймеру
+                    await asyncio.wait_for(released.wait(), 5)
+                except asyncio.TimeoutError:
+                    pass
+            metrics.observe("workspace_wait", time.monotonic() - started)
+        return Workspace(label, reserve)
+
+
+@asynccontextmanager
+async def workspace(label="job", reserve_mb=None):
+    ws = await open_workspace(label, reserve_mb)
+    try:
+        yield ws
+    finally:
+        ws.close()
+
+
+def sweep(max_age=None):
+    """
+    Удаляет брошенные папки сервиса в WORKSPACE_ROOT (остались после падения)
+    и живые старше max_age сек (задание зависло или забыло close()).
+    Чужие файлы и папки (без DIR_PREFIX) не трогает. Блокирующая — вызывать в потоке.
+    """
+    max_age = WORKSPACE_STALE_HOURS * 3600 if max_age is None else max_age
+    if not os.path.isdir(WORKSPACE_ROOT):
+        return 0
+    now = time.time()
+    removed = 0
+    for entry in os.scandir(WORKSPACE_ROOT):
+        if not entry.name.startswith(DIR_PREFIX) or not entry.is_dir(follow_symlinks=False):
+            continue
+        ws = _active.get(entry.path)
+        try:
+            age = now - (ws.created if ws else entry.stat().st_mtime)
+        except OSError:
+            continue
+        if ws is None or age > max_age:
+            if ws:
+                print(f"Workspace Sweep: {ws.label} висит {age / 3600:.1f} ч, удаляю")
+                ws.close()
+            else:
+                shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    metrics.inc("workspace_swept", removed)
+    return removed
+
+
+async def sweeper():
+    """
+    Фоновая уборка: при старте все, что осталось от прошлого запуска, дальше — по таймеру.
+    Обход и rmtree — в потоке, не на event loop.
+    """
+    removed = await asyncio.to_thread(sweep)
+    if removed:
+        print(f"🧹 Workspace: удалено брошенных папок: {removed}")
+    while True:
+        await asyncio.sleep(WORKSPACE_SWEEP_INTERVAL)
+        try:
+            if await asyncio.to_thread(sweep):
+                await _notify_released()
+        except Exception as e:
+            print(f"Workspace Sweep Error: {e}")
@@ -9,9 +9,11 @@ SETTINGS = {
     "model_key": "1",
     "voice_key": "1",
     "tts_model_key": "1",
+    "dialog_engine": "auto",  # auto / multi / lines — движок озвучки диалогов
     "sys_global": "",
     "sys_chats": {},
     "blacklist": [],
+    "autostt_chats": {},  # {chat_id: {"reply": bool}} — авторасшифровка ГС
     # --- НОВЫЕ ПОЛЯ ДЛЯ TELEGRAPH ---
     "telegraph_token": None,  # Токен авторизации (чтобы редактировать свои посты)
     "help_page_path": None,  # Адрес страницы (например, 'Gemini-Bot-Commands-12-08')
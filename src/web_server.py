@@ -3,11 +3,14 @@ import sqlite3
 import markdown
 import re
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 from src.config import ROOT_DIR, MY_DOMAIN, INSTANT_VIEW_RHASH
+from src.services.activity import series_payload, series_title
+from src.services.stats_store import series_chat_id
+from src.services import metrics
 import uuid
 import datetime
 
@@ -70,4 +73,38 @@ async def view_article(request: Request, article_id: str):
         "date": article['date'],
         "description": description,
         "article_id": article_id
-    })
\ No newline at end of file
+    })
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Счетчики процесса (TTS-кэш и т.п.)"""
+    return JSONResponse(metrics.snapshot())
+
+
+# Маршруты статистики — обычные def: FastAPI выполняет их в пуле потоков,
+# и чтение SQLite не блокирует event loop с клиентами Pyrogram.
+# Адрес — случайный токен из отчета .stat (chat_id перебирается, а ряды содержат имена участников)
+@app.get("/api/stats/{token}")
+def stats_series(token: str):
+    """Ряды активности чата (тепловая карта, дни, юзеры) из роллапов .stat"""
+    chat_id = series_chat_id(token)
+    payload = series_payload(chat_id) if chat_id is not None else None
+    if not payload:
+        raise HTTPException(status_code=404, detail="Статистика не найдена (запустите .stat в чате)")
+    return JSONResponse(payload)
+
+
+@app.get("/stats/{token}", response_class=HTMLResponse)
+def view_stats(request: Request, token: str):
+    """Лонгрид с графиками активности. Данные подгружаются клиентом с /api/stats"""
+    chat_id = series_chat_id(token)
+    title = series_title(chat_id) if chat_id is not None else None
+    if title is None:
+        raise HTTPException(status_code=404, detail="Статистика не найдена (запустите .stat в чате)")
+
+    return templates.TemplateResponse(request, "stats.html", {
+        "title": f"Активность: {title}",
+        "chat_id": chat_id,
+        "token": token,
+        "date": datetime.datetime.now().strftime("%d.%m.%Y %H:%M"),
+    })